@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+DCA Scanner Yük Testi
+Uygulamayı gerçekçi bir istek karışımıyla (login, portföy listesi, pozisyonlar, takip listesi,
+tarama) eşzamanlı sanal kullanıcılarla yükler; throughput, p50/p95/p99 gecikme ve hata oranını
+JSON raporu olarak verir. Piyasa verisi replay sağlayıcısından gelir (ağ ve rate limit yok);
+kayıt dizini verilmezse sentetik scanner kayıtları üretilir.
+
+Kullanım:
+    python benchmarks/loadtest.py                                  # süreç içi (ASGI), 20 kullanıcı, 20 sn
+    python benchmarks/loadtest.py --concurrency 50 --duration 60 --output report.json
+    python benchmarks/loadtest.py --uvicorn                        # yerel uvicorn süreci başlatıp HTTP üzerinden
+    python benchmarks/loadtest.py --mix login=1,list=4,positions=4,watchlist=3,scan=0
+
+Not: Uygulama veri dizini olarak geçici bir klasör kullanır; gerçek veritabanına dokunulmaz.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = {"login": 5, "list": 30, "positions": 30, "watchlist": 25, "scan": 10}
+USERS = [(f"deneme{i}", "deneme123") for i in range(1, 5)]
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"Bilinmeyen işlem: {name} (geçerli: {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Doğrusal interpolasyonlu yüzdelik (sorted_values sıralı olmalı)"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def latency_stats(latencies: list) -> dict:
+    values = sorted(latencies)
+    return {
+        "p50": round(percentile(values, 0.50) * 1000, 2),
+        "p95": round(percentile(values, 0.95) * 1000, 2),
+        "p99": round(percentile(values, 0.99) * 1000, 2),
+        "mean": round(statistics.fmean(values) * 1000, 2) if values else 0.0,
+        "max": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+# ---------- Ortam ----------
+
+def prepare_environment(capture_dir: str = None) -> dict:
+    """Uygulamanın import/başlatma öncesi ortam değişkenleri"""
+    data_dir = tempfile.mkdtemp(prefix="dca_load_")
+    env = {
+        "DATA_DIR": data_dir,
+        "PRICE_SCHEDULER_MODE": "off",
+        "INSTRUMENT_REFRESH_INTERVAL": "0",
+        "MARKET_DATA_PROVIDER": "replay",
+        "MARKET_DATA_CAPTURE_DIR": capture_dir or os.path.join(data_dir, "market_captures"),
+    }
+    os.environ.update(env)
+    return env
+
+def write_synthetic_captures(main, capture_dir: str) -> int:
+    """Katalogdaki BIST ve kripto sembolleri için rastgele scanner kayıtları"""
+    from market_data import ANALYSIS_COLUMNS, CaptureStore
+    store = CaptureStore(capture_dir)
+    rng = random.Random(1)
+    count = 0
+    for market in ("bist", "crypto"):
+        exchange, screener = main.tv_market_params(market)
+        rows = {}
+        for entry in main.instrument_seed(market):
+            close = rng.uniform(1, 500)
+            values = {column: rng.uniform(-1, 1) * close for column in ANALYSIS_COLUMNS}
+            values.update({"close": close, "high": close * 1.03, "low": close * 0.97, "volume": rng.uniform(1e4, 1e7)})
+            rows[f"{exchange}:{entry['symbol']}"] = values
+        store.save_scan(screener, main.tv_interval("1d"), rows)
+        count += len(rows)
+    return count
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# ---------- Sanal Kullanıcılar ----------
+
+class LoadTest:
+    def __init__(self, client, mix: dict, concurrency: int, duration: float, requests_limit: int, scan_market: str, seed: int):
+        self.client = client
+        self.mix = mix
+        self.concurrency = concurrency
+        self.duration = duration
+        self.requests_limit = requests_limit
+        self.scan_market = scan_market
+        self.rng = random.Random(seed)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = []
+        self.sent = 0
+        self.sessions = []
+
+    async def login(self, username: str, password: str) -> dict:
+        response = await self.client.post("/user/login", json={"username": username, "password": password})
+        data = response.json()
+        if not data.get("success"):
+            raise RuntimeError(f"Giriş başarısız ({username}): {data}")
+        return {"Authorization": f"Bearer {data['api_key']}"}
+
+    async def setup(self) -> None:
+        """Her test kullanıcısına giriş yap, portföyüne işlem ve takip listesine sembol ekle"""
+        for username, password in USERS:
+            headers = await self.login(username, password)
+            portfolios = (await self.client.get("/portfolio/list", headers=headers)).json().get("portfolios") or []
+            if not portfolios:
+                created = (await self.client.post("/portfolio/create", headers=headers, json={"name": "Yük Testi"})).json()
+                portfolios = [created.get("portfolio", created)]
+            portfolio_id = portfolios[0]["portfolio_id"]
+            for i, (symbol, market) in enumerate([("THYAO", "bist"), ("GARAN", "bist"), ("BTCUSDT", "crypto"), ("ETHUSDT", "crypto")] * 5):
+                await self.client.post("/portfolio/add", headers=headers, json={
+                    "symbol": symbol, "market": market, "transaction_type": "sell" if i % 7 == 6 else "buy",
+                    "price": 10 + i, "quantity": 1 + i % 3, "portfolio_id": portfolio_id,
+                })
+            self.sessions.append({"username": username, "password": password, "headers": headers, "portfolio_id": portfolio_id})
+        for symbol, market in [("THYAO", "bist"), ("ASELS", "bist"), ("BTCUSDT", "crypto")]:
+            await self.client.post("/watchlist/add", json={"symbol": symbol, "market": market})
+
+    async def request(self, operation: str, session: dict):
+        if operation == "login":
+            return await self.client.post("/user/login", json={"username": session["username"], "password": session["password"]})
+        if operation == "list":
+            return await self.client.get("/portfolio/list", headers=session["headers"])
+        if operation == "positions":
+            return await self.client.get("/portfolio/positions", headers=session["headers"], params={"portfolio": session["portfolio_id"]})
+        if operation == "watchlist":
+            return await self.client.get("/watchlist", headers=session["headers"])
+        return await self.client.get("/scan", params={"market": self.scan_market})
+
+    def record_error(self, operation: str, detail: str) -> None:
+        self.errors[operation] += 1
+        if len(self.error_samples) < 20:
+            self.error_samples.append({"operation": operation, "detail": detail[:200]})
+
+    async def worker(self, deadline: float) -> None:
+        operations, weights = list(self.mix), list(self.mix.values())
+        while time.perf_counter() < deadline and (not self.requests_limit or self.sent < self.requests_limit):
+            self.sent += 1
+            operation = self.rng.choices(operations, weights)[0]
+            session = self.rng.choice(self.sessions)
+            start = time.perf_counter()
+            try:
+                response = await self.request(operation, session)
+                elapsed = time.perf_counter() - start
+                body = response.json()
+                # HTTP hatası veya uygulama seviyesinde hata ({"success": false} / {"error": ...})
+                if response.status_code >= 400:
+                    self.record_error(operation, f"HTTP {response.status_code}")
+                elif isinstance(body, dict) and (body.get("success") is False or body.get("error")):
+                    self.record_error(operation, str(body.get("error")))
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                self.record_error(operation, f"{type(e).__name__}: {e}")
+            self.latencies[operation].append(elapsed)
+
+    async def run(self) -> dict:
+        await self.setup()
+        start = time.perf_counter()
+        deadline = start + self.duration
+        await asyncio.gather(*(self.worker(deadline) for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - start
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        total = len(all_latencies)
+        total_errors = sum(self.errors.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "total_requests": total,
+            "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+            "error_rate": round(total_errors / total, 4) if total else 0.0,
+            "latency_ms": latency_stats(all_latencies),
+            "endpoints": {
+                operation: {
+                    "requests": len(values),
+                    "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+                    "errors": self.errors.get(operation, 0),
+                    "error_rate": round(self.errors.get(operation, 0) / len(values), 4) if values else 0.0,
+                    "latency_ms": latency_stats(values),
+                }
+                for operation, values in sorted(self.latencies.items())
+            },
+            "error_samples": self.error_samples,
+        }
+
+# ---------- Çalıştırma ----------
+
+async def run_in_process(args, env: dict) -> dict:
+    import httpx
+    sys.path.insert(0, ROOT)
+    import main
+    if not args.capture_dir:
+        write_synthetic_captures(main, env["MARKET_DATA_CAPTURE_DIR"])
+    # ASGITransport lifespan olaylarını çalıştırmaz: başlatma/kapatma elle yapılır
+    await main.on_startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            return await LoadTest(client, args.mix, args.concurrency, args.duration, args.requests, args.scan_market, args.seed).run()
+    finally:
+        await main.on_shutdown()
+
+async def run_over_http(args, env: dict) -> dict:
+    import httpx
+    sys.path.insert(0, ROOT)
+    if not args.capture_dir:
+        import main
+        write_synthetic_captures(main, env["MARKET_DATA_CAPTURE_DIR"])
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, **env}, stdout=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            for _ in range(100):
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.2)
+            else:
+                raise RuntimeError("uvicorn başlatılamadı")
+            return await LoadTest(client, args.mix, args.concurrency, args.duration, args.requests, args.scan_market, args.seed).run()
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="DCA Scanner yük testi")
+    parser.add_argument("--concurrency", type=int, default=20, help="Eşzamanlı sanal kullanıcı")
+    parser.add_argument("--duration", type=float, default=20.0, help="Test süresi (sn)")
+    parser.add_argument("--requests", type=int, default=0, help="Toplam istek sınırı (0: süre dolana kadar)")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="İşlem ağırlıkları, ör. login=5,list=30,positions=30,watchlist=25,scan=10")
+    parser.add_argument("--scan-market", default="crypto", help="/scan piyasası")
+    parser.add_argument("--capture-dir", help="Replay kayıt dizini (verilmezse sentetik kayıtlar üretilir)")
+    parser.add_argument("--uvicorn", action="store_true", help="Yerel uvicorn süreci başlat ve HTTP üzerinden yükle")
+    parser.add_argument("--timeout", type=float, default=60.0, help="İstek zaman aşımı (sn)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Raporu bu dosyaya da yaz")
+    args = parser.parse_args()
+
+    env = prepare_environment(args.capture_dir)
+    runner = run_over_http if args.uvicorn else run_in_process
+    # Uygulamanın debug print'leri rapor çıktısına karışmasın
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            report = asyncio.run(runner(args, env))
+        finally:
+            sys.stdout = stdout
+    report["config"] = {
+        "mode": "uvicorn" if args.uvicorn else "asgi",
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mix": args.mix,
+        "scan_market": args.scan_market,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+DCA Scanner Benchmark Script'i
+Sıcak fonksiyonları sentetik verilerle ölçer (sunucu veya ağ gerekmez):
+sinyal hesabı, pozisyon hesapları, BIST arama ve Excel export.
+
+Kullanım:
+    python benchmarks/run_benchmarks.py                  # tümü
+    python benchmarks/run_benchmarks.py -k search        # adında "search" geçenler
+    python benchmarks/run_benchmarks.py --compare        # son kayıtla karşılaştır
+
+Sonuçlar benchmarks/results/<tarih>_<commit>.json dosyasına yazılır; --compare en son
+önceki kayıtla karşılaştırır ve --threshold'dan (varsayılan %20) yavaşlayanları işaretler.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# main import edilmeden önce: geçici veri dizini, arka plan fiyat yenilemesi kapalı
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="dca_bench_"))
+os.environ.setdefault("PRICE_SCHEDULER_MODE", "off")
+sys.path.insert(0, ROOT)
+
+@contextlib.contextmanager
+def quiet():
+    """Ölçülen kodun debug print'lerini bastır"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+with quiet():
+    import main
+    from market_data import ANALYSIS_COLUMNS, build_analysis
+
+# ---------- Sentetik Veriler ----------
+
+def make_analysis(rng: random.Random, symbol: str) -> dict:
+    """compute_signals_tv girdisi: scanner kolonlarından kurulmuş analiz sözlüğü"""
+    close = rng.uniform(1, 500)
+    values = {column: rng.uniform(-1, 1) * close for column in ANALYSIS_COLUMNS}
+    overrides = {
+        "close": close, "open": close * rng.uniform(0.97, 1.03),
+        "high": close * rng.uniform(1.0, 1.05), "low": close * rng.uniform(0.95, 1.0),
+        "volume": rng.uniform(1e4, 1e7), "RSI": rng.uniform(10, 90), "ATR": close * rng.uniform(0.01, 0.08),
+        "SMA20": close * rng.uniform(0.9, 1.1), "SMA50": close * rng.uniform(0.85, 1.15),
+        "EMA20": close * rng.uniform(0.9, 1.1), "EMA50": close * rng.uniform(0.85, 1.15),
+        "BB.upper": close * 1.08, "BB.lower": close * 0.92,
+    }
+    # Sadece scanner'ın döndürdüğü kolonlar (Analysis kolon sırasıyla kurulur)
+    values.update({column: value for column, value in overrides.items() if column in values})
+    ticker = f"BINANCE:{symbol}"
+    return main.tv_analysis_result(symbol, "crypto", build_analysis(values, "crypto", ticker, "1d"))
+
+def make_transactions(rng: random.Random, count: int, symbols: int = 50) -> list:
+    """Portföy işlemleri (her sembolde önce alım, ~%20 satış)"""
+    start = datetime(2023, 1, 1).timestamp()
+    transactions = []
+    for i in range(count):
+        symbol = f"SYM{i % symbols:03d}"
+        price = rng.uniform(5, 300)
+        sell = i >= symbols and rng.random() < 0.2
+        transactions.append({
+            "id": f"tx_{i}",
+            "symbol": symbol,
+            "market": "bist" if i % 2 else "crypto",
+            "transaction_type": "sell" if sell else "buy",
+            "price": price,
+            "quantity": rng.uniform(0.1, 2) if sell else rng.uniform(1, 20),
+            "date": datetime.fromtimestamp(start + i * 60).isoformat(),
+            "target_price": price * 1.2 if rng.random() < 0.3 else None,
+            "notes": "",
+            "current_price": price * rng.uniform(0.8, 1.3),
+            "last_updated": datetime.now().isoformat(),
+        })
+    return transactions
+
+# ---------- Benchmark'lar ----------
+# Her grup (ad, ölçülen fonksiyon) çiftleri üretir; veri hazırlığı ölçüme dahil edilmez.
+
+def bench_compute_signals():
+    rng = random.Random(42)
+    single = make_analysis(rng, "BTCUSDT")
+    batch = [make_analysis(rng, f"C{i}USDT") for i in range(100)]
+    yield "compute_signals_tv[1]", lambda: main.compute_signals_tv(single)
+    # Tarama başına maliyet: scanner batch'inden gelen 100 analiz için sinyal hesabı
+    yield "compute_signals_tv[batch=100]", lambda: [main.compute_signals_tv(analysis) for analysis in batch]
+
+def bench_positions():
+    rng = random.Random(7)
+    for count in (10, 1_000, 100_000):
+        transactions = make_transactions(rng, count)
+        yield f"calculate_positions[{count}]", lambda t=transactions: main.calculate_positions(t)
+        yield f"build_portfolio_export_data[{count}]", lambda t=transactions: main.build_portfolio_export_data(t)
+
+def bench_search():
+    with quiet():
+        main.init_database()
+        main.get_instrument_registry("bist")  # İlk yükleme ölçüme dahil edilmez
+    # Kullanıcının yazdıkça gönderdiği sorgular (sembol, isim, Türkçe karakter, yazım hatası)
+    keystrokes = ["T", "TH", "THY", "THYA", "THYAO", "g", "ga", "gar", "gara", "garan", "türk", "turk", "aselsn"]
+    yield "search_bist_stocks[type-ahead]", lambda: [main.search_bist_stocks(query, limit=20) for query in keystrokes]
+
+def bench_excel():
+    rng = random.Random(3)
+    for count in (100, 10_000):
+        transactions = make_transactions(rng, count)
+        with quiet():
+            positions, summary = main.build_portfolio_export_data(transactions)
+
+        def run(t=transactions, p=positions, s=summary):
+            os.remove(main.create_portfolio_excel(t, p, s))
+        yield f"create_portfolio_excel[{count}]", run
+
+BENCHMARKS = [bench_compute_signals, bench_positions, bench_search, bench_excel]
+
+# ---------- Ölçüm ----------
+
+def measure(func, min_time: float, repeat: int) -> dict:
+    """timeit benzeri: döngü sayısı bir ölçüm en az min_time sürecek şekilde seçilir"""
+    with quiet():
+        func()  # Isınma
+        loops = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(loops):
+                func()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time or loops >= 1_000_000:
+                break
+            loops *= 10 if elapsed < min_time / 10 else 2
+        timings = [elapsed / loops]
+        for _ in range(repeat - 1):
+            start = time.perf_counter()
+            for _ in range(loops):
+                func()
+            timings.append((time.perf_counter() - start) / loops)
+    return {
+        "loops": loops,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def latest_result(exclude: str):
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    files = sorted(name for name in os.listdir(RESULTS_DIR) if name.endswith(".json") and name != exclude)
+    if not files:
+        return None
+    with open(os.path.join(RESULTS_DIR, files[-1]), encoding="utf-8") as f:
+        return json.load(f)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="DCA Scanner benchmark'ları")
+    parser.add_argument("-k", dest="keyword", help="Sadece adında bu metin geçen benchmark'lar")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Tek ölçümün minimum süresi (sn)")
+    parser.add_argument("--repeat", type=int, default=5, help="Ölçüm tekrarı")
+    parser.add_argument("--compare", action="store_true", help="Önceki kayıtla karşılaştır")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Gerileme eşiği (0.20 = %%20)")
+    parser.add_argument("--no-save", action="store_true", help="Sonucu kaydetme")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"🏁 Benchmark'lar başlıyor (commit {git_commit()})\n")
+    for group in BENCHMARKS:
+        for name, func in group():
+            if args.keyword and args.keyword not in name:
+                continue
+            stats = measure(func, args.min_time, args.repeat)
+            results[name] = stats
+            print(f"  {name:<40} {format_time(stats['median']):>10}  (min {format_time(stats['min'])}, {stats['loops']} döngü)")
+
+    record = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{record['commit']}.json"
+
+    regressions = []
+    if args.compare:
+        previous = latest_result(exclude=filename)
+        if previous is None:
+            print("\nℹ️ Karşılaştırılacak önceki kayıt yok")
+        else:
+            print(f"\n📊 Karşılaştırma: {previous['commit']} -> {record['commit']}")
+            for name, stats in results.items():
+                before = previous["results"].get(name)
+                if not before:
+                    continue
+                change = stats["median"] / before["median"] - 1
+                flag = "🔴" if change > args.threshold else "🟢" if change < -args.threshold else "  "
+                print(f"  {flag} {name:<40} {change:+.1%}")
+                if change > args.threshold:
+                    regressions.append(name)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(os.path.join(RESULTS_DIR, filename), "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2)
+        print(f"\n💾 Sonuçlar kaydedildi: benchmarks/results/{filename}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark %{args.threshold * 100:.0f}'den fazla yavaşladı")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,6 +1,8 @@
 # BIST Hisse Senetleri Listesi - A-K Arası
 # Otomatik olarak oluşturuldu
 
+from symbol_registry import SymbolRegistry, normalize_key
+
 BIST_STOCKS_AK = [
   {"symbol": "1000", "name": "YATIRIMLAR HOLDİNG"},
   {"symbol": "24", "name": "GAYRİMENKUL VE GİRİŞİM"},
@@ -290,25 +292,22 @@ BIST_STOCKS_AK = [
 # Toplam hisse sayısı
 TOTAL_STOCKS_AK = len(BIST_STOCKS_AK)
 
+# Sembol/isim indeksi (Türkçe harf katlamalı, puanlı arama)
+_REGISTRY = SymbolRegistry(BIST_STOCKS_AK)
+
 def get_stocks_by_symbol(symbol):
     """Sembol ile hisse bulma"""
-    for stock in BIST_STOCKS_AK:
-        if stock["symbol"] == symbol.upper():
-            return stock
-    return None
+    return _REGISTRY.get(symbol)
 
 def get_stocks_by_name(name):
     """İsim ile hisse bulma"""
+    key = normalize_key(name)
     for stock in BIST_STOCKS_AK:
-        if name.upper() in stock["name"].upper():
+        if key in normalize_key(stock["name"]):
             return stock
     return None
 
-def search_stocks(query):
-    """Hisse arama (sembol veya isim)"""
-    results = []
-    query = query.upper()
-    for stock in BIST_STOCKS_AK:
-        if query in stock["symbol"] or query in stock["name"].upper():
-            results.append(stock)
+def search_stocks(query, limit=None):
+    """Hisse arama (sembol veya isim) - alaka sırasına göre"""
+    results, _ = _REGISTRY.search(query, limit)
     return results
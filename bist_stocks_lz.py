@@ -1,6 +1,8 @@
 # BIST Hisse Senetleri Listesi - L-Z Arası
 # Otomatik olarak oluşturuldu
 
+from symbol_registry import SymbolRegistry, normalize_key
+
 BIST_STOCKS_LZ = [
   {"symbol": "LIDFA", "name": "Lider Faktoring A.Ş."},
   {"symbol": "LINK", "name": "Link Bilgisayar Sistemleri Yazılım ve Donanım Sanayi ve Ticaret A.Ş."},
@@ -201,25 +203,22 @@ BIST_STOCKS_LZ = [
 # Toplam hisse sayısı
 TOTAL_STOCKS_LZ = len(BIST_STOCKS_LZ)
 
+# Sembol/isim indeksi (Türkçe harf katlamalı, puanlı arama)
+_REGISTRY = SymbolRegistry(BIST_STOCKS_LZ)
+
 def get_stocks_by_symbol(symbol):
     """Sembol ile hisse bulma"""
-    for stock in BIST_STOCKS_LZ:
-        if stock["symbol"] == symbol.upper():
-            return stock
-    return None
+    return _REGISTRY.get(symbol)
 
 def get_stocks_by_name(name):
     """İsim ile hisse bulma"""
+    key = normalize_key(name)
     for stock in BIST_STOCKS_LZ:
-        if name.upper() in stock["name"].upper():
+        if key in normalize_key(stock["name"]):
             return stock
     return None
 
-def search_stocks(query):
-    """Hisse arama (sembol veya isim)"""
-    results = []
-    query = query.upper()
-    for stock in BIST_STOCKS_LZ:
-        if query in stock["symbol"] or query in stock["name"].upper():
-            results.append(stock)
+def search_stocks(query, limit=None):
+    """Hisse arama (sembol veya isim) - alaka sırasına göre"""
+    results, _ = _REGISTRY.search(query, limit)
     return results
@@ -0,0 +1,469 @@
+# Önbellek
+# Ortak arayüz: get / set (TTL) / delete / clear, toplu get_many / set_many ve tek uçuş
+# (single-flight) get_or_set / aget_or_set: aynı anahtar için eşzamanlı kaçırmalarda yükleyici
+# bir kez çalışır, diğer çağıranlar onun sonucunu bekler.
+# Arka uçlar (dağıtım topolojisine göre seçilir, bkz. create_cache):
+#   MemoryCache - süreç içi, girdi sayısı sınırlı LRU (tek worker)
+#   SQLiteCache - diskte, yeniden başlatmada korunur, aynı makinedeki worker'lar paylaşır
+#   RedisCache  - RESP protokolü (Redis/Valkey/KeyDB), makineler arası paylaşım
+# SQLite ve Redis'te değerler pickle ile saklanır: sadece güvenilen sunucu/dosya kullanılmalı.
+# Arka uç hataları kaçırma sayılır; önbellek erişilemezse istekler yükleyiciyle devam eder.
+
+import asyncio
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import unquote, urlparse
+
+MISSING = object()
+
+class Cache:
+    """Arka uçlardan bağımsız kısım: tek uçuş ve hit/miss bildirimi"""
+
+    blocking = False  # True ise get/set I/O yapar (async kodda executor'da çağrılmalı)
+
+    def __init__(self, namespace: str, observer: Optional[Callable[[str], None]] = None):
+        self.namespace = namespace
+        self.observer = observer  # "hit" / "miss" ile çağrılır (metrikler için)
+        self._flights: Dict[str, Future] = {}
+        self._flights_lock = threading.Lock()
+        self._async_flights: Dict[str, asyncio.Future] = {}
+
+    # Arka uçların uyguladığı temel işlemler
+    def _get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Bu namespace'teki tüm girdileri sil"""
+        raise NotImplementedError
+
+    def _observe(self, hit: bool) -> None:
+        if self.observer:
+            self.observer("hit" if hit else "miss")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._get(key)
+        self._observe(value is not MISSING)
+        return default if value is MISSING else value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """ttl saniye (None: süresiz); ttl <= 0 ise saklanmaz"""
+        if ttl is not None and ttl <= 0:
+            return
+        self._set(key, value, ttl)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Bulunan anahtarlar -> değer"""
+        found = {}
+        for key in keys:
+            value = self._get(key)
+            self._observe(value is not MISSING)
+            if value is not MISSING:
+                found[key] = value
+        return found
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+    def get_or_set(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Önbellekte yoksa loader() ile yükle (thread'ler arası tek uçuş). None saklanmaz."""
+        value = self._get(key)
+        self._observe(value is not MISSING)
+        if value is not MISSING:
+            return value
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+        if not leader:
+            return flight.result()
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+
+    async def aget_or_set(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None,
+                          run: Optional[Callable[..., Any]] = None) -> Any:
+        """get_or_set'in async karşılığı: loader coroutine döndürür, tek uçuş event loop içinde.
+        run verilirse (ör. executor'a gönderen async fonksiyon) bloklayan arka uç çağrıları onunla yapılır."""
+        async def call(func, *args):
+            if self.blocking and run is not None:
+                return await run(func, *args)
+            return func(*args)
+
+        value = await call(self._get, key)
+        self._observe(value is not MISSING)
+        if value is not MISSING:
+            return value
+        while True:
+            flight = self._async_flights.get(key)
+            if flight is None:
+                break
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise  # İptal edilen bu çağıran
+                # Lider iptal edildi: bekleyenler iptal edilmez, biri yeni lider olur
+        flight = self._async_flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await loader()
+            if value is not None:
+                await call(self.set, key, value, ttl)
+            flight.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            flight.exception()  # Bekleyen yoksa "exception was never retrieved" uyarısı verilmesin
+            raise
+        finally:
+            self._async_flights.pop(key, None)
+
+class MemoryCache(Cache):
+    """Süreç içi LRU: en fazla max_entries girdi, süresi dolan girdi okunurken silinir"""
+
+    def __init__(self, namespace: str, max_entries: int = 10000, observer: Optional[Callable[[str], None]] = None):
+        super().__init__(namespace, observer)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at | None, value)
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteCache(Cache):
+    """Disk üzerinde kalıcı önbellek; namespace başına en fazla max_entries girdi"""
+
+    blocking = True
+    PURGE_EVERY = 256  # Bu kadar yazmada bir süresi dolanlar ve fazlalık silinir
+
+    def __init__(self, namespace: str, path: str, max_entries: int = 100000, timeout: float = 30.0,
+                 observer: Optional[Callable[[str], None]] = None):
+        super().__init__(namespace, observer)
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expires_at REAL,
+                    PRIMARY KEY (namespace, key)
+                )
+            ''')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def _get(self, key: str) -> Any:
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    'SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?',
+                    (self.namespace, key)
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ SQLite önbellek okunamadı ({self.namespace}): {e}")
+            return MISSING
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return MISSING
+        return pickle.loads(row[0])
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        found = {}
+        try:
+            conn = self._connect()
+            try:
+                now = time.time()
+                for start in range(0, len(keys), 500):  # SQLite parametre sınırı
+                    chunk = keys[start:start + 500]
+                    rows = conn.execute(
+                        f'SELECT key, value, expires_at FROM cache_entries WHERE namespace = ? AND key IN ({",".join("?" * len(chunk))})',
+                        (self.namespace, *chunk)
+                    ).fetchall()
+                    for key, value, expires_at in rows:
+                        if expires_at is None or expires_at > now:
+                            found[key] = pickle.loads(value)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ SQLite önbellek okunamadı ({self.namespace}): {e}")
+        for key in keys:
+            self._observe(key in found)
+        return found
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        if not items or (ttl is not None and ttl <= 0):
+            return
+        expires_at = time.time() + ttl if ttl is not None else None
+        rows = [(self.namespace, key, pickle.dumps(value), expires_at) for key, value in items.items()]
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        'INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)', rows
+                    )
+                    self._writes += len(rows)
+                    if self._writes >= self.PURGE_EVERY:
+                        self._writes = 0
+                        self._purge(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ SQLite önbelleğe yazılamadı ({self.namespace}): {e}")
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        self.set_many({key: value}, ttl)
+
+    def _purge(self, conn: sqlite3.Connection) -> None:
+        """Süresi dolanları, sonra en erken dolacak fazlalık girdileri sil.
+        Süresiz girdiler ve en geç dolacaklar tutulur; eşitlikte yeni yazılan (büyük rowid) kalır."""
+        conn.execute('DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?', (self.namespace, time.time()))
+        conn.execute('''
+            DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                SELECT key FROM cache_entries WHERE namespace = ?
+                ORDER BY expires_at IS NULL DESC, expires_at DESC, rowid DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.namespace, self.namespace, self.max_entries))
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(sql, params)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ SQLite önbellek güncellenemedi ({self.namespace}): {e}")
+
+    def delete(self, key: str) -> None:
+        self._execute('DELETE FROM cache_entries WHERE namespace = ? AND key = ?', (self.namespace, key))
+
+    def clear(self) -> None:
+        self._execute('DELETE FROM cache_entries WHERE namespace = ?', (self.namespace,))
+
+class RedisError(Exception):
+    """Sunucunun döndürdüğü hata yanıtı (-ERR ...)"""
+
+class RedisConnection:
+    """Minimal RESP2 istemcisi (ek bağımlılık gerektirmez)"""
+
+    def __init__(self, host: str, port: int, db: int = 0, password: Optional[str] = None,
+                 username: Optional[str] = None, timeout: float = 2.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.sock.makefile("rb")
+        if password:
+            self.command("AUTH", *([username] if username else []), password)
+        if db:
+            self.command("SELECT", db)
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read(self) -> Any:
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis bağlantısı kapandı")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            return None if count < 0 else [self._read() for _ in range(count)]
+        raise RedisError(f"Beklenmeyen yanıt: {line!r}")
+
+    def command(self, *args) -> Any:
+        self.sock.sendall(self._encode(args))
+        return self._read()
+
+    def pipeline(self, commands: List[tuple]) -> List[Any]:
+        """Komutları tek seferde gönder, yanıtları sırayla oku"""
+        self.sock.sendall(b"".join(self._encode(args) for args in commands))
+        return [self._read() for _ in commands]
+
+    def close(self) -> None:
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+class RedisCache(Cache):
+    """Redis protokolü konuşan sunucuda önbellek; anahtarlar '<prefix><namespace>:<key>'"""
+
+    blocking = True
+
+    def __init__(self, namespace: str, url: str = "redis://localhost:6379/0", prefix: str = "dca:",
+                 timeout: float = 2.0, observer: Optional[Callable[[str], None]] = None):
+        super().__init__(namespace, observer)
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Desteklenmeyen önbellek adresi: {url}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.timeout = timeout
+        self.key_prefix = f"{prefix}{namespace}:"
+        self._local = threading.local()  # Thread başına bir bağlantı
+
+    def _connection(self) -> RedisConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = RedisConnection(self.host, self.port, self.db, self.password, self.username, self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _call(self, method: str, *args, default: Any = None) -> Any:
+        """Bağlantı koptuysa bir kez yeniden bağlan; yine olmazsa default döndür"""
+        for attempt in range(2):
+            try:
+                return getattr(self._connection(), method)(*args)
+            except (OSError, ConnectionError) as e:
+                conn = getattr(self._local, "conn", None)
+                if conn is not None:
+                    conn.close()
+                self._local.conn = None
+                if attempt:
+                    print(f"⚠️ Redis önbelleğine ulaşılamadı ({self.namespace}): {e}")
+            except RedisError as e:
+                print(f"⚠️ Redis önbellek hatası ({self.namespace}): {e}")
+                return default
+        return default
+
+    def _key(self, key: str) -> str:
+        return self.key_prefix + key
+
+    def _get(self, key: str) -> Any:
+        data = self._call("command", "GET", self._key(key))
+        return MISSING if data is None else pickle.loads(data)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._call("command", "MGET", *[self._key(key) for key in keys]) or [None] * len(keys)
+        found = {key: pickle.loads(data) for key, data in zip(keys, values) if data is not None}
+        for key in keys:
+            self._observe(key in found)
+        return found
+
+    @staticmethod
+    def _set_args(key: str, value: Any, ttl: Optional[float]) -> tuple:
+        args = ("SET", key, pickle.dumps(value))
+        return args + ("PX", max(1, int(ttl * 1000))) if ttl is not None else args
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        self._call("command", *self._set_args(self._key(key), value, ttl))
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        if not items or (ttl is not None and ttl <= 0):
+            return
+        self._call("pipeline", [self._set_args(self._key(key), value, ttl) for key, value in items.items()])
+
+    def delete(self, key: str) -> None:
+        self._call("command", "DEL", self._key(key))
+
+    def clear(self) -> None:
+        cursor = b"0"
+        while True:
+            reply = self._call("command", "SCAN", cursor, "MATCH", self.key_prefix + "*", "COUNT", 500)
+            if not reply:
+                return
+            cursor, keys = reply
+            if keys:
+                self._call("command", "DEL", *keys)
+            if cursor in (b"0", 0):
+                return
+
+def create_cache(backend: str, namespace: str, max_entries: int = 10000, path: Optional[str] = None,
+                 url: Optional[str] = None, observer: Optional[Callable[[str], None]] = None) -> Cache:
+    """CACHE_BACKEND değerine göre önbellek: memory (varsayılan), sqlite, redis"""
+    if backend == "sqlite":
+        return SQLiteCache(namespace, path or "cache.db", max_entries=max_entries, observer=observer)
+    if backend == "redis":
+        return RedisCache(namespace, url or "redis://localhost:6379/0", observer=observer)
+    if backend != "memory":
+        raise ValueError(f"Bilinmeyen önbellek arka ucu: {backend}")
+    return MemoryCache(namespace, max_entries=max_entries, observer=observer)
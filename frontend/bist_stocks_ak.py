@@ -1 +0,0 @@
-{"symbol": "TEST", "name": "Test Şirket A.Ş."},
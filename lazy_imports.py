@@ -0,0 +1,95 @@
+# Gecikmeli (Lazy) Import
+# Ağır kütüphaneler (pandas/numpy, ccxt, openpyxl) modül yüklenirken değil ilk kullanımda import
+# edilir: sadece auth/takip listesi isteklerine hizmet eden süreç bunların bedelini ödemez.
+# lazy_import() bir vekil nesne döndürür; ilk öznitelik erişiminde gerçek modül yüklenir ve süresi
+# kaydedilir. preload() aynı modülleri arka plan thread'inde ısıtır, report() kimin ne zaman ve
+# kaç ms'de yüklendiğini döndürür.
+
+import importlib
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+_LOCK = threading.Lock()
+_REPORT: Dict[str, Dict[str, Any]] = {}  # modül -> {"ms", "trigger", "thread"}
+
+def _initialized(module) -> bool:
+    spec = getattr(module, "__spec__", None)
+    return not getattr(spec, "_initializing", False)
+
+def _load(name: str, trigger: str):
+    # sys.modules'ten doğrudan dönülmez: başka thread'in (ör. ön yükleme) yarıda kalan importu orada
+    # görünür. import_module modül başına import kilidinde bekleyip tam yüklü modülü döndürür.
+    # _LOCK import boyunca tutulmaz: farklı modüller paralel yüklenir, import kilitleriyle kilitlenme olmaz.
+    importing = name not in sys.modules  # Yarıda kalan import varsa süreyi yükleyen thread yazar
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    if importing:
+        with _LOCK:
+            _REPORT.setdefault(name, {
+                "ms": round((time.perf_counter() - started) * 1000, 1),
+                "trigger": trigger,
+                "thread": threading.current_thread().name,
+            })
+    return module
+
+class LazyModule:
+    """Modül vekili: ilk öznitelik erişiminde import eder, sonra erişimleri modüle yönlendirir.
+    Okunan öznitelikler vekilde saklanır; modül özniteliklerini çalışma anında değiştiren kütüphaneler için uygun değildir."""
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def _resolve(self):
+        module = self._module
+        if module is None:
+            module = _load(self._name, "first_use")
+            object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        # Değer vekilin üzerine de yazılır: sıcak döngülerde sonraki erişimler __getattr__'a düşmez
+        value = getattr(self._resolve(), attr)
+        object.__setattr__(self, attr, value)
+        return value
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(self._resolve(), attr, value)
+        object.__setattr__(self, attr, value)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None or is_loaded(self._name) else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+def is_loaded(name: str) -> bool:
+    """Modül (herhangi bir yoldan) tamamen import edildi mi - import tetiklemez, yarıda kalan import False"""
+    module = sys.modules.get(name)
+    return module is not None and _initialized(module)
+
+def preload(names: Iterable[str], delay: float = 0.0) -> threading.Thread:
+    """Modülleri sırayla arka plan thread'inde import et (hata servis başlangıcını durdurmaz)"""
+    names = list(names)
+
+    def run():
+        if delay:
+            time.sleep(delay)
+        for name in names:
+            try:
+                _load(name, "preload")
+            except Exception as e:
+                print(f"⚠️ Ön yükleme başarısız: {name} ({e})")
+
+    thread = threading.Thread(target=run, name="import-preload", daemon=True)
+    thread.start()
+    return thread
+
+def report(extra: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Gecikmeli yüklenen modüllerin süreleri (ms) ve tetikleyicileri"""
+    with _LOCK:
+        modules = {name: dict(entry) for name, entry in _REPORT.items()}
+    return {**(extra or {}), "modules": modules}
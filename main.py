@@ -1,47 +1,322 @@
-from fastapi import FastAPI, Query, Depends, HTTPException, status, Header
+import time
+IMPORT_STARTED = time.perf_counter()  # main'in import süresi (bkz. /admin/import-report)
+
+from fastapi import FastAPI, Query, Depends, HTTPException, status, Header, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
 from pydantic import BaseModel
-import numpy as np
-import pandas as pd
-import ccxt
-from tradingview_ta import TA_Handler, Interval
-from datetime import datetime, timedelta
+import requests
+from datetime import datetime, timedelta, timezone, time as dtime
 from typing import List, Optional, Dict, Any
 import asyncio
-import time
 import json
+import csv
+import io
 import os
 import sqlite3
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager, suppress
 import shutil
 
 # Kalıcı veri klasörü (her yerde erken tanımla)
 DATA_DIR = os.environ.get("DATA_DIR", "data")
 
 import hashlib
+import heapq
+import random
 from collections import deque
-from threading import Lock
+from threading import Lock, Thread
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import functools
 import tempfile
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
+import socket
+import lazy_imports
+from lazy_imports import lazy_import
+
+# Ağır kütüphaneler ilk kullanımda yüklenir (analiz/grafik: pandas, numpy; borsa: ccxt; export: openpyxl)
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+ccxt = lazy_import("ccxt")
+openpyxl = lazy_import("openpyxl")
+xl_styles = lazy_import("openpyxl.styles")
+xl_cell = lazy_import("openpyxl.cell")
+xl_utils = lazy_import("openpyxl.utils")
+# Startup'tan IMPORT_PRELOAD_DELAY sn sonra arka planda ısıtılır ("off": ilk kullanımda yüklenir)
+IMPORT_PRELOAD = os.environ.get("IMPORT_PRELOAD", "numpy,pandas,openpyxl,ccxt")
+IMPORT_PRELOAD_DELAY = float(os.environ.get("IMPORT_PRELOAD_DELAY", 2))
 
 # BIST hisse listelerini import et
-from bist_stocks_ak import BIST_STOCKS_AK, get_stocks_by_symbol as get_stocks_ak_by_symbol, search_stocks as search_stocks_ak
-from bist_stocks_lz import BIST_STOCKS_LZ, get_stocks_by_symbol as get_stocks_lz_by_symbol, search_stocks as search_stocks_lz
+from bist_stocks_ak import BIST_STOCKS_AK
+from bist_stocks_lz import BIST_STOCKS_LZ
+from price_alerts import PriceAlertIndex
+from symbol_registry import SymbolRegistry
+from upstream_guard import CircuitBreaker, FailureCache
+from market_data import TradingViewClient, PRICE_COLUMNS, build_analysis, create_provider
+import httpx
+import metrics
+import tracing
+from cache import create_cache
+import cProfile
+from profiling import ProfileStore, SamplingProfiler, cprofile_report
 
 app = FastAPI(title="DCA Scanner API", version="1.0.0")
 
+# ---------- Metrikler ----------
+# GET /metrics Prometheus metin formatında sunar. Sıcak yollar (HTTP, SQLite, rate limiter,
+# dış servisler, önbellekler, taramalar, event loop) aşağıdaki metriklerle ölçülür.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")  # Ayarlıysa ?token=... veya Bearer ile istenir
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", 1.0))  # sn
+
+HTTP_REQUEST_SECONDS = metrics.histogram("http_request_duration_seconds", "HTTP istek süresi", ("method", "route", "status"))
+HTTP_IN_FLIGHT = metrics.gauge("http_requests_in_flight", "İşlenmekte olan HTTP istekleri")
+SQLITE_QUERY_SECONDS = metrics.histogram(
+    "sqlite_query_duration_seconds", "SQLite sorgu süresi", ("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+RATE_LIMIT_WAIT_SECONDS = metrics.histogram("rate_limiter_wait_seconds", "Rate limiter'da beklenen süre")
+UPSTREAM_REQUEST_SECONDS = metrics.histogram("upstream_request_duration_seconds", "Dış servis istek süresi", ("upstream",))
+UPSTREAM_REQUESTS = metrics.counter("upstream_requests", "Dış servis istekleri (ok|throttled|error)", ("upstream", "result"))
+UPSTREAM_SKIPPED = metrics.counter("upstream_skipped", "Gönderilmeden atlanan istekler (negative_cache|breaker)", ("upstream", "reason"))
+CACHE_REQUESTS = metrics.counter("cache_requests", "Önbellek erişimleri (hit|miss)", ("cache", "result"))
+SCAN_SECONDS = metrics.histogram("scan_duration_seconds", "/scan süresi", ("market",))
+LOOP_LAG = metrics.gauge("event_loop_lag_seconds", "Son ölçülen event loop gecikmesi")
+LOOP_LAG_SECONDS = metrics.histogram(
+    "event_loop_lag_distribution_seconds", "Event loop gecikmesi dağılımı",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+ROUTE_TEMPLATES: Dict[Any, str] = {}  # endpoint fonksiyonu -> route şablonu (ör. /portfolio/{item_id})
+
+def route_template(request) -> str:
+    """Eşleşen route'un şablonu - etiket kardinalitesi sembol/ID başına büyümesin"""
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if endpoint not in ROUTE_TEMPLATES:
+        for route in app.routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                ROUTE_TEMPLATES[endpoint] = route.path
+                break
+        else:
+            return "unmatched"
+    return ROUTE_TEMPLATES[endpoint]
+
+@app.middleware("http")
+async def metrics_middleware(request, call_next):
+    HTTP_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        HTTP_REQUEST_SECONDS.labels(request.method, route_template(request), status_code).observe(time.perf_counter() - start)
+
+async def loop_lag_monitor():
+    """Event loop gecikmesini ölç: planlanan uyanma ile gerçek uyanma arasındaki fark"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(time.perf_counter() - start - LOOP_LAG_INTERVAL, 0.0)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_SECONDS.observe(lag)
+        if lag > LOOP_LAG_WARN:
+            print(f"🐢 Event loop {lag * 1000:.0f} ms gecikti")
+
+LOOP_LAG_TASK = None
+
+# ---------- İstek Profilleme ----------
+# Admin istekleri "X-Profile: sample|cprofile" header'ı veya ?profile=sample|cprofile ile profillenir.
+# sample: süreç genelinde örnekleme (async ve thread'de çalışan endpoint'ler), collapsed stack çıktısı.
+# cprofile: yalnızca event loop thread'i, pstats metni. Aynı anda tek profil çalışır; süre ve örnek
+# sayısı sınırlıdır. Çıktılar DATA_DIR/profiles altında tutulur, adı X-Profile-Id header'ında döner.
+PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "1") != "0"
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", 0.005))  # sn
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", 30))
+PROFILE_MAX_SAMPLES = int(os.environ.get("PROFILE_MAX_SAMPLES", 20000))
+PROFILE_STORE = ProfileStore(os.path.join(DATA_DIR, "profiles"), keep=int(os.environ.get("PROFILE_KEEP", 20)))
+PROFILE_MODES = ("sample", "cprofile")
+PROFILE_LOCK = Lock()  # Aynı anda tek profil (cProfile thread başına tek profiler kabul eder)
+
+def requested_profile_mode(request) -> Optional[str]:
+    mode = request.headers.get("x-profile") or request.query_params.get("profile")
+    return mode if mode in PROFILE_MODES else None
+
+async def is_admin_request(request) -> bool:
+    # get_current_user database'e gidebilir: event loop dışında çalıştırılır
+    try:
+        return bool((await run_io(get_current_user, request.headers.get("authorization"))).get("is_admin"))
+    except HTTPException:
+        return False
+
+@app.middleware("http")
+async def profiling_middleware(request, call_next):
+    mode = requested_profile_mode(request) if PROFILE_ENABLED else None
+    # Admin olmayan isteklerde bayrak yok sayılır
+    if mode is None or not await is_admin_request(request):
+        return await call_next(request)
+    if not PROFILE_LOCK.acquire(blocking=False):
+        response = await call_next(request)
+        response.headers["X-Profile-Status"] = "busy"
+        return response
+    
+    try:
+        slug = "".join(ch if ch.isalnum() else "_" for ch in request.url.path.strip("/"))[:60] or "root"
+        profile_id = f"{generate_id()}_{slug}"
+        if mode == "sample":
+            sampler = SamplingProfiler(PROFILE_SAMPLE_INTERVAL, PROFILE_MAX_SECONDS, PROFILE_MAX_SAMPLES)
+            sampler.start()
+            try:
+                response = await call_next(request)
+            finally:
+                sampler.stop()
+            filename = PROFILE_STORE.save(profile_id, "folded", sampler.collapsed())
+            response.headers["X-Profile-Samples"] = str(sampler.samples)
+            if sampler.truncated:
+                response.headers["X-Profile-Truncated"] = "1"
+        else:
+            profiler = cProfile.Profile()
+            truncated = []
+            def stop_profiler():
+                # Süre dolunca kayıt durur, istek normal şekilde tamamlanır
+                profiler.disable()
+                truncated.append(True)
+            profiler.enable()
+            stop_handle = asyncio.get_running_loop().call_later(PROFILE_MAX_SECONDS, stop_profiler)
+            try:
+                response = await call_next(request)
+            finally:
+                stop_handle.cancel()
+                profiler.disable()
+            filename = PROFILE_STORE.save(profile_id, "txt", cprofile_report(profiler))
+            if truncated:
+                response.headers["X-Profile-Truncated"] = "1"
+        response.headers["X-Profile-Id"] = filename
+        print(f"🔬 Profil kaydedildi: {filename}")
+        return response
+    finally:
+        PROFILE_LOCK.release()
+
+# ---------- Yürütücüler ----------
+# async endpoint'lerdeki bloklayan işler event loop dışında çalışır: dosya/SQLite/ağ çağrıları
+# IO havuzunda (run_io), Excel/pozisyon hesabı gibi CPU işleri çekirdek sayısıyla sınırlı ayrı
+# havuzda (run_cpu); uzun bir export IO havuzunu doldurup diğer istekleri bekletmez.
+# Oku-değiştir-yaz yapan endpoint'ler serialized_writes ile sıraya girer (eskiden event loop
+# üzerinde çalıştıkları için doğal olarak sıralıydılar). Çoklu worker modunda aynı sıra
+# DATA_DIR'deki kilit dosyası (flock) ile süreçler arasında da korunur.
+IO_WORKERS = int(os.environ.get("IO_WORKERS", 16))
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", os.cpu_count() or 2))
+IO_EXECUTOR = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+CPU_EXECUTOR = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+EXECUTOR_IN_FLIGHT = metrics.gauge("executor_tasks_in_flight", "Havuzda çalışan/bekleyen işler", ("pool",))
+LOOP_LAG_WARN = float(os.environ.get("LOOP_LAG_WARN", 0.25))  # sn, üstü loglanır
+DATA_WRITE_LOCK = asyncio.Lock()  # Portföy/takip listesi/kullanıcı yazmaları (startup'ta yenilenir)
+WRITE_LOCK_FILE = os.path.join(DATA_DIR, ".write.lock")  # Süreçler arası yazma kilidi
+try:
+    import fcntl
+except ImportError:  # Windows: flock yok, tek süreç varsayılır
+    fcntl = None
+
+async def run_in_pool(pool: str, executor, func, *args, **kwargs):
+    """func'ı havuzda çalıştır; contextvar'lar (ör. tarama izleyicisi) taşınır"""
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    gauge = EXECUTOR_IN_FLIGHT.labels(pool)
+    gauge.inc()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+    finally:
+        gauge.dec()
+
+async def run_io(func, *args, **kwargs):
+    """Bloklayan I/O (dosya, SQLite, senkron HTTP) için"""
+    return await run_in_pool("io", IO_EXECUTOR, func, *args, **kwargs)
+
+async def run_cpu(func, *args, **kwargs):
+    """CPU yoğun işler (Excel/Parquet üretimi, büyük portföy hesapları) için"""
+    return await run_in_pool("cpu", CPU_EXECUTOR, func, *args, **kwargs)
+
+def lock_file(path: str) -> int:
+    """Dosyayı özel kilitle (diğer süreç bırakana kadar bekler), tanımlayıcıyı döndür"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+def unlock_file(fd: int) -> None:
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+@asynccontextmanager
+async def data_write_lock():
+    """Süreç içinde DATA_WRITE_LOCK, süreçler arasında WRITE_LOCK_FILE üzerinde flock.
+    Süreç içi kilit önce alınır: flock'u her süreçten en fazla bir görev bekler."""
+    async with DATA_WRITE_LOCK:
+        fd = await run_io(lock_file, WRITE_LOCK_FILE) if fcntl else None
+        try:
+            yield
+        finally:
+            if fd is not None:
+                unlock_file(fd)
+
+def serialized_writes(endpoint):
+    """Endpoint'i yazma kilidi altında çalıştır (imza korunur, FastAPI parametreleri aynı kalır)"""
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        async with data_write_lock():
+            return await endpoint(*args, **kwargs)
+    return wrapper
+
+def write_json_atomic(path: str, data) -> None:
+    """Geçici dosyaya yazıp yerine taşı - eşzamanlı okuyucu yarım yazılmış dosya görmez"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove_file_quietly(tmp_path)
+        raise
+
+# ---------- Önbellekler ----------
+# CACHE_BACKEND dağıtıma göre seçilir: "memory" (tek worker, varsayılan), "sqlite" (aynı makinede
+# çoklu worker; CACHE_PATH), "redis" (makineler arası; CACHE_URL). memory arka ucunda geçersiz
+# kılma sadece o sürece uygulanır, diğer worker'larda girdi TTL sonunda düşer.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_PATH = os.environ.get("CACHE_PATH", os.path.join(DATA_DIR, "cache.db"))
+CACHE_URL = os.environ.get("CACHE_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 10000))
+ANALYSIS_CACHE_TTL = float(os.environ.get("ANALYSIS_CACHE_TTL", 60))  # sn, 0 kapatır
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 30))
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", 300))
+
+def make_cache(namespace: str):
+    return create_cache(
+        CACHE_BACKEND, namespace, max_entries=CACHE_MAX_ENTRIES, path=CACHE_PATH, url=CACHE_URL,
+        observer=lambda result: CACHE_REQUESTS.labels(namespace, result).inc()
+    )
+
+ANALYSIS_CACHE = make_cache("analysis")  # (piyasa, periyot, sembol) -> tv_analysis_result sözlüğü
+USER_CACHE = make_cache("users")  # kullanıcı adı -> aktif kullanıcı kaydı
+SEARCH_CACHE = make_cache("search")  # (sorgu, limit) -> BIST arama sonucu
+
 # ---------- Database Yönetimi ----------
 # Database dosyası varsayılan olarak DATA_DIR altında tutulur ki kalıcı disk kullanılsın
 DATABASE_PATH = os.environ.get("DATABASE_PATH", os.path.join(DATA_DIR, "dca_scanner.db"))
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", 30))  # sn, çoklu worker'da yazma kilidi beklemesi
 
 # --- Uygulama başlangıç hook'u: Render/Vercel gibi ortamlarda da tablo ve kullanıcıları hazırla ---
 @app.on_event("startup")
 async def on_startup() -> None:
     # Kalıcı dizini hazırla ve migrasyonları çalıştır
+    started = time.perf_counter()
     try:
         # Bazı yardımcılar aşağıda tanımlı; runtime'da mevcut olacaklar
         bootstrap_data_dir()
@@ -52,9 +327,10 @@ async def on_startup() -> None:
     except Exception as _:
         pass
     try:
-        migrate_json_to_database()
-    except Exception as _:
-        pass
+        # JSON taşıma adımları sadece bir kez (schema_migrations'da işaretli değilse) çalışır
+        run_migrations()
+    except Exception as e:
+        print(f"❌ Migrasyon hatası: {e}")
     try:
         # API anahtarlarını yükle
         active_api_keys.update(load_api_keys())
@@ -65,6 +341,45 @@ async def on_startup() -> None:
         ensure_default_users_exist()
     except Exception as _:
         pass
+    try:
+        # Önceki çalıştırmadan (veya worker'dan) kalan fiyat snapshot'larını yükle
+        load_price_snapshots()
+    except Exception as _:
+        pass
+    print(f"🚀 Başlangıç hazırlığı {(time.perf_counter() - started) * 1000:.0f} ms sürdü (main import: {IMPORT_SECONDS * 1000:.0f} ms)")
+    if IMPORT_PRELOAD and IMPORT_PRELOAD != "off":
+        lazy_imports.preload([name.strip() for name in IMPORT_PRELOAD.split(",") if name.strip()], delay=IMPORT_PRELOAD_DELAY)
+    global LOOP_LAG_TASK
+    if LOOP_LAG_TASK is None:
+        LOOP_LAG_TASK = asyncio.create_task(loop_lag_monitor())
+    global DATA_WRITE_LOCK
+    DATA_WRITE_LOCK = asyncio.Lock()  # Bu event loop'a ait kilit
+    global WS_LOOP
+    # Thread'lerde çalışan senkron endpoint'lerden (ör. /scan) WebSocket yayını için
+    WS_LOOP = asyncio.get_running_loop()
+    global PRICE_REFRESHER_TASK
+    if PRICE_REFRESHER_TASK is None:
+        if PRICE_SCHEDULER_MODE == "app":
+            # Tutulan + takip edilen semboller için paylaşılan fiyat snapshot'ını taze tut
+            # (çoklu worker'da kirayı alan tek worker yeniler)
+            PRICE_REFRESHER_TASK = asyncio.create_task(price_scheduler_supervisor())
+        elif PRICE_SCHEDULER_MODE == "worker":
+            # Yenileme ayrı worker'da: snapshot'ları database'den periyodik oku
+            PRICE_REFRESHER_TASK = asyncio.create_task(price_snapshot_sync_loop())
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    global PRICE_REFRESHER_TASK
+    if PRICE_REFRESHER_TASK is not None:
+        PRICE_REFRESHER_TASK.cancel()
+        PRICE_REFRESHER_TASK = None
+    global LOOP_LAG_TASK
+    if LOOP_LAG_TASK is not None:
+        LOOP_LAG_TASK.cancel()
+        LOOP_LAG_TASK = None
+    # Havuzdaki TradingView bağlantılarını kapat
+    MARKET_DATA.close()
+    await MARKET_DATA.aclose()
 
 def init_database():
     """Database'i başlat ve tabloları oluştur"""
@@ -72,6 +387,9 @@ def init_database():
         with get_db_connection() as conn:
             cursor = conn.cursor()
             
+            # WAL: okuyucular yazanı beklemez (web worker'ları + fiyat worker'ı aynı dosyada)
+            cursor.execute('PRAGMA journal_mode=WAL')
+            
             # Kullanıcılar tablosu
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS users (
@@ -118,6 +436,30 @@ def init_database():
                 )
             ''')
             
+            # Paylaşılan fiyat snapshot'ları (web ve worker süreçleri arasında)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS price_snapshots (
+                    symbol TEXT NOT NULL,
+                    market TEXT NOT NULL,
+                    price REAL NOT NULL,
+                    last_updated TEXT NOT NULL,
+                    PRIMARY KEY (symbol, market)
+                )
+            ''')
+            
+            # Enstrüman kataloğu (taranan/aranan sembol evreni)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS instruments (
+                    market TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    rank INTEGER NOT NULL DEFAULT 0,
+                    active INTEGER NOT NULL DEFAULT 1,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (market, symbol)
+                )
+            ''')
+            
             # Takip listesi tablosu
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS watchlist (
@@ -132,19 +474,72 @@ def init_database():
                 )
             ''')
             
+            # Uygulanmış veri migrasyonları (bkz. SCHEMA_MIGRATIONS)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TEXT NOT NULL
+                )
+            ''')
+            
+            # API key'leri (tüm worker'lar aynı oturumları görür)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS api_keys (
+                    api_key TEXT PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            ''')
+            
+            # Süreçler arası paylaşılan durum: kiralar, rate limit saatleri, sürüm sayaçları
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    name TEXT PRIMARY KEY,
+                    next_slot REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS shared_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            ''')
+            
+            # Alarm olayları (AUTOINCREMENT: ID'ler yeniden başlatmada ve worker'lar arasında tekrar kullanılmaz)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS alert_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT,
+                    payload TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            ''')
+            
             conn.commit()
             print("✅ Database tabloları başarıyla oluşturuldu")
             
     except Exception as e:
         print(f"❌ Database başlatma hatası: {e}")
 
-def ensure_default_users_exist():
-    """Varsayılan kullanıcıların her zaman var olmasını sağla"""
-    users = load_users()
+def ensure_default_users_exist() -> int:
+    """Varsayılan kullanıcıların her zaman var olmasını sağla, eklenen kullanıcı sayısını döndür.
+    Pasife alınmış kullanıcılar da "var" sayılır (load_users sadece aktifleri döndürür): yeniden oluşturulmaz."""
+    with get_db_connection() as conn:
+        rows = conn.execute('SELECT id, username FROM users').fetchall()
+    existing_usernames = {row["username"] for row in rows}
+    existing_ids = {row["id"] for row in rows}
+    new_users = []
     
     # Admin kullanıcısı kontrol et
-    admin_exists = any(user.get('username') == ADMIN_USERNAME for user in users)
-    if not admin_exists:
+    if ADMIN_USERNAME not in existing_usernames:
         print("🔄 Admin kullanıcısı oluşturuluyor...")
         admin_user = {
             "id": "admin_001",
@@ -156,8 +551,7 @@ def ensure_default_users_exist():
             "last_login": None,
             "is_active": True
         }
-        users.append(admin_user)
-        print(f"✅ Admin kullanıcısı oluşturuldu: {ADMIN_USERNAME}")
+        new_users.append(admin_user)
     
     # Test kullanıcıları kontrol et
     test_users = [
@@ -167,11 +561,16 @@ def ensure_default_users_exist():
         {"username": "deneme4", "password": "deneme123", "email": "deneme4@test.com"}
     ]
     
+    next_id = len(existing_ids) + 1
     for test_user in test_users:
-        if not any(u.get('username') == test_user['username'] for u in users):
+        if test_user['username'] not in existing_usernames:
             print(f"🔄 Test kullanıcısı oluşturuluyor: {test_user['username']}")
+            # Boştaki ilk ID (pasif kullanıcıların ID'leriyle çakışan satır INSERT OR IGNORE ile sessizce düşerdi)
+            while f"user_{next_id:03d}" in existing_ids:
+                next_id += 1
+            existing_ids.add(f"user_{next_id:03d}")
             new_user = {
-                "id": f"user_{len(users) + 1:03d}",
+                "id": f"user_{next_id:03d}",
                 "username": test_user['username'],
                 "password": test_user['password'],
                 "email": test_user['email'],
@@ -180,26 +579,101 @@ def ensure_default_users_exist():
                 "last_login": None,
                 "is_active": True
             }
-            users.append(new_user)
-            print(f"✅ Test kullanıcısı oluşturuldu: {test_user['username']}")
-    
-    # Kullanıcıları kaydet
-    if len(users) >= 5:  # En az 5 kullanıcı olmalı
-        save_users(users)
-        print(f"🎉 Toplam {len(users)} kullanıcı kalıcı olarak kaydedildi!")
+            new_users.append(new_user)
     
-    return users
+    # Sadece eksik kullanıcılar eklenir; her açılışta tablo yeniden yazılmaz
+    inserted = insert_users(new_users) if new_users else 0
+    if inserted:
+        print(f"🎉 {inserted} kullanıcı eklendi, toplam {len(rows) + inserted} kullanıcı")
+    return inserted
+
+def sql_operation(sql: str) -> str:
+    """Sorgunun ilk kelimesi (SELECT, INSERT, ...) - metrik etiketi"""
+    parts = sql.lstrip().split(None, 1)
+    return parts[0].upper() if parts else "EMPTY"
+
+class TimedCursor(sqlite3.Cursor):
+    """Sorgu sürelerini sqlite_query_duration_seconds'a yazan cursor"""
+
+    def execute(self, sql, parameters=()):
+        with SQLITE_QUERY_SECONDS.labels(sql_operation(sql)).time():
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with SQLITE_QUERY_SECONDS.labels(sql_operation(sql)).time():
+            return super().executemany(sql, seq_of_parameters)
+
+class TimedConnection(sqlite3.Connection):
+    """cursor() ve conn.execute() kısayolları TimedCursor kullanır"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
 
 @contextmanager
 def get_db_connection():
     """Database bağlantısı için context manager"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = sqlite3.connect(DATABASE_PATH, timeout=SQLITE_BUSY_TIMEOUT, factory=TimedConnection)
     conn.row_factory = sqlite3.Row  # Dict-like access
     try:
         yield conn
     finally:
         conn.close()
 
+# ---------- Paylaşılan Durum (Çoklu Worker) ----------
+# WEB_CONCURRENCY > 1 ile her worker ayrı süreçtir; süreçler arasında tutarlı kalması gereken
+# durum (API key'leri, rate limit saati, zamanlayıcı liderliği, alarm indeksi sürümü) SQLite'ta
+# tutulur. Oku-değiştir-yaz adımları BEGIN IMMEDIATE ile tek işlemde yapılır.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+def acquire_lease(name: str, holder: str, ttl: float) -> bool:
+    """Kirayı al veya yenile; başka bir süreçte ve süresi dolmamışsa False"""
+    now = time.time()
+    with get_db_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute('SELECT holder, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+        if row and row["holder"] != holder and row["expires_at"] > now:
+            conn.rollback()
+            return False
+        conn.execute('INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)', (name, holder, now + ttl))
+        conn.commit()
+    return True
+
+def release_lease(name: str, holder: str) -> None:
+    """Kirayı bırak (sadece sahibi bırakabilir)"""
+    with get_db_connection() as conn:
+        conn.execute('DELETE FROM leases WHERE name = ? AND holder = ?', (name, holder))
+        conn.commit()
+
+def reserve_shared_slot(name: str, delay: float, now: float) -> float:
+    """Paylaşılan saatte bir sonraki zamanı ayır: max(now, son + delay)"""
+    with get_db_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute('SELECT next_slot FROM rate_limits WHERE name = ?', (name,)).fetchone()
+        slot = max(now, row["next_slot"] + delay) if row else now
+        conn.execute('INSERT OR REPLACE INTO rate_limits (name, next_slot) VALUES (?, ?)', (name, slot))
+        conn.commit()
+    return slot
+
+def bump_shared_version(name: str) -> None:
+    """Sürüm sayacını artır - diğer süreçlerdeki türetilmiş veriler eskidi"""
+    with get_db_connection() as conn:
+        conn.execute('''
+            INSERT INTO shared_versions (name, version) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET version = version + 1
+        ''', (name,))
+        conn.commit()
+
+def get_shared_version(name: str) -> int:
+    with get_db_connection() as conn:
+        row = conn.execute('SELECT version FROM shared_versions WHERE name = ?', (name,)).fetchone()
+    return row["version"] if row else 0
+
 def migrate_json_to_database():
     """JSON dosyalarından verileri database'e taşı"""
     try:
@@ -276,6 +750,70 @@ def migrate_json_to_database():
         
     except Exception as e:
         print(f"❌ Veri taşıma hatası: {e}")
+        raise
+
+def migrate_api_keys_to_database():
+    """Eski api_keys.json'daki key'leri database'e ekle (database'deki kayıtlar korunur)"""
+    if not os.path.exists(API_KEYS_FILE):
+        return
+    try:
+        with open(API_KEYS_FILE, 'r', encoding='utf-8') as f:
+            api_keys = json.load(f)
+        with get_db_connection() as conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO api_keys (api_key, username, created_at) VALUES (?, ?, ?)',
+                [(key, data["username"], data.get("created_at") or datetime.now().isoformat()) for key, data in api_keys.items()]
+            )
+            conn.commit()
+    except Exception as e:
+        print(f"❌ API key taşıma hatası: {e}")
+        raise
+
+# ---------- Şema Migrasyonları ----------
+# Tek seferlik veri taşıma adımları; uygulananlar schema_migrations'a sürüm numarasıyla yazılır.
+# Yeniden başlatmada init_database'in CREATE IF NOT EXISTS kontrolleri ve tek bir SELECT kalır,
+# başlangıç süresi veri miktarından bağımsızdır. Yeni adım listenin sonuna yeni sürümle eklenir.
+SCHEMA_MIGRATIONS = [
+    (1, "import_json_data", migrate_json_to_database),
+    (2, "import_api_keys_json", migrate_api_keys_to_database),
+]
+MIGRATION_LEASE = "schema_migrations"
+MIGRATION_WAIT_TIMEOUT = 120.0  # sn, başka worker migrasyon yaparken beklenecek en uzun süre
+
+def applied_migrations() -> set:
+    with get_db_connection() as conn:
+        return {row["version"] for row in conn.execute('SELECT version FROM schema_migrations')}
+
+def run_migrations() -> List[str]:
+    """Uygulanmamış migrasyonları sırayla çalıştır, çalıştırılanların adlarını döndür.
+    Çoklu worker'da kirayı alan tek süreç çalıştırır; hata veren adım işaretlenmez, sonraki açılışta tekrar denenir."""
+    pending = [version for version, _, _ in SCHEMA_MIGRATIONS if version not in applied_migrations()]
+    if not pending:
+        return []
+    
+    deadline = time.time() + MIGRATION_WAIT_TIMEOUT
+    while not acquire_lease(MIGRATION_LEASE, WORKER_ID, MIGRATION_WAIT_TIMEOUT):
+        if time.time() > deadline:
+            raise RuntimeError("Migrasyon kirası alınamadı")
+        time.sleep(0.2)
+    try:
+        applied = applied_migrations()  # Beklerken başka worker uygulamış olabilir
+        ran = []
+        for version, name, migrate in SCHEMA_MIGRATIONS:
+            if version in applied:
+                continue
+            print(f"📦 Migrasyon {version}: {name}")
+            migrate()
+            with get_db_connection() as conn:
+                conn.execute(
+                    'INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)',
+                    (version, name, datetime.now().isoformat())
+                )
+                conn.commit()
+            ran.append(name)
+        return ran
+    finally:
+        release_lease(MIGRATION_LEASE, WORKER_ID)
 
 # ---------- Portföy Modelleri ----------
 class PortfolioItem(BaseModel):
@@ -392,7 +930,7 @@ SECRET_KEY = "dca-scanner-secret-key-2024"  # Gerçek uygulamada güvenli olmal
 # API keys dosyası
 API_KEYS_FILE = os.path.join(DATA_DIR, "api_keys.json")
 
-# Active API keys - kalıcı olarak saklanacak
+# Active API keys - kalıcı kayıt api_keys tablosunda, bu sözlük sürece ait önbellek
 active_api_keys = {}
 
 def bootstrap_data_dir():
@@ -480,6 +1018,10 @@ def load_users():
                 pass
         return []
 
+def load_user(username: str) -> Optional[dict]:
+    """Aktif kullanıcıyı adıyla bul"""
+    return next((u for u in load_users() if u["username"] == username), None)
+
 def hash_password(password: str) -> str:
     """Şifreyi hash'le"""
     if TEST_MODE:
@@ -494,40 +1036,55 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return hash_password(plain_password) == hashed_password
 
 def load_api_keys():
-    """API key'leri JSON dosyasından yükle"""
-    if os.path.exists(API_KEYS_FILE):
-        try:
-            with open(API_KEYS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    """API key'leri database'den yükle"""
+    try:
+        with get_db_connection() as conn:
+            rows = conn.execute('SELECT api_key, username, created_at FROM api_keys').fetchall()
+        return {row["api_key"]: {"username": row["username"], "created_at": row["created_at"]} for row in rows}
+    except sqlite3.Error:
+        return {}
+
+def load_api_key(api_key: str) -> Optional[dict]:
+    """Tek API key'i database'den oku (başka bir worker'da oluşturulmuş olabilir)"""
+    with get_db_connection() as conn:
+        row = conn.execute('SELECT username, created_at FROM api_keys WHERE api_key = ?', (api_key,)).fetchone()
+    return {"username": row["username"], "created_at": row["created_at"]} if row else None
 
-def save_api_keys():
-    """API key'leri JSON dosyasına kaydet"""
-    os.makedirs(os.path.dirname(API_KEYS_FILE), exist_ok=True)
-    with open(API_KEYS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(active_api_keys, f, ensure_ascii=False, indent=2)
+def save_api_key(api_key: str, data: dict):
+    """API key'i database'e kaydet"""
+    with get_db_connection() as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO api_keys (api_key, username, created_at) VALUES (?, ?, ?)',
+            (api_key, data["username"], data["created_at"])
+        )
+        conn.commit()
 
 def create_api_key(username: str) -> str:
     """API key oluştur ve döndür"""
     import secrets
     api_key = f"dca_{secrets.token_urlsafe(16)}"
-    active_api_keys[api_key] = {
+    data = {
         "username": username,
         "created_at": datetime.now().isoformat()
     }
     # Kalıcı olarak kaydet
-    save_api_keys()
+    save_api_key(api_key, data)
+    active_api_keys[api_key] = data
     print(f"✅ Created API key for user: {username}")
     return api_key
 
 def verify_api_key(api_key: str) -> dict:
     """API key'i doğrula ve kullanıcı bilgisini döndür"""
-    if not api_key or api_key not in active_api_keys:
+    if not api_key:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Geçersiz API key")
-    
-    return active_api_keys[api_key]
+    data = active_api_keys.get(api_key)
+    if data is None:
+        # Önbellekte yok: key başka bir worker'da oluşturulmuş olabilir
+        data = load_api_key(api_key)
+        if data is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Geçersiz API key")
+        active_api_keys[api_key] = data
+    return data
 
 def get_current_user(authorization: str = Header(None)):
     """Authorization header'dan API key al ve kullanıcı bilgisini döndür"""
@@ -544,8 +1101,7 @@ def get_current_user(authorization: str = Header(None)):
         api_data = verify_api_key(api_key)
         username = api_data["username"]
         
-        users = load_users()
-        user = next((u for u in users if u["username"] == username), None)
+        user = USER_CACHE.get_or_set(username, lambda: load_user(username), USER_CACHE_TTL)
         if not user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Kullanıcı bulunamadı")
         return user
@@ -576,7 +1132,9 @@ def save_users(users):
                 ))
             
             conn.commit()
-            print(f"✅ {len(users)} kullanıcı database'e kaydedildi")
+        # Önbellek commit'ten sonra temizlenir: önce temizlenirse eşzamanlı bir okuma eski kaydı geri yazabilir
+        USER_CACHE.clear()
+        print(f"✅ {len(users)} kullanıcı database'e kaydedildi")
             
     except Exception as e:
         print(f"❌ Database'e kullanıcı kaydetme hatası: {e}")
@@ -589,6 +1147,23 @@ def save_users(users):
         except Exception as json_error:
             print(f"❌ JSON fallback hatası: {json_error}")
 
+def insert_users(users) -> int:
+    """Yeni kullanıcıları ekle (mevcut kayıtlara dokunmaz), gerçekten eklenen satır sayısını döndür"""
+    with get_db_connection() as conn:
+        cursor = conn.executemany('''
+            INSERT OR IGNORE INTO users 
+            (id, username, password, email, is_admin, created_at, last_login, is_active)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(
+            user.get('id'), user.get('username'), user.get('password'),
+            user.get('email'), user.get('is_admin', False),
+            user.get('created_at'), user.get('last_login'),
+            user.get('is_active', True)
+        ) for user in users])
+        conn.commit()
+    USER_CACHE.clear()  # Commit'ten sonra (bkz. save_users)
+    return cursor.rowcount
+
 def create_default_admin():
     """Varsayılan admin kullanıcısını oluştur"""
     users = load_users()
@@ -678,9 +1253,7 @@ def load_portfolio_list():
 
 def save_portfolio_list(portfolio_list):
     """Portföy listesini kaydet"""
-    os.makedirs(os.path.dirname(PORTFOLIO_LIST_FILE), exist_ok=True)
-    with open(PORTFOLIO_LIST_FILE, 'w', encoding='utf-8') as f:
-        json.dump(portfolio_list, f, ensure_ascii=False, indent=2)
+    write_json_atomic(PORTFOLIO_LIST_FILE, portfolio_list)
 
 def load_portfolio(portfolio_id: str):
     """Belirli bir portföyün verilerini yükle"""
@@ -695,10 +1268,7 @@ def load_portfolio(portfolio_id: str):
 
 def save_portfolio(portfolio_id: str, portfolio_data):
     """Belirli bir portföyün verilerini kaydet"""
-    os.makedirs(PORTFOLIO_DIR, exist_ok=True)
-    portfolio_file = os.path.join(PORTFOLIO_DIR, f"{portfolio_id}.json")
-    with open(portfolio_file, 'w', encoding='utf-8') as f:
-        json.dump(portfolio_data, f, ensure_ascii=False, indent=2)
+    write_json_atomic(os.path.join(PORTFOLIO_DIR, f"{portfolio_id}.json"), portfolio_data)
 
 # ---------- Takip Listesi Veri Yönetimi ----------
 def load_watchlist():
@@ -713,9 +1283,7 @@ def load_watchlist():
 
 def save_watchlist(watchlist):
     """Takip listesi verilerini kaydet"""
-    os.makedirs(os.path.dirname(WATCHLIST_FILE), exist_ok=True)
-    with open(WATCHLIST_FILE, 'w', encoding='utf-8') as f:
-        json.dump(watchlist, f, ensure_ascii=False, indent=2)
+    write_json_atomic(WATCHLIST_FILE, watchlist)
 
 def generate_id():
     """Benzersiz ID oluştur"""
@@ -744,56 +1312,64 @@ REQUEST_DELAY = 10.0  # İstek başına minimum 10 saniye bekleme (manuel tarama
 MAX_CONCURRENT_REQUESTS = 3  # Aynı anda maksimum 3 paralel istek
 REQUEST_QUEUE = deque()  # İstek kuyruğu
 QUEUE_LOCK = Lock()  # Thread-safe queue erişimi
-LAST_REQUEST_TIME = 0  # Son istek zamanı
+LAST_REQUEST_TIME = 0  # Son istek zamanı (database'e ulaşılamazsa kullanılan yerel saat)
+RATE_LIMIT_CLOCK = "tradingview"  # rate_limits tablosundaki paylaşılan saat
 
-def wait_for_rate_limit():
-    """Rate limiting için bekleme"""
+def reserve_request_slot(delay: float) -> float:
+    """Paylaşılan saatte bir sonraki istek zamanını ayır, beklenecek süreyi döndür.
+    Saat database'de tutulur: tüm web worker'ları ve fiyat worker'ı aynı bütçeyi paylaşır.
+    Sırayı database işlemi (BEGIN IMMEDIATE) belirler; QUEUE_LOCK sadece yerel saat için tutulur.
+    Database'e gittiği için async koddan run_io ile çağrılmalıdır."""
     global LAST_REQUEST_TIME
-    current_time = time.time()
-    time_since_last = current_time - LAST_REQUEST_TIME
-    
-    if time_since_last < REQUEST_DELAY:
-        sleep_time = REQUEST_DELAY - time_since_last
+    try:
+        slot = reserve_shared_slot(RATE_LIMIT_CLOCK, delay, time.time())
+        with QUEUE_LOCK:
+            LAST_REQUEST_TIME = max(LAST_REQUEST_TIME, slot)
+    except sqlite3.Error as e:
+        print(f"⚠️ Paylaşılan rate limit saati okunamadı, yerel saat kullanılıyor: {e}")
+        with QUEUE_LOCK:
+            slot = LAST_REQUEST_TIME = max(time.time(), LAST_REQUEST_TIME + delay)
+    wait = max(0.0, slot - time.time())
+    RATE_LIMIT_WAIT_SECONDS.observe(wait)
+    return wait
+
+def wait_for_rate_limit(delay: float = REQUEST_DELAY):
+    """Rate limiting için bekleme - tüm upstream istekleri aynı saati paylaşır"""
+    if not MARKET_DATA.rate_limited:
+        return  # Replay sağlayıcısı dış servise gitmez
+    sleep_time = reserve_request_slot(delay)
+    if sleep_time > 0:
         print(f"Rate limiting: {sleep_time:.1f} saniye bekleniyor...")
-        time.sleep(sleep_time)
-    
-    LAST_REQUEST_TIME = time.time()
+        with tracing.span("rate_limit_wait", wait_s=round(sleep_time, 3)):
+            time.sleep(sleep_time)
+
+async def async_wait_for_rate_limit(delay: float = REQUEST_DELAY):
+    """wait_for_rate_limit'in event loop'u bloklamayan karşılığı (aynı saat)"""
+    if not MARKET_DATA.rate_limited:
+        return
+    sleep_time = await run_io(reserve_request_slot, delay)
+    if sleep_time > 0:
+        print(f"Rate limiting: {sleep_time:.1f} saniye bekleniyor...")
+        with tracing.span("rate_limit_wait", wait_s=round(sleep_time, 3)):
+            await asyncio.sleep(sleep_time)
 
 # ---------- BIST Hisse Fonksiyonları ----------
+# Hisseler enstrüman kataloğundan gelir (bkz. get_instrument_registry); indeks bir kez kurulur,
+# arama ve sembol bulma her istekte listeyi taramaz
 def get_all_bist_stocks():
-    """Tüm BIST hisselerini birleştir"""
-    return BIST_STOCKS_AK + BIST_STOCKS_LZ
+    """Tüm BIST hisseleri"""
+    return get_instrument_registry("bist").entries()
 
 def get_bist_stock_by_symbol(symbol: str):
     """Sembol ile BIST hissesi bul"""
-    # Önce A-K listesinde ara
-    stock = get_stocks_ak_by_symbol(symbol)
-    if stock:
-        return stock
-    
-    # Sonra L-Z listesinde ara
-    stock = get_stocks_lz_by_symbol(symbol)
-    if stock:
-        return stock
-    
-    return None
+    return get_instrument_registry("bist").get(symbol)
 
-def search_bist_stocks(query: str):
-    """BIST hisselerinde arama yap"""
-    results = []
-    
-    # A-K listesinde ara
-    ak_results = search_stocks_ak(query)
-    results.extend(ak_results)
-    
-    # L-Z listesinde ara
-    lz_results = search_stocks_lz(query)
-    results.extend(lz_results)
-    
-    return results
+def search_bist_stocks(query: str, limit: Optional[int] = None):
+    """BIST hisselerinde puanlı arama - (en iyi sonuçlar, toplam eşleşme)"""
+    return get_instrument_registry("bist").search(query, limit)
 
 # ---------- Utility Fonksiyonları ----------
-def atr(df: pd.DataFrame, n: int = 14) -> pd.Series:
+def atr(df: "pd.DataFrame", n: int = 14) -> "pd.Series":
     """Average True Range hesaplama - Güvenli versiyon"""
     try:
         if df.empty or len(df) < 2:
@@ -826,120 +1402,298 @@ def atr(df: pd.DataFrame, n: int = 14) -> pd.Series:
         # Hata durumunda minimum değer döndür
         return pd.Series([0.001] * len(df))
 
-def obv(df: pd.DataFrame) -> pd.Series:
+def obv(df: "pd.DataFrame") -> "pd.Series":
     """On Balance Volume hesaplama"""
     up = (df["close"] > df["close"].shift(1)).astype(int)
     down = (df["close"] < df["close"].shift(1)).astype(int) * -1
     dirn = (up + down).fillna(0)
     return (dirn * df["volume"]).cumsum()
 
-def ema(s: pd.Series, n: int) -> pd.Series:
+def ema(s: "pd.Series", n: int) -> "pd.Series":
     """Exponential Moving Average hesaplama"""
     return s.ewm(span=n, adjust=False).mean()
 
-def ccxt_ohlcv(exchange: str, symbol: str, tf: str = "1d", limit: int = 400) -> pd.DataFrame:
+# ---------- Dış Servis Koruması ----------
+# Sürekli hata veren semboller negatif önbellekte üstel artan süreyle atlanır (rate limit harcamaz);
+# art arda UPSTREAM_BREAKER_THRESHOLD kez 429 alan servise devre kesici açılana kadar istek gönderilmez.
+UPSTREAM_BREAKER_THRESHOLD = int(os.environ.get("UPSTREAM_BREAKER_THRESHOLD", 3))
+UPSTREAM_BREAKER_COOLDOWN = float(os.environ.get("UPSTREAM_BREAKER_COOLDOWN", 60))
+SYMBOL_FAILURE_BASE_DELAY = float(os.environ.get("SYMBOL_FAILURE_BASE_DELAY", 300))
+UPSTREAM_BREAKERS: Dict[str, CircuitBreaker] = {}
+UPSTREAM_BREAKERS_LOCK = Lock()
+SYMBOL_FAILURES = FailureCache(base_delay=SYMBOL_FAILURE_BASE_DELAY)  # (upstream, SEMBOL, market) -> hata
+
+def get_upstream_breaker(name: str) -> CircuitBreaker:
+    """Servis başına tek devre kesici"""
+    with UPSTREAM_BREAKERS_LOCK:
+        if name not in UPSTREAM_BREAKERS:
+            UPSTREAM_BREAKERS[name] = CircuitBreaker(name, threshold=UPSTREAM_BREAKER_THRESHOLD, cooldown=UPSTREAM_BREAKER_COOLDOWN)
+        return UPSTREAM_BREAKERS[name]
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """429 / rate limit hatası mı"""
+    # ccxt hiç yüklenmediyse hata ccxt'den gelmiş olamaz (kontrol import tetiklemesin)
+    if lazy_imports.is_loaded("ccxt") and isinstance(error, (ccxt.RateLimitExceeded, ccxt.DDoSProtection)):
+        return True
+    message = str(error)
+    return "429" in message or "rate limit" in message.lower()
+
+def is_transient_error(error: Exception) -> bool:
+    """Sembolden bağımsız ağ hatası mı (negatif önbelleğe yazılmaz)"""
+    network_errors = (requests.ConnectionError, requests.Timeout, httpx.TransportError)
+    if lazy_imports.is_loaded("ccxt"):
+        network_errors += (ccxt.NetworkError,)
+    return isinstance(error, network_errors) and not is_rate_limit_error(error)
+
+def upstream_blocked(upstream: str, failure_key: tuple) -> bool:
+    """İstek gönderilmeden atlanmalı mı: sembol negatif önbellekte ya da servisin devresi açık"""
+    if SYMBOL_FAILURES.should_skip((upstream, *failure_key)):
+        UPSTREAM_SKIPPED.labels(upstream, "negative_cache").inc()
+        print(f"⏭️ {failure_key[0]} atlandı: son denemeler başarısız ({upstream})")
+        return True
+    if not get_upstream_breaker(upstream).allow():
+        UPSTREAM_SKIPPED.labels(upstream, "breaker").inc()
+        print(f"⏭️ {failure_key[0]} atlandı: {upstream} devre kesici açık")
+        return True
+    return False
+
+def record_upstream_result(upstream: str, failure_key: tuple, ok: bool, error: Optional[Exception] = None) -> None:
+    """İstek sonucunu devre kesiciye ve negatif önbelleğe işle"""
+    breaker = get_upstream_breaker(upstream)
+    if error is not None and is_rate_limit_error(error):
+        breaker.record_throttle()
+        return
+    if error is not None and is_transient_error(error):
+        return
+    # Servis yanıt verdi (hata sembole özgü olabilir): art arda 429 serisi bozulur
+    breaker.record_success()
+    if ok:
+        SYMBOL_FAILURES.record_success((upstream, *failure_key))
+    else:
+        delay = SYMBOL_FAILURES.record_failure((upstream, *failure_key))
+        print(f"🚫 {failure_key[0]} {delay:.0f} sn boyunca atlanacak ({upstream})")
+
+@contextmanager
+def track_upstream(upstream: str):
+    """Dış servis çağrısının süresini ve sonucunu (ok|throttled|error) metriklere yaz"""
+    start = time.perf_counter()
+    result = "ok"
+    try:
+        yield
+    except Exception as e:
+        result = "throttled" if is_rate_limit_error(e) else "error"
+        raise
+    finally:
+        UPSTREAM_REQUEST_SECONDS.labels(upstream).observe(time.perf_counter() - start)
+        UPSTREAM_REQUESTS.labels(upstream, result).inc()
+
+def ccxt_ohlcv(exchange: str, symbol: str, tf: str = "1d", limit: int = 400) -> "pd.DataFrame":
     """CCXT ile OHLCV verisi çekme"""
+    failure_key = (symbol.upper(), tf)
+    if upstream_blocked(exchange, failure_key):
+        return pd.DataFrame()
     try:
-        ex = getattr(ccxt, exchange)({"enableRateLimit": True})
-        ohlcv = ex.fetch_ohlcv(symbol, timeframe=tf, limit=limit)
+        with track_upstream(exchange):
+            ohlcv = MARKET_DATA.ohlcv(exchange, symbol, tf, limit)
         df = pd.DataFrame(ohlcv, columns=["ts", "open", "high", "low", "close", "volume"])
+        record_upstream_result(exchange, failure_key, ok=True)
         return df
     except Exception as e:
         print(f"CCXT error for {symbol}: {e}")
+        record_upstream_result(exchange, failure_key, ok=False, error=e)
         return pd.DataFrame()
 
+# ---------- TradingView Scanner İstemcisi ----------
+# Tüm TradingView istekleri havuzlu keep-alive bağlantılar üzerinden; çok sembollü taramalar
+# TV_SCAN_BATCH_SIZE'lık tek scanner istekleriyle yapılır (sembol başına istek + bekleme yerine).
+TV_SCAN_BATCH_SIZE = 50
+TV_CLIENT = TradingViewClient(timeout=30.0, max_connections=MAX_CONCURRENT_REQUESTS * 2, max_keepalive=MAX_CONCURRENT_REQUESTS)
+
+# Piyasa verisi sağlayıcısı: live (varsayılan), record (canlı + diske kayıt), replay (kayıttan, ağsız)
+MARKET_DATA_PROVIDER = os.environ.get("MARKET_DATA_PROVIDER", "live")
+MARKET_DATA = create_provider(
+    MARKET_DATA_PROVIDER,
+    TV_CLIENT,
+    capture_dir=os.environ.get("MARKET_DATA_CAPTURE_DIR", os.path.join(DATA_DIR, "market_captures")),
+    latency=float(os.environ.get("MARKET_DATA_REPLAY_LATENCY", 0)),
+    error_rate=float(os.environ.get("MARKET_DATA_REPLAY_ERROR_RATE", 0)),
+    error_status=int(os.environ.get("MARKET_DATA_REPLAY_ERROR_STATUS", 503)),
+    seed=int(os.environ["MARKET_DATA_REPLAY_SEED"]) if os.environ.get("MARKET_DATA_REPLAY_SEED") else None
+)
+if MARKET_DATA_PROVIDER != "live":
+    print(f"📼 Piyasa verisi sağlayıcısı: {MARKET_DATA_PROVIDER}")
+TV_PRICE_MARKETS = ("bist", "crypto")  # Fiyat yenilemesi yapılan piyasalar
+
+def tv_market_params(market: str) -> tuple:
+    """Piyasa -> (TradingView exchange, screener)"""
+    if market == "crypto":
+        return "BINANCE", "crypto"
+    if market == "bist":
+        return "BIST", "turkey"
+    if market == "us":
+        return "NASDAQ", "america"
+    if market == "fx":
+        return "FX_IDC", "america"
+    return "BINANCE", "america"
+
+def tv_interval(tf: str) -> str:
+    """Timeframe'i TradingView formatına çevir"""
+    return "4h" if tf == "4h" else "1d"
+
+async def tv_scan_symbols(symbols: List[str], market: str, interval: str = "1d", columns: Optional[List[str]] = None,
+                          delay: float = REQUEST_DELAY, on_batch=None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Sembolleri batch'ler halinde scanner'dan sorgula -> {sembol: kolon değerleri | None}.
+    Negatif önbellekteki semboller atlanır; devre açılırsa kalan batch'ler gönderilmez."""
+    exchange, screener = tv_market_params(market)
+    values: Dict[str, Optional[Dict[str, Any]]] = {symbol: None for symbol in symbols}
+    allowed = [symbol for symbol in symbols if not upstream_blocked("tradingview", (symbol.upper(), market))]
+    done = len(symbols) - len(allowed)
+    
+    for start in range(0, len(allowed), TV_SCAN_BATCH_SIZE):
+        batch = allowed[start:start + TV_SCAN_BATCH_SIZE]
+        if start and not get_upstream_breaker("tradingview").allow():
+            print(f"⏭️ {len(allowed) - start} sembol atlandı: tradingview devre kesici açık")
+            break
+        
+        tickers = {f"{exchange}:{symbol}": symbol for symbol in batch}
+        await async_wait_for_rate_limit(delay)
+        print(f"TradingView API isteği: {len(batch)} sembol ({exchange}) - {time.strftime('%H:%M:%S')}")
+        try:
+            with tracing.span("tv_fetch", symbols=len(batch), first=batch[0], last=batch[-1]), track_upstream("tradingview"):
+                rows = await MARKET_DATA.ascan(screener, list(tickers), interval, columns)
+        except Exception as e:
+            print(f"TradingView error ({len(batch)} sembol): {e}")
+            if is_rate_limit_error(e):
+                get_upstream_breaker("tradingview").record_throttle()
+            rows = None
+        
+        if rows is not None:
+            for ticker, symbol in tickers.items():
+                values[symbol] = rows[ticker]
+                record_upstream_result("tradingview", (symbol.upper(), market), ok=rows[ticker] is not None)
+        
+        done += len(batch)
+        if on_batch:
+            on_batch(done, batch[-1])
+    
+    return values
+
+def analysis_cache_key(symbol: str, market: str, tf: str) -> str:
+    return f"{market}|{tf}|{symbol.upper()}"
+
+async def tv_get_analyses(symbols: List[str], market: str, tf: str = "1d", on_batch=None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Çok sembol için teknik analiz - {sembol: tv_get_analysis ile aynı sözlük | None}.
+    ANALYSIS_CACHE_TTL içinde çekilmiş analizler önbellekten döner, sadece eksikler istenir."""
+    if ANALYSIS_CACHE_TTL <= 0:
+        return await tv_fetch_analyses(symbols, market, tf, on_batch)
+    keys = {symbol: analysis_cache_key(symbol, market, tf) for symbol in symbols}
+    cached = await run_io(ANALYSIS_CACHE.get_many, list(keys.values()))
+    results = {symbol: cached[key] for symbol, key in keys.items() if key in cached}
+    missing = [symbol for symbol in symbols if symbol not in results]
+    if missing:
+        # İlerleme önbellekten gelenler dahil sayılır
+        progress = (lambda done, last_symbol: on_batch(len(results) + done, last_symbol)) if on_batch else None
+        fetched = await tv_fetch_analyses(missing, market, tf, progress)
+        await run_io(ANALYSIS_CACHE.set_many, {keys[symbol]: result for symbol, result in fetched.items() if result}, ANALYSIS_CACHE_TTL)
+        results.update(fetched)
+    elif on_batch and results:
+        on_batch(len(results), symbols[-1])  # Tamamı önbellekten: ilerleme tek adımda tamamlanır
+    return results
+
+async def tv_fetch_analyses(symbols: List[str], market: str, tf: str = "1d", on_batch=None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Önbelleğe bakmadan TradingView scanner'dan analiz çek"""
+    exchange, screener = tv_market_params(market)
+    interval = tv_interval(tf)
+    rows = await tv_scan_symbols(symbols, market, interval, on_batch=on_batch)
+    results = {}
+    with tracing.span("build_analysis", symbols=len(rows)):
+        for symbol, values in rows.items():
+            analysis = build_analysis(values, screener, f"{exchange}:{symbol}", interval)
+            results[symbol] = tv_analysis_result(symbol, market, analysis) if analysis else None
+    return results
+
+async def tv_get_analysis_async(symbol: str, market: str, tf: str = "1d") -> Optional[Dict[str, Any]]:
+    """tv_get_analysis'in event loop'u bloklamayan karşılığı; aynı sembole eşzamanlı istekler tek çekimde birleşir"""
+    async def load():
+        return (await tv_fetch_analyses([symbol], market, tf)).get(symbol)
+    return await ANALYSIS_CACHE.aget_or_set(analysis_cache_key(symbol, market, tf), load, ANALYSIS_CACHE_TTL, run=run_io)
+
+def tv_analysis_result(symbol: str, market: str, analysis) -> Dict[str, Any]:
+    """TA_Handler analizini API sözlüğüne çevir"""
+    return {
+        "symbol": symbol,
+        "market": market,
+        "close": analysis.indicators.get("close", 0),
+        "high": analysis.indicators.get("high", 0),
+        "low": analysis.indicators.get("low", 0),
+        "volume": analysis.indicators.get("volume", 0),
+        "rsi": analysis.indicators.get("RSI", 50),
+        "macd": analysis.indicators.get("MACD.macd", 0),
+        "macd_signal": analysis.indicators.get("MACD.signal", 0),
+        "sma_20": analysis.indicators.get("SMA20", 0),
+        "sma_50": analysis.indicators.get("SMA50", 0),
+        "ema_20": analysis.indicators.get("EMA20", 0),
+        "ema_50": analysis.indicators.get("EMA50", 0),
+        "bb_upper": analysis.indicators.get("BB.upper", 0),
+        "bb_lower": analysis.indicators.get("BB.lower", 0),
+        "bb_middle": analysis.indicators.get("BB.middle", 0),
+        "atr": analysis.indicators.get("ATR", 0),
+        "summary": analysis.summary,
+        "oscillators": analysis.oscillators,
+        "moving_averages": analysis.moving_averages,
+        "indicators": analysis.indicators
+    }
+
 def tv_get_analysis(symbol: str, market: str, tf: str = "1d") -> Optional[Dict[str, Any]]:
     """TradingView'dan teknik analiz verisi çekme - Rate Limited"""
+    failure_key = (symbol.upper(), market)
+    # Bilinen hatalı sembol veya açık devre: rate limit beklemeden atla
+    if upstream_blocked("tradingview", failure_key):
+        return None
+    
+    exchange, screener = tv_market_params(market)
+    interval = tv_interval(tf)
+    ticker = f"{exchange}:{symbol}"
     try:
         # Rate limiting uygula
         wait_for_rate_limit()
         
-        # Market'e göre exchange belirle
-        if market == "crypto":
-            exchange = "BINANCE"
-        elif market == "bist":
-            exchange = "BIST"
-        elif market == "us":
-            exchange = "NASDAQ"
-        elif market == "fx":
-            exchange = "FX_IDC"
-        else:
-            exchange = "BINANCE"
-        
-        # Timeframe'i TradingView formatına çevir
-        if tf == "1d":
-            interval = "1d"
-        elif tf == "4h":
-            interval = "4h"
-        else:
-            interval = "1d"
-        
         print(f"TradingView API isteği: {symbol} ({exchange}) - {time.strftime('%H:%M:%S')}")
         
-        # TradingView handler oluştur
-        print(f"🔍 DEBUG: Handler oluşturuluyor - Symbol: {symbol}, Exchange: {exchange}, Screener: {'crypto' if market == 'crypto' else 'turkey' if market == 'bist' else 'america'}")
-        
-        handler = TA_Handler(
-            symbol=symbol,
-            exchange=exchange,
-            screener="crypto" if market == "crypto" else "turkey" if market == "bist" else "america",
-            interval=interval,
-            timeout=30  # Timeout'u artır
-        )
-        
-        print(f"🔍 DEBUG: Handler oluşturuldu, analiz alınıyor...")
-        
-        # Analiz verisi çek
-        analysis = handler.get_analysis()
-        
-        print(f"🔍 DEBUG: Analiz sonucu: {analysis}")
+        # Analiz verisi çek (havuzlu bağlantı üzerinden)
+        with tracing.span("tv_fetch", symbol=symbol), track_upstream("tradingview"):
+            values = MARKET_DATA.scan(screener, [ticker], interval)[ticker]
+        analysis = build_analysis(values, screener, ticker, interval)
+        record_upstream_result("tradingview", failure_key, ok=bool(analysis))
         
         if analysis:
-            result = {
-                "symbol": symbol,
-                "market": market,
-                "close": analysis.indicators.get("close", 0),
-                "high": analysis.indicators.get("high", 0),
-                "low": analysis.indicators.get("low", 0),
-                "volume": analysis.indicators.get("volume", 0),
-                "rsi": analysis.indicators.get("RSI", 50),
-                "macd": analysis.indicators.get("MACD.macd", 0),
-                "macd_signal": analysis.indicators.get("MACD.signal", 0),
-                "sma_20": analysis.indicators.get("SMA20", 0),
-                "sma_50": analysis.indicators.get("SMA50", 0),
-                "ema_20": analysis.indicators.get("EMA20", 0),
-                "ema_50": analysis.indicators.get("EMA50", 0),
-                "bb_upper": analysis.indicators.get("BB.upper", 0),
-                "bb_lower": analysis.indicators.get("BB.lower", 0),
-                "bb_middle": analysis.indicators.get("BB.middle", 0),
-                "atr": analysis.indicators.get("ATR", 0),
-                "summary": analysis.summary,
-                "oscillators": analysis.oscillators,
-                "moving_averages": analysis.moving_averages,
-                "indicators": analysis.indicators
-            }
-            print(f"🔍 DEBUG: tv_get_analysis döndürüyor: {result}")
+            result = tv_analysis_result(symbol, market, analysis)
+            print(f"🔍 DEBUG: tv_get_analysis döndürüyor: {symbol} close={result['close']}")
             return result
         
         return None
         
     except Exception as e:
         print(f"TradingView error for {symbol}: {e}")
+        record_upstream_result("tradingview", failure_key, ok=False, error=e)
         
-        # 429 hatası için özel bekleme
-        if "429" in str(e) or "rate limit" in str(e).lower():
+        # 429 hatası için özel bekleme - devre açıldıysa tekrar denenmez
+        if is_rate_limit_error(e) and get_upstream_breaker("tradingview").allow():
             print(f"Rate limit hatası! {symbol} için 15 saniye ek bekleme...")
             time.sleep(15)
             
             # 2. deneme yap
             try:
                 print(f"2. deneme: {symbol} için TradingView API'ye tekrar istek atılıyor...")
-                analysis = handler.get_analysis()
+                with tracing.span("tv_fetch", symbol=symbol, attempt=2), track_upstream("tradingview"):
+                    values = MARKET_DATA.scan(screener, [ticker], interval)[ticker]
+                analysis = build_analysis(values, screener, ticker, interval)
+                record_upstream_result("tradingview", failure_key, ok=bool(analysis))
                 if analysis:
-                    # Analiz başarılı, devam et
-                    pass
+                    return tv_analysis_result(symbol, market, analysis)
             except Exception as retry_error:
                 print(f"2. deneme de başarısız: {symbol} - {retry_error}")
+                record_upstream_result("tradingview", failure_key, ok=False, error=retry_error)
         
         return None
 
@@ -1412,6 +2166,7 @@ CRYPTO_TOP_10 = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "ADAUSDT",
                   "AVAXUSDT", "DOTUSDT", "MATICUSDT", "LINKUSDT", "UNIUSDT"]
 
 # Market cap'e göre en büyük 100 USDT paritesi crypto token (Tekrarlar temizlendi)
+# Başlangıç verisi: çalışma zamanında liste instruments tablosundan okunur (Enstrüman Kataloğu)
 CRYPTO_TOP_100 = [
     # Top 10 - Blue Chips
     "BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "ADAUSDT", 
@@ -1437,13 +2192,138 @@ CRYPTO_TOP_100 = [
     "DENTUSDT", "HIVEUSDT", "STMXUSDT", "TRBUSDT", "VTHOUSDT",
     
     # Top 76-100 - Emerging Projects & DeFi
-    "ROSEUSDT", "IOTXUSDT", "ONEUSDT", "HARMONYUSDT", "ZILUSDT",
+    "ROSEUSDT", "IOTXUSDT", "ONEUSDT", "ZILUSDT",
     "ICXUSDT", "ONTUSDT", "WANUSDT", "WTCUSDT", "NULSUSDT",
-    "RLCUSDT", "GNTUSDT", "REPUSDT", "BTSUSDT", "LSKUSDT",
+    "RLCUSDT", "BTSUSDT", "LSKUSDT",
     "ARKUSDT", "NAVUSDT", "PIVXUSDT", "DGBUSDT", "SYSUSDT",
     "VIAUSDT", "MONAUSDT", "XVGUSDT", "AXSUSDT", "SLPUSDT"
 ]
 
+# ---------- Enstrüman Kataloğu ----------
+# Sembol evreni database'deki instruments tablosunda tutulur; BIST modülleri ve yukarıdaki listeler
+# yalnızca başlangıç verisidir. Katalog ilk kullanımda yüklenir ve INSTRUMENT_CACHE_TTL sonra
+# database'den yeniden okunur (worker'ın veya admin'in yaptığı değişiklikler yeniden başlatmadan görünür).
+# Kripto listesi borsanın market listesiyle (ccxt load_markets) doğrulanır; işlem görmeyen
+# pariteler pasife alınır ve taramalarda rate limit harcamaz.
+INSTRUMENT_CACHE_TTL = 300
+INSTRUMENT_REFRESH_INTERVAL = int(os.environ.get("INSTRUMENT_REFRESH_INTERVAL", 24 * 60 * 60))  # 0: kapalı
+INSTRUMENT_EXCHANGE = "binance"
+INSTRUMENT_MARKETS = ("bist", "crypto", "us", "fx")
+INSTRUMENT_CATALOG: Dict[str, Dict[str, Any]] = {}  # market -> {"registry", "loaded_at"}
+INSTRUMENT_SEEDED: set = set()  # Bu süreçte başlangıç verisi yazılmış piyasalar
+INSTRUMENT_LOCK = Lock()
+
+def instrument_seed(market: str) -> List[Dict[str, str]]:
+    """Piyasanın kod içindeki başlangıç listesi"""
+    if market == "bist":
+        return [{"symbol": stock["symbol"], "name": stock["name"]} for stock in BIST_STOCKS_AK + BIST_STOCKS_LZ]
+    if market == "crypto":
+        return [{"symbol": symbol, "name": symbol.replace("USDT", "")} for symbol in CRYPTO_TOP_100]
+    if market == "us":
+        return [{"symbol": symbol, "name": symbol} for symbol in US]
+    if market == "fx":
+        return [{"symbol": symbol, "name": symbol} for symbol in FX]
+    return []
+
+def seed_instruments(conn, market: str) -> None:
+    """Başlangıç listesindeki yeni sembolleri ekle; mevcut kayıtların (pasif olanlar dahil) durumuna dokunma"""
+    now = datetime.now().isoformat()
+    conn.executemany('''
+        INSERT OR IGNORE INTO instruments (market, symbol, name, rank, active, updated_at)
+        VALUES (?, ?, ?, ?, 1, ?)
+    ''', [(market, entry["symbol"], entry["name"], rank, now) for rank, entry in enumerate(instrument_seed(market))])
+    conn.commit()
+    INSTRUMENT_SEEDED.add(market)
+
+def load_instruments(market: str) -> SymbolRegistry:
+    """Piyasanın aktif enstrümanlarını database'den okuyup indeksle"""
+    with get_db_connection() as conn:
+        if market not in INSTRUMENT_SEEDED:
+            seed_instruments(conn, market)
+        rows = conn.execute(
+            'SELECT symbol, name FROM instruments WHERE market = ? AND active = 1 ORDER BY rank, symbol',
+            (market,)
+        ).fetchall()
+    return SymbolRegistry({"symbol": row["symbol"], "name": row["name"]} for row in rows)
+
+def get_instrument_registry(market: str) -> SymbolRegistry:
+    """Piyasanın sembol indeksini döndür - gerekirse (ilk kullanım/TTL) database'den yükle"""
+    with INSTRUMENT_LOCK:
+        cached = INSTRUMENT_CATALOG.get(market)
+    if cached and time.time() - cached["loaded_at"] < INSTRUMENT_CACHE_TTL:
+        CACHE_REQUESTS.labels("instruments", "hit").inc()
+        return cached["registry"]
+    CACHE_REQUESTS.labels("instruments", "miss").inc()
+    
+    try:
+        registry = load_instruments(market)
+    except Exception as e:
+        print(f"❌ Enstrüman kataloğu yüklenemedi ({market}): {e}")
+        # Database erişilemezse eldeki indeks, o da yoksa başlangıç verisi kullanılır
+        registry = cached["registry"] if cached else SymbolRegistry(instrument_seed(market))
+    
+    with INSTRUMENT_LOCK:
+        INSTRUMENT_CATALOG[market] = {"registry": registry, "loaded_at": time.time()}
+    return registry
+
+def get_instrument_symbols(market: str) -> List[str]:
+    """Piyasanın aktif sembolleri, katalog sırasıyla"""
+    return [entry["symbol"] for entry in get_instrument_registry(market).entries()]
+
+def reload_instruments(market: Optional[str] = None) -> None:
+    """Bellekteki katalogu düşür; sonraki kullanımda database'den okunur"""
+    SEARCH_CACHE.clear()
+    with INSTRUMENT_LOCK:
+        if market:
+            INSTRUMENT_CATALOG.pop(market, None)
+        else:
+            INSTRUMENT_CATALOG.clear()
+
+def refresh_crypto_instruments() -> Dict[str, Any]:
+    """Kripto kataloğunu borsanın market listesiyle karşılaştır: listeden çıkan pariteleri pasife al,
+    yeniden listelenenleri geri aç"""
+    ex = getattr(ccxt, INSTRUMENT_EXCHANGE)({"enableRateLimit": True})
+    markets = ex.load_markets()
+    # market['id'] borsanın kendi sembolü (BTCUSDT); base/quote ccxt'nin birleşik adları olup
+    # bazı paritelerde borsadaki addan farklıdır
+    listed = {
+        market["id"]
+        for market in markets.values()
+        if market.get("spot") and market.get("quote") == "USDT" and market.get("active") is not False
+    }
+    if not listed:
+        # Boş/eksik yanıtla tüm kataloğu pasife almamak için
+        raise RuntimeError("Borsa market listesi boş döndü")
+    
+    now = datetime.now().isoformat()
+    with get_db_connection() as conn:
+        if "crypto" not in INSTRUMENT_SEEDED:
+            seed_instruments(conn, "crypto")
+        rows = conn.execute('SELECT symbol, active FROM instruments WHERE market = ?', ("crypto",)).fetchall()
+        pruned = [row["symbol"] for row in rows if row["active"] and row["symbol"] not in listed]
+        restored = [row["symbol"] for row in rows if not row["active"] and row["symbol"] in listed]
+        conn.executemany(
+            'UPDATE instruments SET active = ?, updated_at = ? WHERE market = ? AND symbol = ?',
+            [(0, now, "crypto", symbol) for symbol in pruned] + [(1, now, "crypto", symbol) for symbol in restored]
+        )
+        conn.commit()
+    
+    reload_instruments("crypto")
+    if pruned or restored:
+        print(f"🧹 Kripto kataloğu güncellendi: pasif {pruned}, geri açılan {restored}")
+    return {"listed_pairs": len(listed), "pruned": pruned, "restored": restored}
+
+async def instrument_refresh_loop():
+    """Kripto kataloğunu INSTRUMENT_REFRESH_INTERVAL aralıkla borsa listesine göre güncelle"""
+    while True:
+        try:
+            await run_io(refresh_crypto_instruments)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Kripto kataloğu yenilenemedi: {e}")
+        await asyncio.sleep(INSTRUMENT_REFRESH_INTERVAL)
+
 # ---------- Pydantic Modelleri ----------
 class ScanItem(BaseModel):
     symbol: str
@@ -1467,15 +2347,25 @@ class ChartResponse(BaseModel):
     stops: Dict[str, float]
 
 # ---------- API Endpoints ----------
+@app.get("/metrics")
+async def metrics_endpoint(token: Optional[str] = None, authorization: Optional[str] = Header(None)):
+    """Prometheus metin formatında metrikler (METRICS_TOKEN ayarlıysa token gerekir)"""
+    if METRICS_TOKEN:
+        bearer = authorization[7:] if authorization and authorization.startswith("Bearer ") else None
+        if METRICS_TOKEN not in (token, bearer):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Geçersiz metrik token'ı")
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/health")
 async def health_check():
     """Backend sağlık kontrolü"""
     try:
-        users = load_users()
+        users = await run_io(load_users)
         return {
             "status": "ok",
             "timestamp": datetime.now().isoformat(),
             "users_count": len(users),
+            "event_loop_lag_ms": round(LOOP_LAG.get() * 1000, 1),
             "backend": "DCA Scanner Backend",
             "version": "1.0.0"
         }
@@ -1490,7 +2380,7 @@ async def health_check():
 async def system_status():
     """Sistem durumu ve kullanıcı bilgileri"""
     try:
-        users = load_users()
+        users = await run_io(load_users)
         user_list = []
         
         for user in users:
@@ -1545,10 +2435,11 @@ def test_crypto():
     """Crypto test endpoint'i"""
     try:
         # Kripto token sayısını test et
-        crypto_count = len(CRYPTO_TOP_100)
+        crypto_symbols = get_instrument_symbols("crypto")
+        crypto_count = len(crypto_symbols)
         
         # İlk 10 token'ı göster
-        sample_tokens = CRYPTO_TOP_100[:10]
+        sample_tokens = crypto_symbols[:10]
         
         # Arama testi
         search_test = search_crypto("BTC", 5)
@@ -1613,17 +2504,17 @@ def search_bist(q: str = "", limit: int = 20):
             }
         
         # Arama yap
-        query = q.strip().upper()
-        results = search_bist_stocks(query)
-        
-        # Limit'e göre kırp
-        limited_results = results[:limit]
+        query = q.strip()
+        # Puanlanmış ilk `limit` sonuç heap ile seçilir; type-ahead tekrarları önbellekten
+        limited_results, total_found = SEARCH_CACHE.get_or_set(
+            f"bist|{limit}|{query.casefold()}", lambda: search_bist_stocks(query, limit), SEARCH_CACHE_TTL
+        )
         
         return {
             "success": True,
             "query": q,
             "results": limited_results,
-            "total_found": len(results),
+            "total_found": total_found,
             "total_available": len(get_all_bist_stocks()),
             "showing": len(limited_results)
         }
@@ -1637,36 +2528,27 @@ def search_bist(q: str = "", limit: int = 20):
 def search_crypto(q: str = "", limit: int = 20):
     """Crypto token'larda anında arama yap - type-ahead search"""
     try:
+        registry = get_instrument_registry("crypto")
         if not q or len(q.strip()) < 1:
             # Boş arama - ilk 20 token'ı göster
             return {
                 "success": True,
                 "query": q,
-                "results": [{"symbol": symbol, "name": symbol.replace("USDT", "")} for symbol in CRYPTO_TOP_100[:limit]],
+                "results": registry.entries()[:limit],
                 "total_found": limit,
-                "total_available": len(CRYPTO_TOP_100)
+                "total_available": len(registry)
             }
         
         # Arama yap
-        query = q.strip().upper()
-        results = []
-        
-        for symbol in CRYPTO_TOP_100:
-            if query in symbol or query in symbol.replace("USDT", ""):
-                results.append({
-                    "symbol": symbol,
-                    "name": symbol.replace("USDT", "")
-                })
-        
-        # Limit'e göre kırp
-        limited_results = results[:limit]
+        # Puanlanmış ilk `limit` sonuç heap ile seçilir
+        limited_results, total_found = registry.search(q, limit)
         
         return {
             "success": True,
             "query": q,
             "results": limited_results,
-            "total_found": len(results),
-            "total_available": len(CRYPTO_TOP_100),
+            "total_found": total_found,
+            "total_available": len(registry),
             "showing": len(limited_results)
         }
             
@@ -1680,10 +2562,11 @@ def symbols(market: str):
     """Piyasa sembollerini getir"""
     if market == "crypto":
         try:
-            # Market cap'e göre sıralanmış top 150 USDT çifti
+            # Market cap'e göre sıralanmış, borsada işlem gören USDT pariteleri
+            crypto_symbols = get_instrument_symbols("crypto")
             return {
-                "symbols": CRYPTO_TOP_100,
-                "total_count": len(CRYPTO_TOP_100),
+                "symbols": crypto_symbols,
+                "total_count": len(crypto_symbols),
                 "description": "Market cap'e göre en büyük 100 USDT paritesi crypto token"
             }
         except Exception as e:
@@ -1700,126 +2583,93 @@ def symbols(market: str):
         }
     
     elif market == "us":
-        return {"symbols": US}
+        return {"symbols": get_instrument_symbols("us")}
     
     elif market == "fx":
-        return {"symbols": FX}
+        return {"symbols": get_instrument_symbols("fx")}
     
     return {"symbols": []}
 
+# Tarama izleme: /scan?trace=true aşama span'lerini (rate limit, TradingView isteği, sinyal hesabı,
+# sıralama) scan_info.trace'e Chrome trace-event JSON'u olarak ekler; SCAN_TRACE_DIR ayarlıysa
+# trace ayrıca {scan_id}.trace.json dosyasına yazılır.
+SCAN_TRACE_DIR = os.environ.get("SCAN_TRACE_DIR")
+
 @app.get("/scan")
-def scan(market: str = "crypto", tf: str = "1d", lookback: int = 120, symbol: str = None):
+async def scan(market: str = "crypto", tf: str = "1d", lookback: int = 120, symbol: str = None, trace: bool = False,
+               authorization: str = Header(None)):
     """DCA taraması yap - symbol parametresi verilirse sadece o hisseyi tara"""
     results = []
     start_time = time.time()
+    scan_id = generate_id()  # WebSocket ilerleme olayları için
+    # İlerleme olayları sadece taramayı başlatan kullanıcıya (ve adminlere) gider; anonim taramada yayın yapılmaz
+    scan_owner = None
+    if authorization:
+        try:
+            scan_owner = (await run_io(get_current_user, authorization))["username"]
+        except HTTPException:
+            pass
+    tracer = tracing.Tracer("scan", scan_id=scan_id, market=market, tf=tf) if trace else None
+    trace_token = tracing.activate(tracer)
     
     try:
-        if market == "crypto":
-            # Kripto taraması - market cap'e göre top 150
-            print(f"Kripto taraması başlıyor: {len(CRYPTO_TOP_100)} sembol")
-            for i, symbol in enumerate(CRYPTO_TOP_100):
-                try:
-                    print(f"Taranıyor: {symbol} ({i+1}/{len(CRYPTO_TOP_100)})")
-                    analysis = tv_get_analysis(symbol, market, tf)
-                    if analysis is None:
-                        continue
-                    
+        if market == "bist" and symbol:
+            # Belirli bir hisseyi tara
+            stock = get_bist_stock_by_symbol(symbol.upper())
+            if not stock:
+                return {"error": f"Hisse {symbol} bulunamadı", "items": []}
+            try:
+                print(f"Tek hisse taranıyor: {symbol.upper()}")
+                analysis = await tv_get_analysis_async(symbol.upper(), market, tf)
+                if analysis is None:
+                    return {"error": f"Hisse {symbol} için veri bulunamadı", "items": []}
+                
+                with tracing.span("compute_signals_tv", symbol=symbol.upper()):
                     signals = compute_signals_tv(analysis)
-                    results.append({
-                        **{"symbol": symbol, "market": "crypto"}, 
-                        **signals
-                    })
-                except Exception as e:
-                    print(f"Error scanning {symbol}: {e}")
-                    continue
-        
-        elif market == "bist":
-            if symbol:
-                # Belirli bir hisseyi tara
-                stock = get_bist_stock_by_symbol(symbol.upper())
-                if stock:
-                    try:
-                        print(f"Tek hisse taranıyor: {symbol.upper()}")
-                        analysis = tv_get_analysis(symbol.upper(), market, tf)
-                        if analysis is None:
-                            return {"error": f"Hisse {symbol} için veri bulunamadı", "items": []}
-                        
-                        signals = compute_signals_tv(analysis)
-                        results.append({
-                            **{"symbol": symbol.upper(), "market": "bist", "name": stock["name"]}, 
-                            **signals
-                        })
-                        print(f"Scanned single stock: {symbol.upper()} - {stock['name']}")
-                    except Exception as e:
-                        print(f"Error scanning {symbol}: {e}")
-                        return {"error": f"Hisse {symbol} taranırken hata: {str(e)}", "items": []}
-                else:
-                    return {"error": f"Hisse {symbol} bulunamadı", "items": []}
-            else:
-                # Otomatik tarama - sadece test için 5 hisse
-                all_stocks = get_all_bist_stocks()
-                print(f"Auto-scanning 5 BIST stocks...")
-                
-                # Test için sadece ilk 5 hisseyi tara
-                test_stocks = all_stocks[:5]
-                
-                for i, stock in enumerate(test_stocks):
-                    symbol = stock["symbol"]
-                    try:
-                        print(f"BIST taranıyor: {symbol} ({i+1}/{len(test_stocks)})")
-                        analysis = tv_get_analysis(symbol, market, tf)
-                        if analysis is None:
-                            continue
-                        
-                        signals = compute_signals_tv(analysis)
-                        results.append({
-                            **{"symbol": symbol, "market": "bist", "name": stock["name"]}, 
-                            **signals
-                        })
-                    except Exception as e:
-                        print(f"Error scanning {symbol}: {e}")
-                        continue
-        
-        elif market == "us":
-            # US taraması - sadece 10 büyük
-            print(f"US taraması başlıyor: {len(US)} sembol")
-            for i, symbol in enumerate(US):
-                try:
-                    print(f"US taranıyor: {symbol} ({i+1}/{len(US)})")
-                    analysis = tv_get_analysis(symbol, market, tf)
-                    if analysis is None:
-                        continue
-                    
-                    signals = compute_signals_tv(analysis)
-                    results.append({
-                        **{"symbol": symbol, "market": "us"}, 
-                        **signals
-                    })
-                except Exception as e:
-                    print(f"Error scanning {symbol}: {e}")
-                    continue
-        
-        elif market == "fx":
-            # Forex taraması
-            print(f"Forex taraması başlıyor: {len(FX)} sembol")
-            for i, symbol in enumerate(FX):
-                try:
-                    print(f"Forex taranıyor: {symbol} ({i+1}/{len(FX)})")
-                    analysis = tv_get_analysis(symbol, market, tf)
-                    if analysis is None:
-                        continue
-                    
-                    signals = compute_signals_tv(analysis)
-                    results.append({
-                        **{"symbol": symbol, "market": "fx"}, 
-                        **signals
-                    })
+                results.append({
+                    **{"symbol": symbol.upper(), "market": "bist", "name": stock["name"]}, 
+                    **signals
+                })
+                print(f"Scanned single stock: {symbol.upper()} - {stock['name']}")
+            except Exception as e:
+                print(f"Error scanning {symbol}: {e}")
+                return {"error": f"Hisse {symbol} taranırken hata: {str(e)}", "items": []}
+        
+        elif market in ("crypto", "bist", "us", "fx"):
+            if market == "bist":
+                # Otomatik tarama - sadece test için ilk 5 hisse
+                stocks = get_all_bist_stocks()[:5]
+            else:
+                # Kripto: market cap'e göre, borsada işlem gören USDT pariteleri
+                stocks = get_instrument_registry(market).entries()
+            symbols = [stock["symbol"] for stock in stocks]
+            print(f"{market} taraması başlıyor: {len(symbols)} sembol")
+            
+            # Semboller TV_SCAN_BATCH_SIZE'lık scanner istekleriyle çekilir; her batch sonrası ilerleme yayılır
+            analyses = await tv_get_analyses(
+                symbols, market, tf,
+                on_batch=lambda done, last_symbol: publish_scan_progress(scan_id, market, done, len(symbols), last_symbol, scan_owner)
+            )
+            
+            for stock in stocks:
+                symbol = stock["symbol"]
+                analysis = analyses.get(symbol)
+                if analysis is None:
+                    continue
+                try:
+                    with tracing.span("compute_signals_tv", symbol=symbol):
+                        signals = compute_signals_tv(analysis)
+                    item = {"symbol": symbol, "market": market}
+                    if market == "bist":
+                        item["name"] = stock["name"]
+                    results.append({**item, **signals})
                 except Exception as e:
                     print(f"Error scanning {symbol}: {e}")
                     continue
         
         # Skora göre sırala
-        results = sorted(results, key=lambda x: x["score"], reverse=True)
+        with tracing.span("assembly", items=len(results)):
+            results = sorted(results, key=lambda x: x["score"], reverse=True)
         
         # Timing bilgisi
         end_time = time.time()
@@ -1833,26 +2683,46 @@ def scan(market: str = "crypto", tf: str = "1d", lookback: int = 120, symbol: st
         if results:
             print(f"Top 3 results: {[(r['symbol'], r['score'], r['category']) for r in results[:3]]}")
         
+        if scan_owner:
+            publish_ws_event_threadsafe({
+                "type": "scan_complete",
+                "scan_id": scan_id,
+                "market": market,
+                "count": len(results),
+                "total_time": round(total_time, 1)
+            }, "scan", username=scan_owner)
+        
+        scan_info = {
+            "scan_id": scan_id,
+            "market": market,
+            "total_time": round(total_time, 1),
+            "avg_time_per_symbol": round(avg_time_per_symbol, 1),
+            "rate_limited": True,
+            "request_delay": REQUEST_DELAY
+        }
+        if tracer:
+            scan_info["trace_summary"] = tracer.summary()
+            scan_info["trace"] = tracer.to_chrome()
+            if SCAN_TRACE_DIR:
+                scan_info["trace_file"] = tracer.write(SCAN_TRACE_DIR, f"{scan_id}.trace.json")
+        
         return {
             "items": results, 
             "count": len(results),
-            "scan_info": {
-                "market": market,
-                "total_time": round(total_time, 1),
-                "avg_time_per_symbol": round(avg_time_per_symbol, 1),
-                "rate_limited": True,
-                "request_delay": REQUEST_DELAY
-            }
+            "scan_info": scan_info
         }
     
     except Exception as e:
         return {"error": str(e), "items": []}
+    finally:
+        tracing.deactivate(trace_token)
+        SCAN_SECONDS.labels(market if market in INSTRUMENT_MARKETS else "other").observe(time.time() - start_time)
 
 @app.get("/chart")
-def chart(symbol: str, market: str, tf: str = "1d", lookback: int = 120):
+async def chart(symbol: str, market: str, tf: str = "1d", lookback: int = 120):
     """Grafik verilerini getir"""
     try:
-        analysis = tv_get_analysis(symbol, market, tf)
+        analysis = await tv_get_analysis_async(symbol, market, tf)
         
         if analysis is None:
             return {"error": "Veri bulunamadı"}
@@ -1917,7 +2787,7 @@ def chart(symbol: str, market: str, tf: str = "1d", lookback: int = 120):
         return {"error": f"Grafik verisi alınamadı: {str(e)}"}
 
 @app.get("/chart-bist")
-def chart_bist(symbol: str, tf: str = "1d", lookback: int = 120):
+async def chart_bist(symbol: str, tf: str = "1d", lookback: int = 120):
     """BIST hissesi için grafik verilerini getir"""
     try:
         # Önce hisseyi BIST listesinde bul
@@ -1926,7 +2796,7 @@ def chart_bist(symbol: str, tf: str = "1d", lookback: int = 120):
             return {"error": f"Hisse {symbol} BIST listesinde bulunamadı"}
         
         # TradingView'dan analiz al
-        analysis = tv_get_analysis(symbol.upper(), "bist", tf)
+        analysis = await tv_get_analysis_async(symbol.upper(), "bist", tf)
         
         # Eğer TradingView'dan veri gelmezse, simüle edilmiş veri kullan
         if analysis is None:
@@ -2024,27 +2894,28 @@ async def get_portfolio(portfolio: Optional[str] = Query(None, description="Port
         
         # Admin ise tüm portföyleri görebilir
         if current_user.get("is_admin"):
-            portfolio_data = load_portfolio(portfolio)
+            portfolio_data = overlay_snapshot_prices(await run_io(load_portfolio, portfolio))
             return {"success": True, "portfolio": portfolio_data}
         
         # Normal kullanıcı ise sadece kendi portföylerini görebilir
-        portfolio_list = load_portfolio_list()
+        portfolio_list = await run_io(load_portfolio_list)
         user_portfolio = next((p for p in portfolio_list if p["portfolio_id"] == portfolio and p.get("owner_username") == current_user["username"]), None)
         
         if not user_portfolio:
             return {"success": True, "portfolio": []}
         
-        portfolio_data = load_portfolio(portfolio)
+        portfolio_data = overlay_snapshot_prices(await run_io(load_portfolio, portfolio))
         return {"success": True, "portfolio": portfolio_data}
     except Exception as e:
         print(f"❌ ERROR: Portfolio get error: {str(e)}")
         return {"success": False, "error": f"Portföy yüklenemedi: {str(e)}"}
 
 @app.get("/portfolio/list")
+@serialized_writes
 async def get_portfolio_list(current_user: dict = Depends(get_current_user)):
     try:
         print(f"🔍 DEBUG: Portfolio list requested by user: {current_user['username']}")
-        portfolio_list = load_portfolio_list()
+        portfolio_list = await run_io(load_portfolio_list)
         print(f"🔍 DEBUG: Total portfolios in system: {len(portfolio_list)}")
         
         if current_user.get("is_admin"):
@@ -2053,12 +2924,12 @@ async def get_portfolio_list(current_user: dict = Depends(get_current_user)):
             return {"success": True, "portfolios": portfolio_list, "id_map": {}}
         
         # Normal kullanıcı ise sadece kendi portföylerini görebilir
-        user_portfolios = get_user_portfolios(current_user["username"])
+        user_portfolios = await run_io(get_user_portfolios, current_user["username"])
         print(f"🔍 DEBUG: User portfolios before migration: {[p['portfolio_id'] for p in user_portfolios]}")
         
         # Her kullanıcı için temiz başlangıç - hiç portfolio yoksa otomatik ana portfolio oluştur
         if not user_portfolios:
-            portfolio_number = get_next_portfolio_number(current_user["username"])
+            portfolio_number = await run_io(get_next_portfolio_number, current_user["username"])
             user_main_portfolio_id = create_portfolio_id(current_user["username"], portfolio_number)
             user_main_portfolio = {
                 "portfolio_id": user_main_portfolio_id,
@@ -2073,10 +2944,10 @@ async def get_portfolio_list(current_user: dict = Depends(get_current_user)):
             
             # Portföy listesine ekle
             portfolio_list.append(user_main_portfolio)
-            save_portfolio_list(portfolio_list)
+            await run_io(save_portfolio_list, portfolio_list)
             
             # Boş portföy dosyası oluştur (tamamen temiz)
-            save_portfolio(user_main_portfolio_id, [])
+            await run_io(save_portfolio, user_main_portfolio_id, [])
             
             user_portfolios = [user_main_portfolio]
             print(f"🔍 DEBUG: Created clean portfolio for user: {current_user['username']}")
@@ -2095,13 +2966,14 @@ async def get_portfolio_list(current_user: dict = Depends(get_current_user)):
         return {"error": f"Portföy listesi yüklenemedi: {str(e)}"}
 
 @app.post("/portfolio/create")
+@serialized_writes
 async def create_portfolio(request: PortfolioCreateRequest, current_user: dict = Depends(get_current_user)):
     """Yeni portföy oluştur - Kullanıcı sadece kendi portföyünü oluşturabilir"""
     try:
-        portfolio_list = load_portfolio_list()
+        portfolio_list = await run_io(load_portfolio_list)
         
         # Yeni portföy ID'si oluştur (yeni sistem)
-        portfolio_number = get_next_portfolio_number(current_user["username"])
+        portfolio_number = await run_io(get_next_portfolio_number, current_user["username"])
         portfolio_id = create_portfolio_id(current_user["username"], portfolio_number)
         
         # Yeni portföy ekle
@@ -2114,20 +2986,21 @@ async def create_portfolio(request: PortfolioCreateRequest, current_user: dict =
         }
         
         portfolio_list.append(new_portfolio)
-        save_portfolio_list(portfolio_list)
+        await run_io(save_portfolio_list, portfolio_list)
         
         # Boş portföy dosyası oluştur
-        save_portfolio(portfolio_id, [])
+        await run_io(save_portfolio, portfolio_id, [])
         
         return {"success": True, "portfolio": new_portfolio}
     except Exception as e:
         return {"error": f"Portföy oluşturulamadı: {str(e)}"}
 
 @app.delete("/portfolio/delete/{portfolio_id}")
+@serialized_writes
 async def delete_portfolio(portfolio_id: str, current_user: dict = Depends(get_current_user)):
     """Portföyü sil - Kullanıcı sadece kendi portföyünü silebilir"""
     try:
-        portfolio_list = load_portfolio_list()
+        portfolio_list = await run_io(load_portfolio_list)
         
         # Portföyü listeden bul
         portfolio_to_delete = None
@@ -2149,18 +3022,20 @@ async def delete_portfolio(portfolio_id: str, current_user: dict = Depends(get_c
         
         # Portföyü listeden çıkar
         portfolio_list = [p for p in portfolio_list if p["portfolio_id"] != portfolio_id]
-        save_portfolio_list(portfolio_list)
+        await run_io(save_portfolio_list, portfolio_list)
         
         # Portföy dosyasını sil
         portfolio_file = os.path.join(PORTFOLIO_DIR, f"{portfolio_id}.json")
         if os.path.exists(portfolio_file):
             os.remove(portfolio_file)
+        await run_io(portfolio_changed, portfolio_id)
         
         return {"success": True, "message": f"Portföy '{portfolio_to_delete['portfolio_name']}' başarıyla silindi"}
     except Exception as e:
         return {"error": f"Portföy silinemedi: {str(e)}"}
 
 @app.post("/portfolio/add")
+@serialized_writes
 async def add_portfolio_item(request: PortfolioAddRequest, current_user: dict = Depends(get_current_user)):
     try:
         # Debug logging
@@ -2179,7 +3054,7 @@ async def add_portfolio_item(request: PortfolioAddRequest, current_user: dict =
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Geçersiz portfolio ID formatı")
         
         # Portföy listesini kontrol et - kullanıcı sadece kendi portföyüne işlem ekleyebilir
-        portfolio_list = load_portfolio_list()
+        portfolio_list = await run_io(load_portfolio_list)
         target_portfolio = None
         for portfolio in portfolio_list:
             if portfolio["portfolio_id"] == portfolio_id:
@@ -2194,7 +3069,7 @@ async def add_portfolio_item(request: PortfolioAddRequest, current_user: dict =
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Bu portföyüne işlem ekleme yetkiniz yok")
         
         # Mevcut portföyü yükle
-        portfolio = load_portfolio(portfolio_id)
+        portfolio = await run_io(load_portfolio, portfolio_id)
         
         # Yeni işlem oluştur
         new_item = {
@@ -2220,7 +3095,8 @@ async def add_portfolio_item(request: PortfolioAddRequest, current_user: dict =
         portfolio.append(new_item)
         
         # Portföyü kaydet
-        save_portfolio(portfolio_id, portfolio)
+        await run_io(save_portfolio, portfolio_id, portfolio)
+        await run_io(portfolio_changed, portfolio_id)
         
         return {"success": True, "item": new_item}
     except HTTPException:
@@ -2230,19 +3106,20 @@ async def add_portfolio_item(request: PortfolioAddRequest, current_user: dict =
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"İşlem eklenemedi: {str(e)}")
 
 @app.put("/portfolio/{item_id}")
+@serialized_writes
 async def update_portfolio_item(item_id: str, request: PortfolioUpdateRequest, portfolio_id: str = Query(..., description="Portföy ID'si"), current_user: dict = Depends(get_current_user)):
     """Portföy işlemini güncelle - Sadece kendi işlemlerini güncelleyebilir"""
     try:
         # Admin ise tüm portföyleri güncelleyebilir
         if not current_user.get("is_admin"):
             # Normal kullanıcı ise sadece kendi portföylerini güncelleyebilir
-            portfolio_list = load_portfolio_list()
+            portfolio_list = await run_io(load_portfolio_list)
             user_portfolio = next((p for p in portfolio_list if p["portfolio_id"] == portfolio_id and p.get("owner_username") == current_user["username"]), None)
             
             if not user_portfolio:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Bu portföyü güncelleme yetkiniz yok")
         
-        portfolio = load_portfolio(portfolio_id)
+        portfolio = await run_io(load_portfolio, portfolio_id)
         
         # İşlemi bul
         for item in portfolio:
@@ -2260,7 +3137,8 @@ async def update_portfolio_item(item_id: str, request: PortfolioUpdateRequest, p
                 if request.date is not None:
                     item["date"] = request.date
                 
-                save_portfolio(portfolio_id, portfolio)
+                await run_io(save_portfolio, portfolio_id, portfolio)
+                await run_io(portfolio_changed, portfolio_id)
                 return {"success": True, "item": item}
         
         return {"error": "İşlem bulunamadı"}
@@ -2269,50 +3147,611 @@ async def update_portfolio_item(item_id: str, request: PortfolioUpdateRequest, p
         return {"error": f"İşlem güncellenemedi: {str(e)}"}
 
 @app.delete("/portfolio/{item_id}")
+@serialized_writes
 async def delete_portfolio_item(item_id: str, portfolio_id: str = Query(..., description="Portföy ID'si")):
     """Portföy işlemini sil"""
     try:
-        portfolio = load_portfolio(portfolio_id)
+        portfolio = await run_io(load_portfolio, portfolio_id)
         
         # İşlemi bul ve sil
         portfolio = [item for item in portfolio if item["id"] != item_id]
-        save_portfolio(portfolio_id, portfolio)
+        await run_io(save_portfolio, portfolio_id, portfolio)
+        await run_io(portfolio_changed, portfolio_id)
         
         return {"success": True, "message": "İşlem silindi"}
     except Exception as e:
         return {"error": f"İşlem silinemedi: {str(e)}"}
 
-def tv_get_price_only(symbol: str, market: str) -> float:
-    """Sadece fiyat bilgisi al - tam analiz yapma"""
-    try:
-        if market == "bist":
-            exchange = "BIST"
-            screener = "turkey"
-        elif market == "crypto":
-            exchange = "BINANCE"
-            screener = "crypto"
-        else:
-            return None
-        
-        # Sadece fiyat için basit handler
-        handler = TA_Handler(symbol=symbol, exchange=exchange, screener=screener, interval=Interval.INTERVAL_1_DAY)
-        analysis = handler.get_analysis()
-        
-        if analysis and hasattr(analysis, 'indicators') and analysis.indicators:
-            return analysis.indicators.get('close')
+# ---------- Fiyat Yenileme Hattı ----------
+PRICE_REQUEST_DELAY = 0.5  # Fiyat istekleri arası minimum bekleme (paylaşılan limiter üzerinden)
+
+def price_key(symbol: str, market: str) -> tuple:
+    """Fiyat tekilleştirme anahtarı: (SEMBOL, market)"""
+    return (symbol.upper(), market)
+
+async def fetch_prices(keys) -> Dict[tuple, float]:
+    """Sembolleri tekilleştir ve fiyatları piyasa başına batch'li scanner istekleriyle çek (event loop bloklanmaz)"""
+    unique_keys = list(dict.fromkeys(price_key(symbol, market) for symbol, market in keys))
+    symbols_by_market: Dict[str, List[str]] = {}
+    for symbol, market in unique_keys:
+        if market in TV_PRICE_MARKETS:
+            symbols_by_market.setdefault(market, []).append(symbol)
+    
+    prices = {}
+    for market, symbols in symbols_by_market.items():
+        rows = await tv_scan_symbols(symbols, market, columns=PRICE_COLUMNS, delay=PRICE_REQUEST_DELAY)
+        for symbol, values in rows.items():
+            if values and values.get("close"):
+                prices[price_key(symbol, market)] = values["close"]
+    
+    print(f"🔄 {len(unique_keys)} tekil sembol için {len(prices)} fiyat alındı")
+    return prices
+
+def apply_prices(items: List[Dict], prices: Dict[tuple, float], timestamp: Optional[str] = None) -> int:
+    """Her sembolün fiyatını eşleşen tüm kayıtlara tek seferde yaz, güncellenen kayıt sayısını döndür"""
+    timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    updated_count = 0
+    for item in items:
+        price = prices.get(price_key(item["symbol"], item["market"]))
+        if price:
+            item["current_price"] = price
+            item["last_updated"] = timestamp
+            updated_count += 1
+    return updated_count
+
+# ---------- Fiyat Snapshot Servisi ----------
+# (symbol, market) -> {"price": float, "last_updated": str}; tüm kullanıcılar aynı snapshot'ı okur
+PRICE_SNAPSHOTS: Dict[tuple, Dict[str, Any]] = {}
+PRICE_SNAPSHOT_LOCK = Lock()
+PRICE_REFRESHER_TASK = None
+
+def get_price_snapshot(symbol: str, market: str) -> Optional[Dict[str, Any]]:
+    """Sembolün son fiyat snapshot'ını döndür"""
+    with PRICE_SNAPSHOT_LOCK:
+        snapshot = PRICE_SNAPSHOTS.get(price_key(symbol, market))
+    CACHE_REQUESTS.labels("price_snapshot", "hit" if snapshot else "miss").inc()
+    return dict(snapshot) if snapshot else None
+
+def update_price_snapshots(prices: Dict[tuple, float], timestamp: Optional[str] = None) -> List[tuple]:
+    """Yeni fiyatları snapshot'a yaz, fiyatı değişen anahtarları döndür"""
+    timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    changed = []
+    moves = []
+    with PRICE_SNAPSHOT_LOCK:
+        for key, price in prices.items():
+            previous = PRICE_SNAPSHOTS.get(key)
+            PRICE_SNAPSHOTS[key] = {"price": price, "last_updated": timestamp}
+            if not previous or previous["price"] != price:
+                changed.append(key)
+                if previous:
+                    moves.append((key, previous["price"], price))
+    for key, previous_price, price in moves:
+        evaluate_price_alerts(key, previous_price, price)
+    return changed
+
+def save_price_snapshots(keys) -> None:
+    """Verilen anahtarların snapshot'larını database'e yaz (worker/web paylaşımı için)"""
+    with PRICE_SNAPSHOT_LOCK:
+        rows = [(key[0], key[1], PRICE_SNAPSHOTS[key]["price"], PRICE_SNAPSHOTS[key]["last_updated"])
+                for key in keys if key in PRICE_SNAPSHOTS]
+    if not rows:
+        return
+    with get_db_connection() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO price_snapshots (symbol, market, price, last_updated)
+            VALUES (?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+
+def load_price_snapshots() -> List[tuple]:
+    """Database'deki snapshot'ları belleğe al; sadece daha yeni olanlar yazılır.
+    Fiyatı değişen anahtarları döndürür (WebSocket yayını için)."""
+    with get_db_connection() as conn:
+        rows = conn.execute('SELECT symbol, market, price, last_updated FROM price_snapshots').fetchall()
+    changed = []
+    with PRICE_SNAPSHOT_LOCK:
+        for row in rows:
+            key = (row["symbol"], row["market"])
+            current = PRICE_SNAPSHOTS.get(key)
+            if not current or current["last_updated"] < row["last_updated"]:
+                PRICE_SNAPSHOTS[key] = {"price": row["price"], "last_updated": row["last_updated"]}
+                if not current or current["price"] != row["price"]:
+                    changed.append(key)
+    return changed
+
+def overlay_snapshot_prices(items: List[Dict]) -> List[Dict]:
+    """Kayıtlardaki current_price/last_updated alanlarını paylaşılan snapshot ile güncelle"""
+    with PRICE_SNAPSHOT_LOCK:
+        for item in items:
+            snapshot = PRICE_SNAPSHOTS.get(price_key(item["symbol"], item["market"]))
+            if snapshot:
+                item["current_price"] = snapshot["price"]
+                item["last_updated"] = snapshot["last_updated"]
+    return items
+
+def get_active_price_keys() -> set:
+    """Portföylerde tutulan ve takip listesindeki sembollerin birleşimi"""
+    keys = set()
+    for portfolio in load_portfolio_list():
+        for item in load_portfolio(portfolio["portfolio_id"]):
+            keys.add(price_key(item["symbol"], item["market"]))
+    for item in load_watchlist():
+        keys.add(price_key(item["symbol"], item["market"]))
+    return keys
+
+async def refresh_price_snapshots(keys=None) -> Dict[tuple, float]:
+    """Verilen (veya tüm aktif) semboller için fiyatları çek ve snapshot'a yaz"""
+    if keys is None:
+        keys = await run_io(get_active_price_keys)
+    await run_io(ensure_alert_index)
+    prices = await fetch_prices(keys)
+    changed = await run_io(update_price_snapshots, prices)  # Alarm olayları database'e yazılır
+    await run_io(save_price_snapshots, list(prices.keys()))
+    await broadcast_price_changes(changed)
+    return prices
+
+# ---------- Fiyat Yenileme Zamanlayıcısı ----------
+# "app": web sürecinde çalışır, "worker": price_worker.py çalıştırır (web sadece okur), "off": kapalı
+PRICE_SCHEDULER_MODE = os.environ.get("PRICE_SCHEDULER_MODE", "app")
+PRICE_REFRESH_INTERVALS = {
+    "bist": float(os.environ.get("PRICE_REFRESH_INTERVAL_BIST", 300)),
+    "crypto": float(os.environ.get("PRICE_REFRESH_INTERVAL_CRYPTO", 120)),
+}
+PRICE_REFRESH_JITTER = 0.1  # Aralığın ±%10'u kadar rastgele kaydırma
+PRICE_REFRESH_MAX_BACKOFF = 1800.0  # Hata durumunda en fazla 30 dakika bekle
+PRICE_SNAPSHOT_SYNC_INTERVAL = 30.0  # Worker modunda web'in database'den okuma aralığı
+# "app" modunda birden fazla web worker'ı varsa zamanlayıcıyı sadece kirayı tutan worker çalıştırır,
+# diğerleri snapshot'ları database'den senkronlar. Lider ölürse kira TTL sonunda başkasına geçer.
+PRICE_SCHEDULER_LEASE = "price_scheduler"
+PRICE_SCHEDULER_LEASE_TTL = float(os.environ.get("PRICE_SCHEDULER_LEASE_TTL", 30))
+
+# Borsa İstanbul seans saatleri (TSİ, UTC+3 - yaz saati uygulaması yok)
+BIST_TZ = timezone(timedelta(hours=3))
+BIST_SESSION_OPEN = dtime(9, 55)
+BIST_SESSION_CLOSE = dtime(18, 10)  # Kapanış seansı dahil
+
+def seconds_until_market_open(market: str, now: Optional[datetime] = None) -> float:
+    """Piyasa açıksa 0, kapalıysa bir sonraki açılışa kalan saniye (kripto her zaman açık)"""
+    if market != "bist":
+        return 0.0
+    
+    now = (now or datetime.now(timezone.utc)).astimezone(BIST_TZ)
+    if now.weekday() < 5 and BIST_SESSION_OPEN <= now.time() < BIST_SESSION_CLOSE:
+        return 0.0
+    
+    # Bir sonraki hafta içi açılışı bul (resmi tatiller dikkate alınmaz)
+    next_open = now.replace(hour=BIST_SESSION_OPEN.hour, minute=BIST_SESSION_OPEN.minute, second=0, microsecond=0)
+    if now.time() >= BIST_SESSION_OPEN:
+        next_open += timedelta(days=1)
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+    return (next_open - now).total_seconds()
+
+def next_refresh_delay(market: str, failures: int = 0) -> float:
+    """Jitter'lı yenileme aralığı; art arda hatalarda üstel geri çekilme"""
+    interval = PRICE_REFRESH_INTERVALS.get(market, 300.0)
+    if failures:
+        interval = min(interval * (2 ** failures), PRICE_REFRESH_MAX_BACKOFF)
+    return interval * random.uniform(1 - PRICE_REFRESH_JITTER, 1 + PRICE_REFRESH_JITTER)
+
+async def market_refresh_loop(market: str):
+    """Tek bir piyasanın aktif sembollerini kendi aralığında yenile"""
+    failures = 0
+    while True:
+        wait = seconds_until_market_open(market)
+        if wait > 0:
+            print(f"⏸️ {market} piyasası kapalı, {wait / 60:.0f} dakika sonra yenileme devam edecek")
+            await asyncio.sleep(wait + random.uniform(0, 60))
+            continue
         
-        return None
+        try:
+            keys = [key for key in await run_io(get_active_price_keys) if key[1] == market]
+            if keys:
+                prices = await refresh_price_snapshots(keys)
+                if not prices:
+                    raise RuntimeError(f"{len(keys)} sembolün hiçbiri için fiyat alınamadı")
+                print(f"✅ {market} fiyat yenileme: {len(prices)}/{len(keys)} sembol")
+            failures = 0
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            failures += 1
+            print(f"❌ {market} fiyat yenileme hatası ({failures}. deneme): {e}")
         
+        await asyncio.sleep(next_refresh_delay(market, failures))
+
+async def run_price_scheduler():
+    """Her piyasa için ayrı yenileme döngüsünü başlat"""
+    print(f"🕒 Fiyat zamanlayıcısı başladı: {PRICE_REFRESH_INTERVALS}")
+    loops = [market_refresh_loop(market) for market in PRICE_REFRESH_INTERVALS]
+    if INSTRUMENT_REFRESH_INTERVAL > 0:
+        # Listeden çıkan kripto paritelerini ayıklayan katalog yenilemesi de aynı süreçte
+        loops.append(instrument_refresh_loop())
+    await asyncio.gather(*loops)
+
+async def price_snapshot_sync_loop():
+    """Worker modunda (veya lider olmayan web worker'ında) yazılan snapshot'ları periyodik olarak belleğe al"""
+    while True:
+        try:
+            changed = await run_io(load_price_snapshots)
+            # Bu sürece bağlı WebSocket istemcileri de güncellemeleri alsın
+            await broadcast_price_changes(changed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Fiyat snapshot senkronizasyon hatası: {e}")
+        await asyncio.sleep(PRICE_SNAPSHOT_SYNC_INTERVAL)
+
+async def price_scheduler_supervisor():
+    """Kirayı tutuyorsa zamanlayıcıyı, tutmuyorsa snapshot senkronizasyonunu çalıştır"""
+    task = None
+    leader = None
+    try:
+        while True:
+            try:
+                is_leader = await run_io(acquire_lease, PRICE_SCHEDULER_LEASE, WORKER_ID, PRICE_SCHEDULER_LEASE_TTL)
+            except Exception as e:
+                print(f"⚠️ Zamanlayıcı kirası yenilenemedi: {e}")
+                is_leader = bool(leader)  # Database geçici olarak kilitliyse rolü koru
+            if is_leader != leader:
+                if task is not None:
+                    task.cancel()
+                    with suppress(asyncio.CancelledError):
+                        await task
+                task = asyncio.create_task(run_price_scheduler() if is_leader else price_snapshot_sync_loop())
+                leader = is_leader
+                print(f"🕒 Fiyat zamanlayıcısı: {WORKER_ID} {'lider' if leader else 'takipçi'}")
+            await asyncio.sleep(PRICE_SCHEDULER_LEASE_TTL / 3)
+    finally:
+        if task is not None:
+            task.cancel()
+        if leader:
+            try:
+                release_lease(PRICE_SCHEDULER_LEASE, WORKER_ID)
+            except Exception:
+                pass
+
+# ---------- WebSocket Push ----------
+# websocket -> {"username", "is_admin", "symbols": set, "channels": set}
+WS_CLIENTS: Dict[WebSocket, Dict[str, Any]] = {}
+WS_SYMBOL_INDEX: Dict[str, set] = {}  # SEMBOL -> bu sembole abone websocket'ler
+WS_CHANNELS = {"prices", "scan", "alerts"}
+WS_LOOP = None  # Ana event loop (startup'ta atanır)
+
+def ws_subscribe(websocket: WebSocket, symbols=(), channels=()):
+    """Websocket'i sembol/kanal aboneliklerine ekle"""
+    client = WS_CLIENTS[websocket]
+    for symbol in symbols:
+        symbol = str(symbol).upper()
+        client["symbols"].add(symbol)
+        WS_SYMBOL_INDEX.setdefault(symbol, set()).add(websocket)
+    client["channels"].update(channel for channel in channels if channel in WS_CHANNELS)
+
+def ws_unsubscribe(websocket: WebSocket, symbols=(), channels=()):
+    """Websocket'in sembol/kanal aboneliklerini kaldır"""
+    client = WS_CLIENTS.get(websocket)
+    if not client:
+        return
+    for symbol in symbols:
+        symbol = str(symbol).upper()
+        client["symbols"].discard(symbol)
+        subscribers = WS_SYMBOL_INDEX.get(symbol)
+        if subscribers:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del WS_SYMBOL_INDEX[symbol]
+    client["channels"].difference_update(channels)
+
+def ws_disconnect(websocket: WebSocket):
+    """Bağlantıyı tüm indekslerden temizle"""
+    client = WS_CLIENTS.get(websocket)
+    if client:
+        ws_unsubscribe(websocket, list(client["symbols"]))
+        del WS_CLIENTS[websocket]
+
+async def ws_send_many(messages: Dict[WebSocket, str]):
+    """Hazır mesajları ilgili websocket'lere paralel gönder, kopan bağlantıları temizle"""
+    if not messages:
+        return
+    sockets = list(messages.keys())
+    results = await asyncio.gather(*(ws.send_text(messages[ws]) for ws in sockets), return_exceptions=True)
+    for websocket, result in zip(sockets, results):
+        if isinstance(result, Exception):
+            ws_disconnect(websocket)
+
+def current_price_updates(symbols) -> List[Dict[str, Any]]:
+    """Verilen sembollerin snapshot'ları (kilit altında kopyalanır; executor thread'leri yazıyor olabilir)"""
+    with PRICE_SNAPSHOT_LOCK:
+        return [
+            {"symbol": key[0], "market": key[1], **snapshot}
+            for key, snapshot in PRICE_SNAPSHOTS.items() if key[0] in symbols
+        ]
+
+async def broadcast_price_changes(keys: List[tuple]):
+    """Değişen fiyatları sadece o sembole abone olan bağlantılara gönder"""
+    if not keys or not WS_CLIENTS:
+        return
+    updates: Dict[WebSocket, List[Dict[str, Any]]] = {}
+    with PRICE_SNAPSHOT_LOCK:
+        for key in keys:
+            snapshot = PRICE_SNAPSHOTS.get(key)
+            if not snapshot:
+                continue
+            update = {"symbol": key[0], "market": key[1], **snapshot}
+            for websocket in WS_SYMBOL_INDEX.get(key[0], ()):
+                if "prices" in WS_CLIENTS[websocket]["channels"]:
+                    updates.setdefault(websocket, []).append(update)
+    await ws_send_many({ws: json.dumps({"type": "prices", "items": items}) for ws, items in updates.items()})
+
+async def publish_ws_event(event: Dict[str, Any], channel: str, username: Optional[str] = None, symbol: Optional[str] = None):
+    """Olayı kanala abone bağlantılara yay; username/symbol verilirse sadece ilgili bağlantılara"""
+    if not WS_CLIENTS:
+        return
+    message = json.dumps(event, default=str)  # Tek serileştirme, çok alıcı
+    targets = {}
+    for websocket, client in WS_CLIENTS.items():
+        if channel not in client["channels"]:
+            continue
+        if username and client["username"] != username and not client["is_admin"]:
+            continue
+        if symbol and symbol.upper() not in client["symbols"]:
+            continue
+        targets[websocket] = message
+    await ws_send_many(targets)
+
+def publish_ws_event_threadsafe(event: Dict[str, Any], channel: str, username: Optional[str] = None, symbol: Optional[str] = None):
+    """Senkron (thread) kodundan olay yayınla - bağlı istemci yoksa hiçbir şey yapmaz"""
+    if WS_LOOP is None or not WS_CLIENTS:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(publish_ws_event(event, channel, username, symbol), WS_LOOP)
+    except RuntimeError:
+        pass  # Loop kapanmış
+
+def publish_scan_progress(scan_id: str, market: str, done: int, total: int, symbol: Optional[str] = None,
+                          username: Optional[str] = None):
+    """Tarama ilerlemesini 'scan' kanalında taramayı başlatan kullanıcıya (ve adminlere) yay"""
+    if not username:
+        return
+    publish_ws_event_threadsafe({
+        "type": "scan_progress",
+        "scan_id": scan_id,
+        "market": market,
+        "done": done,
+        "total": total,
+        "symbol": symbol
+    }, "scan", username=username)
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket, api_key: str = Query(..., description="Login'den alınan API key")):
+    """Fiyat, tarama ve alarm güncellemelerini push eden WebSocket
+
+    İstemci mesajları:
+      {"action": "subscribe", "symbols": ["THYAO"], "channels": ["prices", "scan", "alerts"]}
+      {"action": "unsubscribe", "symbols": [...], "channels": [...]}
+      {"action": "ping"}
+    """
+    try:
+        username = (await run_io(verify_api_key, api_key))["username"]
+        user = next((u for u in await run_io(load_users) if u["username"] == username), None)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Kullanıcı bulunamadı")
+    except HTTPException:
+        await websocket.close(code=4401)
+        return
+    
+    await websocket.accept()
+    WS_CLIENTS[websocket] = {
+        "username": username,
+        "is_admin": bool(user.get("is_admin")),
+        "symbols": set(),
+        "channels": set(WS_CHANNELS)
+    }
+    print(f"🔌 WebSocket bağlandı: {username} (toplam {len(WS_CLIENTS)})")
+    
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await websocket.send_text(json.dumps({"type": "error", "error": "Geçersiz JSON"}))
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_text(json.dumps({"type": "error", "error": "Mesaj JSON nesnesi olmalı"}))
+                continue
+            
+            action = message.get("action")
+            symbols = message.get("symbols", [])
+            channels = message.get("channels", [])
+            if action in ("subscribe", "unsubscribe") and not (isinstance(symbols, list) and isinstance(channels, list)):
+                await websocket.send_text(json.dumps({"type": "error", "error": "symbols ve channels liste olmalı"}))
+                continue
+            
+            if action == "subscribe":
+                ws_subscribe(websocket, symbols, channels)
+                # Abone olunan sembollerin mevcut snapshot'ı sadece bu bağlantıya gönderilir
+                items = current_price_updates(WS_CLIENTS[websocket]["symbols"])
+                if items and "prices" in WS_CLIENTS[websocket]["channels"]:
+                    await websocket.send_text(json.dumps({"type": "prices", "items": items}))
+            elif action == "unsubscribe":
+                ws_unsubscribe(websocket, symbols, channels)
+            elif action == "ping":
+                await websocket.send_text(json.dumps({"type": "pong"}))
+                continue
+            else:
+                await websocket.send_text(json.dumps({"type": "error", "error": f"Bilinmeyen action: {action}"}))
+                continue
+            
+            client = WS_CLIENTS[websocket]
+            await websocket.send_text(json.dumps({
+                "type": "subscriptions",
+                "symbols": sorted(client["symbols"]),
+                "channels": sorted(client["channels"])
+            }))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ws_disconnect(websocket)
+        print(f"🔌 WebSocket ayrıldı: {username} (toplam {len(WS_CLIENTS)})")
+
+# ---------- Hedef Fiyat Alarmları ----------
+ALERT_INDEX = PriceAlertIndex()
+ALERT_INDEX_DIRTY = True  # Portföy/takip listesi değişince indeks bir sonraki fiyat turunda yeniden kurulur
+ALERT_TARGETS_VERSION = "alert_targets"  # Hedefler başka bir worker'da değişince artan paylaşılan sayaç
+ALERT_INDEX_VERSION = None  # İndeksin kurulduğu sürüm
+ALERT_INDEX_LOCK = Lock()
+ALERT_EVENT_RETENTION = 1000  # alert_events tablosunda tutulan son olay sayısı
+ALERT_PAGE_MAX = 500  # /alerts tek yanıtta en fazla bu kadar olay döndürür
+
+def mark_alert_index_dirty():
+    """Hedefler değişti - indeksi bu süreçte ve (sürüm sayacıyla) diğer worker'larda kirli işaretle.
+    Sayaç database'de artırılır: async koddan run_io ile çağrılmalıdır."""
+    global ALERT_INDEX_DIRTY
+    ALERT_INDEX_DIRTY = True
+    try:
+        bump_shared_version(ALERT_TARGETS_VERSION)
+    except sqlite3.Error as e:
+        print(f"⚠️ Alarm hedef sürümü artırılamadı: {e}")
+
+def portfolio_changed(portfolio_id: str):
+    """Portföy işlemleri değişti - türetilmiş verileri (alarm indeksi, export önbelleği) geçersiz kıl"""
+    mark_alert_index_dirty()
+    invalidate_export_cache(portfolio_id)
+
+def collect_alert_targets() -> List[Dict[str, Any]]:
+    """Portföy ve takip listesindeki tüm hedef fiyatları topla"""
+    targets = []
+    for portfolio in load_portfolio_list():
+        # Pozisyon ekranı ile aynı kural: sembolün son hedef fiyatı geçerli
+        latest_targets = {}
+        for item in load_portfolio(portfolio["portfolio_id"]):
+            if item.get("target_price"):
+                latest_targets[price_key(item["symbol"], item["market"])] = item
+        for key, item in latest_targets.items():
+            targets.append({
+                "key": key,
+                "target_price": float(item["target_price"]),
+                "source": "portfolio",
+                "portfolio_id": portfolio["portfolio_id"],
+                "item_id": item["id"],
+                "username": portfolio.get("owner_username")
+            })
+    for item in load_watchlist():
+        if item.get("target_price"):
+            targets.append({
+                "key": price_key(item["symbol"], item["market"]),
+                "target_price": float(item["target_price"]),
+                "source": "watchlist",
+                "item_id": item["id"],
+                "username": None  # Takip listesi ortak
+            })
+    return targets
+
+def ensure_alert_index():
+    """İndeks kirliyse veya hedefler başka bir süreçte değiştiyse hedeflerden yeniden kur"""
+    global ALERT_INDEX_DIRTY, ALERT_INDEX_VERSION
+    try:
+        version = get_shared_version(ALERT_TARGETS_VERSION)
+    except sqlite3.Error:
+        version = ALERT_INDEX_VERSION
+    if not ALERT_INDEX_DIRTY and version == ALERT_INDEX_VERSION:
+        CACHE_REQUESTS.labels("alert_index", "hit").inc()
+        return
+    CACHE_REQUESTS.labels("alert_index", "miss").inc()
+    with ALERT_INDEX_LOCK:
+        if not ALERT_INDEX_DIRTY and version == ALERT_INDEX_VERSION:
+            return
+        ALERT_INDEX_DIRTY = False
+        ALERT_INDEX_VERSION = version
+        ALERT_INDEX.rebuild(collect_alert_targets())
+    print(f"🎯 Alarm indeksi yeniden kuruldu: {len(ALERT_INDEX)} hedef")
+
+def save_alert_events(events: List[Dict[str, Any]]) -> None:
+    """Olayları alert_events tablosuna yaz ve her olaya kalıcı ID ata; eski olaylar budanır"""
+    with get_db_connection() as conn:
+        for event in events:
+            cursor = conn.execute(
+                'INSERT INTO alert_events (username, payload, created_at) VALUES (?, ?, ?)',
+                (event["username"], json.dumps(event, default=str), event["triggered_at"])
+            )
+            event["id"] = cursor.lastrowid
+        conn.execute('DELETE FROM alert_events WHERE id <= ?', (events[-1]["id"] - ALERT_EVENT_RETENTION,))
+        conn.commit()
+
+def load_alert_events(since: int, limit: int, username: Optional[str] = None) -> Dict[str, Any]:
+    """since'tan sonraki en eski `limit` olayı getir (username=None: tüm olaylar).
+    cursor bir sonraki çağrının since değeridir; has_more ise kalan olay vardır.
+    reset: since hiç atanmamış bir ID (ör. veritabanı sıfırlandı) - olaylar baştan listelenir."""
+    with get_db_connection() as conn:
+        # Sayaç sorgudan önce okunur: sorgu boş dönerse bu değere kadar kaçırılan olay yoktur
+        last_id = conn.execute(
+            "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'alert_events'), 0)"
+        ).fetchone()[0]
+        reset = since > last_id
+        if reset:
+            since = 0
+        rows = conn.execute('''
+            SELECT id, payload FROM alert_events
+            WHERE id > ? AND (? IS NULL OR username IS NULL OR username = ?)
+            ORDER BY id ASC LIMIT ?
+        ''', (since, username, username, limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    events = [{"id": row["id"], **json.loads(row["payload"])} for row in rows]
+    cursor = rows[-1]["id"] if rows else since
+    if not has_more:
+        cursor = max(cursor, last_id)  # Arada başka kullanıcıların olayları varsa imleç onları da geçer
+    return {"alerts": events, "last_id": cursor, "has_more": has_more, "reset": reset}
+
+def evaluate_price_alerts(key: tuple, previous_price: float, price: float) -> List[Dict[str, Any]]:
+    """Fiyat hareketinde kesilen hedefler için alarm olayı üret (olaylar kaydedildikten sonra yayınlanır)"""
+    events = []
+    for direction, target in ALERT_INDEX.crossed(key, previous_price, price):
+        event = {
+            "type": "alert",
+            "symbol": key[0],
+            "market": key[1],
+            "direction": direction,
+            "target_price": target["target_price"],
+            "previous_price": previous_price,
+            "price": price,
+            "source": target["source"],
+            "portfolio_id": target.get("portfolio_id"),
+            "item_id": target["item_id"],
+            "username": target["username"],
+            "triggered_at": datetime.now().isoformat()
+        }
+        events.append(event)
+        print(f"🔔 Alarm: {key[0]} {direction} {target['target_price']} (fiyat {price})")
+    if not events:
+        return events
+    try:
+        save_alert_events(events)
+    except sqlite3.Error as e:
+        print(f"⚠️ Alarm olayları kaydedilemedi: {e}")
+    for event in events:
+        publish_ws_event_threadsafe(event, "alerts", username=event["username"])
+    return events
+
+@app.get("/alerts")
+async def get_alerts(
+    since: int = Query(0, description="Bu ID'den sonraki olaylar (önceki yanıtın last_id değeri)"),
+    limit: int = Query(100, ge=1, le=ALERT_PAGE_MAX, description="Sayfa başına en fazla olay"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Tetiklenen hedef fiyat alarmlarını eskiden yeniye getir - kullanıcı kendi portföy alarmlarını ve ortak takip listesi alarmlarını görür.
+    has_more=True ise last_id ile tekrar çağrılmalıdır. since atanmamış bir ID ise (ör. veritabanı sıfırlandı)
+    reset=True döner ve olaylar baştan listelenir."""
+    try:
+        username = None if current_user.get("is_admin") else current_user["username"]
+        page = await run_io(load_alert_events, since, limit, username)
+        return {
+            "success": True,
+            **page,
+            "indexed_targets": len(ALERT_INDEX)
+        }
     except Exception as e:
-        print(f"Fiyat alınamadı {symbol}: {str(e)}")
-        
-        # VERTU ve NUGYO için alternatif fiyat
-        if symbol == "VERTU":
-            return 43.40  # Son bilinen fiyat
-        elif symbol == "NUGYO":
-            return 10.12  # Son bilinen fiyat
-        
-        return None
+        return {"success": False, "error": f"Alarmlar alınamadı: {str(e)}"}
 
 @app.post("/portfolio/update-prices")
 async def update_portfolio_prices(portfolio_id: str = Query(..., description="Portföy ID'si"), current_user: dict = Depends(get_current_user)):
@@ -2321,34 +3760,23 @@ async def update_portfolio_prices(portfolio_id: str = Query(..., description="Po
         # Admin ise tüm portföyleri güncelleyebilir
         if not current_user.get("is_admin"):
             # Normal kullanıcı ise sadece kendi portföylerini güncelleyebilir
-            portfolio_list = load_portfolio_list()
+            portfolio_list = await run_io(load_portfolio_list)
             user_portfolio = next((p for p in portfolio_list if p["portfolio_id"] == portfolio_id and p.get("owner_username") == current_user["username"]), None)
             
             if not user_portfolio:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Bu portföyü güncelleme yetkiniz yok")
         
-        portfolio = load_portfolio(portfolio_id)
-        updated_count = 0
+        portfolio = await run_io(load_portfolio, portfolio_id)
         
-        for item in portfolio:
-            try:
-                # Sadece fiyat al - tam analiz yapma
-                current_price = tv_get_price_only(item["symbol"], item["market"])
-                
-                if current_price:
-                    item["current_price"] = current_price
-                    item["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    updated_count += 1
-                
-                # Daha kısa rate limiting - sadece fiyat için
-                time.sleep(0.5)
-                
-            except Exception as e:
-                print(f"Fiyat güncellenemedi {item['symbol']}: {str(e)}")
-                continue
+        # Her sembol bir kez çekilir, fiyat o sembolün tüm işlemlerine yazılır
+        prices = await refresh_price_snapshots((item["symbol"], item["market"]) for item in portfolio)
         
-        save_portfolio(portfolio_id, portfolio)
-        return {"success": True, "updated_count": updated_count, "total_items": len(portfolio)}
+        # Fiyatlar çekilirken portföy değişmiş olabilir: yazma kilidi altında güncel hali üzerine uygula
+        async with data_write_lock():
+            portfolio = await run_io(load_portfolio, portfolio_id)
+            updated_count = apply_prices(portfolio, prices)
+            await run_io(save_portfolio, portfolio_id, portfolio)
+        return {"success": True, "updated_count": updated_count, "total_items": len(portfolio), "symbols_fetched": len(prices)}
     except Exception as e:
         return {"error": f"Fiyatlar güncellenemedi: {str(e)}"}
 
@@ -2361,17 +3789,17 @@ async def get_portfolio_summary(portfolio: Optional[str] = Query(None, descripti
         
         # Admin ise tüm portföyleri görebilir
         if current_user.get("is_admin"):
-            portfolio_data = load_portfolio(portfolio)
+            portfolio_data = overlay_snapshot_prices(await run_io(load_portfolio, portfolio))
             filtered_portfolio = portfolio_data
         else:
             # Normal kullanıcı ise sadece kendi portföylerini görebilir
-            portfolio_list = load_portfolio_list()
+            portfolio_list = await run_io(load_portfolio_list)
             user_portfolio = next((p for p in portfolio_list if p["portfolio_id"] == portfolio and p.get("owner_username") == current_user["username"]), None)
             
             if not user_portfolio:
                 return {"success": True, "summary": {"total_transactions": 0, "active_positions": 0, "total_investment": 0, "total_current_value": 0, "total_profit_loss": 0, "total_profit_loss_percent": 0}}
             
-            portfolio_data = load_portfolio(portfolio)
+            portfolio_data = overlay_snapshot_prices(await run_io(load_portfolio, portfolio))
             filtered_portfolio = portfolio_data
         
         # Sembollere göre grupla ve net pozisyonları hesapla
@@ -2458,6 +3886,129 @@ async def get_portfolio_summary(portfolio: Optional[str] = Query(None, descripti
         print(f"❌ ERROR: Portfolio summary error: {str(e)}")
         return {"success": False, "error": f"Portföy özeti alınamadı: {str(e)}"}
 
+def calculate_positions(portfolio_data: List[Dict]) -> List[Dict]:
+    """İşlemleri sembollere göre grupla; açık pozisyonlar için ortalama maliyet ve realize değerleri hesapla"""
+    # Sembollere göre grupla
+    symbol_positions = {}
+    
+    for item in portfolio_data:
+        symbol = item["symbol"]
+        if symbol not in symbol_positions:
+            symbol_positions[symbol] = {
+                "symbol": symbol,
+                "market": item["market"],
+                "total_quantity": 0,
+                "total_cost": 0,
+                "realized_capital": 0,  # Realize edilen anapara
+                "unrealized_capital": 0,  # Kalan realize
+                "realized_percentage": 0,  # Realize yüzdesi
+                "avg_price": 0,
+                "current_price": item.get("current_price"),
+                "last_updated": item.get("last_updated"),
+                "target_price": None,
+                "notes": "",
+                "transactions": []
+            }
+        
+        # İşlem bilgilerini ekle
+        symbol_positions[symbol]["transactions"].append({
+            "id": item["id"],
+            "transaction_type": item["transaction_type"],
+            "type": item["transaction_type"],  # Frontend için alias
+            "price": item["price"],
+            "quantity": item["quantity"],
+            "date": item["date"],
+            "target_price": item.get("target_price"),
+            "notes": item.get("notes")
+        })
+        
+        # Net pozisyon hesapla - SADECE MİKTAR
+        if item["transaction_type"] == "buy":
+            symbol_positions[symbol]["total_quantity"] += item["quantity"]
+        else:  # sell
+            symbol_positions[symbol]["total_quantity"] -= item["quantity"]
+            # Satış işlemlerinden realize edilen anaparayı hesapla
+            symbol_positions[symbol]["realized_capital"] += item["price"] * item["quantity"]
+        
+        # Hedef fiyat ve notları güncelle (son işlemden al)
+        if item.get("target_price"):
+            symbol_positions[symbol]["target_price"] = item["target_price"]
+        if item.get("notes"):
+            symbol_positions[symbol]["notes"] = item["notes"]
+    
+    # YENİ MANTIK: Her işlemde güncel ortalama fiyat hesaplama
+    positions = []
+    for symbol, position in symbol_positions.items():
+        if position["total_quantity"] > 0:
+            # Her işlemde güncel ortalama fiyat hesapla
+            current_avg_price = 0
+            current_total_cost = 0
+            current_quantity = 0
+            
+            # İşlemleri sırayla işle (tarih sırasına göre)
+            sorted_transactions = sorted(position["transactions"], key=lambda x: x["date"])
+            
+            for transaction in sorted_transactions:
+                if transaction["transaction_type"] == "buy":
+                    # Alım işlemi: ortalama fiyatı güncelle
+                    new_cost = current_total_cost + (transaction["price"] * transaction["quantity"])
+                    new_quantity = current_quantity + transaction["quantity"]
+                    if new_quantity > 0:
+                        current_avg_price = new_cost / new_quantity
+                    current_total_cost = new_cost
+                    current_quantity = new_quantity
+                else:
+                    # Satış işlemi: miktarı azalt, ortalama fiyat aynı kalır
+                    current_quantity -= transaction["quantity"]
+                    # Kalan pozisyon için maliyet
+                    current_total_cost = current_avg_price * current_quantity
+            
+            # Final değerleri ata
+            position["avg_price"] = current_avg_price
+            position["total_cost"] = current_total_cost
+            
+            # Negatif değerleri kontrol et
+            if position["total_cost"] < 0:
+                position["total_cost"] = 0
+                position["avg_price"] = 0
+            
+            # Kalan realize hesapla (henüz satılmamış pozisyonun değeri)
+            if position["current_price"]:
+                position["unrealized_capital"] = position["current_price"] * position["total_quantity"]
+            else:
+                position["unrealized_capital"] = position["avg_price"] * position["total_quantity"]
+            
+            # Realize edilen kar/zarar hesapla
+            realized_profit_loss = 0
+            total_buy_cost = 0
+            total_sell_revenue = 0
+            
+            for transaction in position["transactions"]:
+                if transaction["transaction_type"] == "buy":
+                    total_buy_cost += transaction["price"] * transaction["quantity"]
+                else:  # sell
+                    total_sell_revenue += transaction["price"] * transaction["quantity"]
+            
+            # Realize edilen kar/zarar = Satış geliri - Satılan hisselerin maliyeti
+            if total_sell_revenue > 0:
+                sold_quantity = sum(t["quantity"] for t in position["transactions"] if t["transaction_type"] == "sell")
+                if sold_quantity > 0:
+                    avg_buy_price = total_buy_cost / (position["total_quantity"] + sold_quantity)
+                    realized_profit_loss = total_sell_revenue - (avg_buy_price * sold_quantity)
+            
+            position["realized_profit_loss"] = realized_profit_loss
+            
+            # Realize yüzdesi hesapla
+            total_investment = position["total_cost"] + position["realized_capital"]
+            if total_investment > 0:
+                position["realized_percentage"] = (position["realized_capital"] / total_investment) * 100
+            else:
+                position["realized_percentage"] = 0
+            
+            positions.append(position)
+    
+    return positions
+
 @app.get("/portfolio/positions")
 async def get_portfolio_positions(portfolio: Optional[str] = Query(None, description="Portföy ID'si"), current_user: dict = Depends(get_current_user)):
     """Sembollere göre gruplandırılmış pozisyonları getir - Sadece kendi portföylerini görebilir"""
@@ -2467,23 +4018,34 @@ async def get_portfolio_positions(portfolio: Optional[str] = Query(None, descrip
         
         # Admin ise tüm portföyleri görebilir
         if current_user.get("is_admin"):
-            portfolio_data = load_portfolio(portfolio)
+            portfolio_data = overlay_snapshot_prices(await run_io(load_portfolio, portfolio))
             filtered_portfolio = portfolio_data
         else:
             # Normal kullanıcı ise sadece kendi portföylerini görebilir
-            portfolio_list = load_portfolio_list()
+            portfolio_list = await run_io(load_portfolio_list)
             user_portfolio = next((p for p in portfolio_list if p["portfolio_id"] == portfolio and p.get("owner_username") == current_user["username"]), None)
             
             if not user_portfolio:
                 return {"success": True, "positions": []}
             
-            portfolio_data = load_portfolio(portfolio)
+            portfolio_data = overlay_snapshot_prices(await run_io(load_portfolio, portfolio))
             filtered_portfolio = portfolio_data
         
+        positions = await run_cpu(calculate_positions, filtered_portfolio)
+        
+        return {"success": True, "positions": positions}
+    except Exception as e:
+        print(f"❌ ERROR: Portfolio positions error: {str(e)}")
+        return {"success": False, "error": f"Pozisyonlar alınamadı: {str(e)}"}
+
+def build_portfolio_export_data(portfolio: List[Dict]) -> tuple:
+    """Export için pozisyonları ve özet bilgileri hesapla"""
+    # Pozisyonları yükle - manuel olarak pozisyon hesapla
+    try:
         # Sembollere göre grupla
         symbol_positions = {}
         
-        for item in filtered_portfolio:
+        for item in portfolio:
             symbol = item["symbol"]
             if symbol not in symbol_positions:
                 symbol_positions[symbol] = {
@@ -2491,9 +4053,9 @@ async def get_portfolio_positions(portfolio: Optional[str] = Query(None, descrip
                     "market": item["market"],
                     "total_quantity": 0,
                     "total_cost": 0,
-                    "realized_capital": 0,  # Realize edilen anapara
-                    "unrealized_capital": 0,  # Kalan realize
-                    "realized_percentage": 0,  # Realize yüzdesi
+                    "realized_capital": 0,
+                    "unrealized_capital": 0,
+                    "realized_percentage": 0,
                     "avg_price": 0,
                     "current_price": item.get("current_price"),
                     "last_updated": item.get("last_updated"),
@@ -2506,7 +4068,7 @@ async def get_portfolio_positions(portfolio: Optional[str] = Query(None, descrip
             symbol_positions[symbol]["transactions"].append({
                 "id": item["id"],
                 "transaction_type": item["transaction_type"],
-                "type": item["transaction_type"],  # Frontend için alias
+                "type": item["transaction_type"],
                 "price": item["price"],
                 "quantity": item["quantity"],
                 "date": item["date"],
@@ -2514,215 +4076,214 @@ async def get_portfolio_positions(portfolio: Optional[str] = Query(None, descrip
                 "notes": item.get("notes")
             })
             
-            # Net pozisyon hesapla - SADECE MİKTAR
+            # Net pozisyon hesapla
             if item["transaction_type"] == "buy":
                 symbol_positions[symbol]["total_quantity"] += item["quantity"]
             else:  # sell
                 symbol_positions[symbol]["total_quantity"] -= item["quantity"]
-                # Satış işlemlerinden realize edilen anaparayı hesapla
                 symbol_positions[symbol]["realized_capital"] += item["price"] * item["quantity"]
             
-            # Hedef fiyat ve notları güncelle (son işlemden al)
+            # Hedef fiyat ve notları güncelle (son işlemden al - pozisyon ekranı ile aynı)
             if item.get("target_price"):
                 symbol_positions[symbol]["target_price"] = item["target_price"]
             if item.get("notes"):
                 symbol_positions[symbol]["notes"] = item["notes"]
         
-        # YENİ MANTIK: Her işlemde güncel ortalama fiyat hesaplama
+        # Pozisyonları hesapla
         positions = []
         for symbol, position in symbol_positions.items():
             if position["total_quantity"] > 0:
-                # Her işlemde güncel ortalama fiyat hesapla
-                current_avg_price = 0
-                current_total_cost = 0
-                current_quantity = 0
-                
-                # İşlemleri sırayla işle (tarih sırasına göre)
-                sorted_transactions = sorted(position["transactions"], key=lambda x: x["date"])
-                
-                for transaction in sorted_transactions:
-                    if transaction["transaction_type"] == "buy":
-                        # Alım işlemi: ortalama fiyatı güncelle
-                        new_cost = current_total_cost + (transaction["price"] * transaction["quantity"])
-                        new_quantity = current_quantity + transaction["quantity"]
-                        if new_quantity > 0:
-                            current_avg_price = new_cost / new_quantity
-                        current_total_cost = new_cost
-                        current_quantity = new_quantity
-                    else:
-                        # Satış işlemi: miktarı azalt, ortalama fiyat aynı kalır
-                        current_quantity -= transaction["quantity"]
-                        # Kalan pozisyon için maliyet
-                        current_total_cost = current_avg_price * current_quantity
-                
-                # Final değerleri ata
-                position["avg_price"] = current_avg_price
-                position["total_cost"] = current_total_cost
-                
-                # Negatif değerleri kontrol et
-                if position["total_cost"] < 0:
-                    position["total_cost"] = 0
-                    position["avg_price"] = 0
-                
-                # Kalan realize hesapla (henüz satılmamış pozisyonun değeri)
-                if position["current_price"]:
-                    position["unrealized_capital"] = position["current_price"] * position["total_quantity"]
-                else:
-                    position["unrealized_capital"] = position["avg_price"] * position["total_quantity"]
-                
-                # Realize edilen kar/zarar hesapla
-                realized_profit_loss = 0
-                total_buy_cost = 0
-                total_sell_revenue = 0
+                # Ortalama fiyat hesapla
+                total_cost = 0
+                total_quantity = 0
                 
                 for transaction in position["transactions"]:
                     if transaction["transaction_type"] == "buy":
-                        total_buy_cost += transaction["price"] * transaction["quantity"]
-                    else:  # sell
-                        total_sell_revenue += transaction["price"] * transaction["quantity"]
-                
-                # Realize edilen kar/zarar = Satış geliri - Satılan hisselerin maliyeti
-                if total_sell_revenue > 0:
-                    sold_quantity = sum(t["quantity"] for t in position["transactions"] if t["transaction_type"] == "sell")
-                    if sold_quantity > 0:
-                        avg_buy_price = total_buy_cost / (position["total_quantity"] + sold_quantity)
-                        realized_profit_loss = total_sell_revenue - (avg_buy_price * sold_quantity)
-                
-                position["realized_profit_loss"] = realized_profit_loss
+                        total_cost += transaction["price"] * transaction["quantity"]
+                        total_quantity += transaction["quantity"]
                 
-                # Realize yüzdesi hesapla
-                total_investment = position["total_cost"] + position["realized_capital"]
-                if total_investment > 0:
-                    position["realized_percentage"] = (position["realized_capital"] / total_investment) * 100
-                else:
-                    position["realized_percentage"] = 0
-                
-                positions.append(position)
+                if total_quantity > 0:
+                    position["avg_price"] = total_cost / total_quantity
+                    position["total_cost"] = total_cost
+                    
+                    # Güncel değer hesapla
+                    if position["current_price"]:
+                        position["unrealized_capital"] = position["current_price"] * position["total_quantity"]
+                    
+                    positions.append(position)
+    
+    except Exception as e:
+        print(f"❌ ERROR: Positions calculation error: {str(e)}")
+        positions = []
+    
+    # Özet bilgileri hesapla
+    try:
+        total_investment = sum(item['price'] * item['quantity'] for item in portfolio if item['transaction_type'] == 'buy')
+        total_current_value = sum((item.get('current_price', 0) or 0) * item['quantity'] for item in portfolio if item['transaction_type'] == 'buy')
+        total_profit_loss = total_current_value - total_investment
+        total_profit_loss_percent = (total_profit_loss / total_investment) * 100 if total_investment > 0 else 0
+        
+        summary = {
+            "total_transactions": len(portfolio),
+            "active_positions": len(positions),
+            "total_investment": total_investment,
+            "total_current_value": total_current_value,
+            "total_profit_loss": total_profit_loss,
+            "total_profit_loss_percent": total_profit_loss_percent
+        }
+    except Exception as e:
+        print(f"❌ ERROR: Summary calculation error: {str(e)}")
+        summary = {}
+    
+    return positions, summary
+
+# ---------- Export Formatları ----------
+EXPORT_MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# CSV/Parquet kolonları (makine tarafından okunacak isimler)
+EXPORT_POSITION_COLUMNS = [
+    "symbol", "market", "avg_price", "total_quantity", "current_price", "target_price",
+    "total_cost", "current_value", "profit_loss", "profit_loss_percent",
+    "realized_capital", "unrealized_capital", "last_updated", "notes"
+]
+EXPORT_TRANSACTION_COLUMNS = [
+    "id", "date", "symbol", "market", "transaction_type", "price", "quantity", "target_price", "notes"
+]
+
+def iter_export_rows(portfolio: List[Dict], dataset: str):
+    """Excel ile aynı pozisyon hesabından (build_portfolio_export_data) satır satır kayıt üret"""
+    if dataset == "transactions":
+        for item in portfolio:
+            yield [item.get(column) for column in EXPORT_TRANSACTION_COLUMNS]
+        return
+    
+    positions, _ = build_portfolio_export_data(portfolio)
+    for position in positions:
+        current_value, profit_loss, profit_loss_percent = position_profit(position)
+        record = {**position, "current_value": current_value, "profit_loss": profit_loss, "profit_loss_percent": profit_loss_percent}
+        yield [record.get(column) for column in EXPORT_POSITION_COLUMNS]
+
+def export_columns(dataset: str) -> List[str]:
+    """Veri setinin kolon listesi"""
+    return EXPORT_TRANSACTION_COLUMNS if dataset == "transactions" else EXPORT_POSITION_COLUMNS
+
+def iter_portfolio_csv(portfolio: List[Dict], dataset: str):
+    """CSV'yi satır satır üret - tüm dosya bellekte tutulmaz"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    def flush() -> str:
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return value
+    
+    buffer.write("\ufeff")  # Excel'in Türkçe karakterleri doğru açması için BOM
+    writer.writerow(export_columns(dataset))
+    yield flush()
+    for row in iter_export_rows(portfolio, dataset):
+        writer.writerow(row)
+        yield flush()
+
+def create_portfolio_parquet(portfolio: List[Dict], dataset: str) -> str:
+    """Satırları kolon bazlı listelere toplayıp Parquet dosyası yaz, dosya yolunu döndür"""
+    try:
+        import pyarrow  # noqa: F401 - pandas.to_parquet motoru
+    except ImportError:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Parquet export için pyarrow kurulu olmalı")
+    
+    columns = export_columns(dataset)
+    columnar = {column: [] for column in columns}
+    for row in iter_export_rows(portfolio, dataset):
+        for column, value in zip(columns, row):
+            columnar[column].append(value)
+    
+    fd, path = tempfile.mkstemp(suffix='.parquet')
+    os.close(fd)
+    try:
+        pd.DataFrame(columnar, columns=columns).to_parquet(path, index=False)
+        return path
+    except Exception:
+        remove_file_quietly(path)
+        raise
+
+async def export_portfolio_file(portfolio_id: str, export_format: str, dataset: str, current_user: dict):
+    """Portföyü istenen formatta export et - Sadece kendi portföylerini export edebilir"""
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Desteklenmeyen format: {export_format}")
+    if dataset not in ("positions", "transactions"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Desteklenmeyen veri seti: {dataset}")
+    
+    # Admin ise tüm portföyleri export edebilir
+    if not current_user.get("is_admin"):
+        # Normal kullanıcı ise sadece kendi portföylerini export edebilir
+        portfolio_list = await run_io(load_portfolio_list)
+        user_portfolio = next((p for p in portfolio_list if p["portfolio_id"] == portfolio_id and p.get("owner_username") == current_user["username"]), None)
         
-        return {"success": True, "positions": positions}
+        if not user_portfolio:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Bu portföyü export etme yetkiniz yok")
+    
+    # Portföy verilerini yükle (fiyatlar paylaşılan snapshot'tan)
+    portfolio = overlay_snapshot_prices(await run_io(load_portfolio, portfolio_id))
+    
+    # Dosya adı oluştur
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if export_format == "xlsx":
+        filename = f"portfoy_raporu_{portfolio_id}_{timestamp}.xlsx"
+    else:
+        filename = f"portfoy_{dataset}_{portfolio_id}_{timestamp}.{export_format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    
+    if export_format == "csv":
+        # CSV doğrudan akıtılır; üretimi ucuz olduğu için önbelleğe alınmaz
+        return StreamingResponse(iter_portfolio_csv(portfolio, dataset), media_type=EXPORT_MEDIA_TYPES["csv"], headers=headers)
+    
+    if export_format == "xlsx":
+        # Excel rapor tarihini (gün) içerir: anahtara da girer, ertesi gün aynı dosya sunulmaz
+        report_date = datetime.now().strftime('%d.%m.%Y')
+        def create_file():
+            positions, summary = build_portfolio_export_data(portfolio)
+            return create_portfolio_excel(portfolio, positions, summary, report_date)
+        def make_key():
+            return export_cache_key(portfolio_id, portfolio, "xlsx", report_date)
+    else:
+        def create_file():
+            return create_portfolio_parquet(portfolio, dataset)
+        def make_key():
+            return export_cache_key(portfolio_id, portfolio, f"{dataset}.parquet", with_last_updated=dataset == "positions")
+    
+    # Aynı işlem seti + aynı fiyatlar daha önce export edildiyse diskten sun; anahtar hesabı
+    # (tüm portföyün serileştirilip hash'lenmesi) dahil pozisyon hesabı ve dosya üretimi thread'de - event loop bloklanmaz
+    file_path, cache_hit = await run_cpu(get_or_create_export, make_key, create_file)
+    headers["X-Export-Cache"] = "hit" if cache_hit else "miss"
+    
+    # Önbellekteki dosyayı parça parça gönder
+    return StreamingResponse(iter_file_chunks(file_path, cleanup=False), media_type=EXPORT_MEDIA_TYPES[export_format], headers=headers)
+
+@app.get("/portfolio/export")
+async def export_portfolio(
+    portfolio_id: str = Query(..., description="Portföy ID'si"),
+    format: str = Query("xlsx", description="xlsx, csv veya parquet"),
+    dataset: str = Query("positions", description="csv/parquet için: positions veya transactions"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Portföy verilerini xlsx, csv veya parquet olarak export et"""
+    try:
+        return await export_portfolio_file(portfolio_id, format.lower(), dataset, current_user)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ ERROR: Portfolio positions error: {str(e)}")
-        return {"success": False, "error": f"Pozisyonlar alınamadı: {str(e)}"}
+        return {"error": f"Export hatası: {str(e)}"}
 
 @app.get("/portfolio/export-excel")
 async def export_portfolio_excel(portfolio_id: str = Query(..., description="Portföy ID'si"), current_user: dict = Depends(get_current_user)):
     """Portföy verilerini Excel dosyası olarak export et - Sadece kendi portföylerini export edebilir"""
     try:
-        # Admin ise tüm portföyleri export edebilir
-        if not current_user.get("is_admin"):
-            # Normal kullanıcı ise sadece kendi portföylerini export edebilir
-            portfolio_list = load_portfolio_list()
-            user_portfolio = next((p for p in portfolio_list if p["portfolio_id"] == portfolio_id and p.get("owner_username") == current_user["username"]), None)
-            
-            if not user_portfolio:
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Bu portföyü export etme yetkiniz yok")
-        
-        # Portföy verilerini yükle
-        portfolio = load_portfolio(portfolio_id)
-        
-        # Pozisyonları yükle - manuel olarak pozisyon hesapla
-        try:
-            # Sembollere göre grupla
-            symbol_positions = {}
-            
-            for item in portfolio:
-                symbol = item["symbol"]
-                if symbol not in symbol_positions:
-                    symbol_positions[symbol] = {
-                        "symbol": symbol,
-                        "market": item["market"],
-                        "total_quantity": 0,
-                        "total_cost": 0,
-                        "realized_capital": 0,
-                        "unrealized_capital": 0,
-                        "realized_percentage": 0,
-                        "avg_price": 0,
-                        "current_price": item.get("current_price"),
-                        "last_updated": item.get("last_updated"),
-                        "target_price": None,
-                        "notes": "",
-                        "transactions": []
-                    }
-                
-                # İşlem bilgilerini ekle
-                symbol_positions[symbol]["transactions"].append({
-                    "id": item["id"],
-                    "transaction_type": item["transaction_type"],
-                    "type": item["transaction_type"],
-                    "price": item["price"],
-                    "quantity": item["quantity"],
-                    "date": item["date"],
-                    "target_price": item.get("target_price"),
-                    "notes": item.get("notes")
-                })
-                
-                # Net pozisyon hesapla
-                if item["transaction_type"] == "buy":
-                    symbol_positions[symbol]["total_quantity"] += item["quantity"]
-                else:  # sell
-                    symbol_positions[symbol]["total_quantity"] -= item["quantity"]
-                    symbol_positions[symbol]["realized_capital"] += item["price"] * item["quantity"]
-            
-            # Pozisyonları hesapla
-            positions = []
-            for symbol, position in symbol_positions.items():
-                if position["total_quantity"] > 0:
-                    # Ortalama fiyat hesapla
-                    total_cost = 0
-                    total_quantity = 0
-                    
-                    for transaction in position["transactions"]:
-                        if transaction["transaction_type"] == "buy":
-                            total_cost += transaction["price"] * transaction["quantity"]
-                            total_quantity += transaction["quantity"]
-                    
-                    if total_quantity > 0:
-                        position["avg_price"] = total_cost / total_quantity
-                        position["total_cost"] = total_cost
-                        
-                        # Güncel değer hesapla
-                        if position["current_price"]:
-                            position["unrealized_capital"] = position["current_price"] * position["total_quantity"]
-                        
-                        positions.append(position)
-            
-        except Exception as e:
-            print(f"❌ ERROR: Positions calculation error: {str(e)}")
-            positions = []
-        
-        # Özet bilgileri hesapla
-        try:
-            total_investment = sum(item['price'] * item['quantity'] for item in portfolio if item['transaction_type'] == 'buy')
-            total_current_value = sum((item.get('current_price', 0) or 0) * item['quantity'] for item in portfolio if item['transaction_type'] == 'buy')
-            total_profit_loss = total_current_value - total_investment
-            total_profit_loss_percent = (total_profit_loss / total_investment) * 100 if total_investment > 0 else 0
-            
-            summary = {
-                "total_transactions": len(portfolio),
-                "active_positions": len(positions),
-                "total_investment": total_investment,
-                "total_current_value": total_current_value,
-                "total_profit_loss": total_profit_loss,
-                "total_profit_loss_percent": total_profit_loss_percent
-            }
-        except Exception as e:
-            print(f"❌ ERROR: Summary calculation error: {str(e)}")
-            summary = {}
-        
-        # Excel dosyası oluştur
-        excel_file_path = create_portfolio_excel(portfolio, positions, summary)
-        
-        # Dosya adı oluştur
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"portfoy_raporu_{portfolio_id}_{timestamp}.xlsx"
-        
-        # Dosyayı response olarak döndür
-        return FileResponse(
-            path=excel_file_path,
-            filename=filename,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        
+        return await export_portfolio_file(portfolio_id, "xlsx", "positions", current_user)
     except Exception as e:
         return {"error": f"Excel export hatası: {str(e)}"}
 
@@ -2732,16 +4293,17 @@ async def export_portfolio_excel(portfolio_id: str = Query(..., description="Por
 async def get_watchlist():
     """Takip listesini getir"""
     try:
-        watchlist = load_watchlist()
+        watchlist = overlay_snapshot_prices(await run_io(load_watchlist))
         return {"success": True, "watchlist": watchlist}
     except Exception as e:
         return {"error": f"Takip listesi alınamadı: {str(e)}"}
 
 @app.post("/watchlist/add")
+@serialized_writes
 async def add_to_watchlist(request: WatchlistAddRequest):
     """Takip listesine ekle"""
     try:
-        watchlist = load_watchlist()
+        watchlist = await run_io(load_watchlist)
         
         # Sembol zaten var mı kontrol et
         existing_item = next((item for item in watchlist if item["symbol"] == request.symbol and item["market"] == request.market), None)
@@ -2761,17 +4323,19 @@ async def add_to_watchlist(request: WatchlistAddRequest):
         }
         
         watchlist.append(new_item)
-        save_watchlist(watchlist)
+        await run_io(save_watchlist, watchlist)
+        await run_io(mark_alert_index_dirty)
         
         return {"success": True, "message": f"{request.symbol} takip listesine eklendi", "item": new_item}
     except Exception as e:
         return {"error": f"Takip listesine eklenemedi: {str(e)}"}
 
 @app.delete("/watchlist/{item_id}")
+@serialized_writes
 async def remove_from_watchlist(item_id: str):
     """Takip listesinden kaldır"""
     try:
-        watchlist = load_watchlist()
+        watchlist = await run_io(load_watchlist)
         
         # Item'ı bul ve kaldır
         original_length = len(watchlist)
@@ -2780,16 +4344,18 @@ async def remove_from_watchlist(item_id: str):
         if len(watchlist) == original_length:
             return {"error": "Takip listesi item'ı bulunamadı"}
         
-        save_watchlist(watchlist)
+        await run_io(save_watchlist, watchlist)
+        await run_io(mark_alert_index_dirty)
         return {"success": True, "message": "Takip listesinden kaldırıldı"}
     except Exception as e:
         return {"error": f"Takip listesinden kaldırılamadı: {str(e)}"}
 
 @app.put("/watchlist/{item_id}")
+@serialized_writes
 async def update_watchlist_item(item_id: str, request: WatchlistUpdateRequest):
     """Takip listesi item'ını güncelle"""
     try:
-        watchlist = load_watchlist()
+        watchlist = await run_io(load_watchlist)
         
         # Item'ı bul
         item = next((item for item in watchlist if item["id"] == item_id), None)
@@ -2802,7 +4368,8 @@ async def update_watchlist_item(item_id: str, request: WatchlistUpdateRequest):
         if request.notes is not None:
             item["notes"] = request.notes
         
-        save_watchlist(watchlist)
+        await run_io(save_watchlist, watchlist)
+        await run_io(mark_alert_index_dirty)
         return {"success": True, "message": "Takip listesi güncellendi", "item": item}
     except Exception as e:
         return {"error": f"Takip listesi güncellenemedi: {str(e)}"}
@@ -2811,58 +4378,38 @@ async def update_watchlist_item(item_id: str, request: WatchlistUpdateRequest):
 async def update_watchlist_prices():
     """Takip listesindeki tüm fiyatları güncelle"""
     try:
-        watchlist = load_watchlist()
-        updated_count = 0
+        watchlist = await run_io(load_watchlist)
         
-        for item in watchlist:
-            try:
-                # Fiyat güncelleme fonksiyonunu çağır
-                if item["market"] == "bist":
-                    price_data = await get_bist_price(item["symbol"])
-                elif item["market"] == "crypto":
-                    price_data = await get_crypto_price(item["symbol"])
-                else:
-                    continue
-                
-                if price_data and "price" in price_data:
-                    item["current_price"] = price_data["price"]
-                    item["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    updated_count += 1
-                
-                # Rate limiting
-                await asyncio.sleep(1)
-                
-            except Exception as e:
-                print(f"Fiyat güncellenirken hata: {item['symbol']} - {str(e)}")
-                continue
+        # Portföy ile aynı hat: tekil semboller bir kez çekilir ve snapshot'a yazılır
+        prices = await refresh_price_snapshots(
+            (item["symbol"], item["market"]) for item in watchlist if item["market"] in ("bist", "crypto")
+        )
         
-        save_watchlist(watchlist)
+        async with data_write_lock():
+            watchlist = await run_io(load_watchlist)
+            updated_count = apply_prices(watchlist, prices)
+            await run_io(save_watchlist, watchlist)
         return {"success": True, "message": f"{updated_count} fiyat güncellendi", "watchlist": watchlist}
     except Exception as e:
         return {"error": f"Fiyatlar güncellenemedi: {str(e)}"}
 
 # ---------- Fiyat Alma Fonksiyonları ----------
+async def get_tv_price_info(symbol: str, market: str):
+    """Fiyat, gün içi yüksek/düşük ve hacim (havuzlu asenkron scanner isteği)"""
+    values = (await tv_scan_symbols([symbol], market, columns=PRICE_COLUMNS, delay=PRICE_REQUEST_DELAY)).get(symbol)
+    if not values:
+        return None
+    return {
+        "price": values.get('close') or 0,
+        "high": values.get('high') or 0,
+        "low": values.get('low') or 0,
+        "volume": values.get('volume') or 0
+    }
+
 async def get_bist_price(symbol: str):
     """BIST hisse fiyatını al"""
     try:
-        wait_for_rate_limit()
-        
-        handler = TA_Handler(
-            symbol=symbol,
-            exchange="BIST",
-            screener="turkey",
-            interval=Interval.INTERVAL_1_DAY
-        )
-        
-        analysis = handler.get_analysis()
-        if analysis and hasattr(analysis, 'indicators') and analysis.indicators:
-            return {
-                "price": analysis.indicators.get('close', 0),
-                "high": analysis.indicators.get('high', 0),
-                "low": analysis.indicators.get('low', 0),
-                "volume": analysis.indicators.get('volume', 0)
-            }
-        return None
+        return await get_tv_price_info(symbol, "bist")
     except Exception as e:
         print(f"BIST fiyat alma hatası ({symbol}): {str(e)}")
         return None
@@ -2870,74 +4417,180 @@ async def get_bist_price(symbol: str):
 async def get_crypto_price(symbol: str):
     """Kripto para fiyatını al"""
     try:
-        wait_for_rate_limit()
-        
-        handler = TA_Handler(
-            symbol=symbol,
-            exchange="BINANCE",
-            screener="crypto",
-            interval=Interval.INTERVAL_1_DAY
-        )
-        
-        analysis = handler.get_analysis()
-        if analysis and hasattr(analysis, 'indicators') and analysis.indicators:
-            return {
-                "price": analysis.indicators.get('close', 0),
-                "high": analysis.indicators.get('high', 0),
-                "low": analysis.indicators.get('low', 0),
-                "volume": analysis.indicators.get('volume', 0)
-            }
-        return None
+        return await get_tv_price_info(symbol, "crypto")
     except Exception as e:
         print(f"Kripto fiyat alma hatası ({symbol}): {str(e)}")
         return None
 
 # ---------- Excel Export Fonksiyonları ----------
-def create_portfolio_excel(portfolio_data: List[Dict], positions_data: List[Dict], summary_data: Dict) -> str:
-    """Portföy verilerini Excel dosyası olarak oluştur"""
+EXCEL_NUMBER_FORMAT = '#,##0.00'
+EXPORT_CHUNK_SIZE = 64 * 1024  # Streaming response parça boyutu
+
+POSITION_HEADERS = [
+    "Sembol", "Piyasa", "Ort. Fiyat", "Miktar", "Güncel Fiyat", "Hedef Fiyat",
+    "Hedefe Kalan %", "Kar/Zarar", "Kar/Zarar %", "Realize Kar", 
+    "Realize Anapara", "Kalan Realize", "Toplam Değer", "Notlar"
+]
+TRANSACTION_HEADERS = [
+    "Tarih", "Sembol", "Piyasa", "İşlem Türü", "Fiyat", "Miktar", 
+    "Hedef Fiyat", "Notlar", "İşlem ID"
+]
+PERFORMANCE_HEADERS = ["Sembol", "Kar/Zarar", "Kar/Zarar %", "Yatırım", "Güncel Değer"]
+
+def register_excel_styles(wb) -> None:
+    """Paylaşılan isimli stilleri workbook'a bir kez ekle - hücre başına stil nesnesi oluşturulmaz"""
+    thin = xl_styles.Side(style='thin')
+    border = xl_styles.Border(left=thin, right=thin, top=thin, bottom=thin)
+    green = xl_styles.PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+    red = xl_styles.PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+    
+    for style in [
+        xl_styles.NamedStyle(name="rapor_baslik", font=xl_styles.Font(bold=True, size=16)),
+        xl_styles.NamedStyle(name="rapor_tarih", font=xl_styles.Font(italic=True)),
+        xl_styles.NamedStyle(name="bolum_baslik", font=xl_styles.Font(bold=True, size=14), fill=green),
+        xl_styles.NamedStyle(name="tablo_baslik", font=xl_styles.Font(bold=True, color="FFFFFF"),
+                   fill=xl_styles.PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+                   alignment=xl_styles.Alignment(horizontal="center", vertical="center"), border=border),
+        xl_styles.NamedStyle(name="alt_baslik", font=xl_styles.Font(bold=True, color="FFFFFF"),
+                   fill=xl_styles.PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid"), border=border),
+        xl_styles.NamedStyle(name="ozet_deger", font=xl_styles.Font(bold=True, size=12), alignment=xl_styles.Alignment(horizontal="center"), border=border),
+        xl_styles.NamedStyle(name="hucre", border=border),
+        xl_styles.NamedStyle(name="hucre_pozitif", border=border, fill=green),
+        xl_styles.NamedStyle(name="hucre_negatif", border=border, fill=red),
+        xl_styles.NamedStyle(name="sayi", border=border, number_format=EXCEL_NUMBER_FORMAT),
+        xl_styles.NamedStyle(name="sayi_pozitif", border=border, number_format=EXCEL_NUMBER_FORMAT, fill=green),
+        xl_styles.NamedStyle(name="sayi_negatif", border=border, number_format=EXCEL_NUMBER_FORMAT, fill=red),
+    ]:
+        wb.add_named_style(style)
+
+def excel_cell(ws, value, style: str) -> "xl_cell.WriteOnlyCell":
+    """İsimli stil ile write-only hücre oluştur"""
+    cell = xl_cell.WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+def excel_data_row(ws, values: List[Any], number_columns: set, fills: Optional[Dict[int, str]] = None) -> List["xl_cell.WriteOnlyCell"]:
+    """Veri satırı: sayısal kolonlara sayı formatı, istenen kolonlara pozitif/negatif dolgu"""
+    fills = fills or {}
+    row = []
+    for col, value in enumerate(values, 1):
+        style = "sayi" if col in number_columns and isinstance(value, (int, float)) else "hucre"
+        if col in fills:
+            style = f"{style}_{fills[col]}"
+        row.append(excel_cell(ws, value, style))
+    return row
+
+def set_excel_column_widths(ws, headers: List[str], rows) -> None:
+    """Kolon genişliklerini içerik uzunluğuna göre ayarla (write-only modda satırlardan önce)"""
+    widths = [len(str(header)) for header in headers]
+    for values in rows:
+        for i, value in enumerate(values):
+            widths[i] = max(widths[i], len(str(value)))
+    for i, width in enumerate(widths, 1):
+        ws.column_dimensions[xl_utils.get_column_letter(i)].width = min(width + 2, 30)
+
+def position_profit(position: Dict) -> tuple:
+    """Pozisyonun güncel değeri, kar/zararı ve kar/zarar yüzdesi"""
+    current_value = (position.get("current_price", 0) or 0) * position.get("total_quantity", 0)
+    profit_loss = current_value - position.get("total_cost", 0)
+    profit_loss_percent = (profit_loss / position.get("total_cost", 0)) * 100 if position.get("total_cost", 0) > 0 else 0
+    return current_value, profit_loss, profit_loss_percent
+
+def iter_position_rows(positions_data: List[Dict]):
+    """Pozisyonlar sayfasının satır değerleri"""
+    for position in positions_data:
+        current_value, profit_loss, profit_loss_percent = position_profit(position)
+        
+        target_progress = 0
+        if position.get("target_price") and position.get("current_price"):
+            target_progress = ((position.get("current_price", 0) - position.get("target_price", 0)) / position.get("target_price", 0)) * 100
+        
+        yield [
+            position.get("symbol", ""),
+            position.get("market", "").upper(),
+            position.get("avg_price", 0),
+            position.get("total_quantity", 0),
+            position.get("current_price", 0) or 0,
+            position.get("target_price", 0) or 0,
+            f"{target_progress:.2f}%",
+            profit_loss,
+            f"{profit_loss_percent:.2f}%",
+            position.get("realized_profit_loss", 0),
+            position.get("realized_capital", 0),
+            position.get("unrealized_capital", 0),
+            current_value,
+            position.get("notes", "")
+        ]
+
+def iter_transaction_rows(portfolio_data: List[Dict]):
+    """İşlem geçmişi sayfasının satır değerleri"""
+    for transaction in portfolio_data:
+        # Tarih formatını düzenle
+        try:
+            transaction_date = datetime.fromisoformat(transaction.get("date", "")).strftime("%d.%m.%Y %H:%M")
+        except:
+            transaction_date = transaction.get("date", "")
+        
+        yield [
+            transaction_date,
+            transaction.get("symbol", ""),
+            transaction.get("market", "").upper(),
+            "Alış" if transaction.get("transaction_type") == "buy" else "Satış",
+            transaction.get("price", 0),
+            transaction.get("quantity", 0),
+            transaction.get("target_price", 0) or 0,
+            transaction.get("notes", ""),
+            transaction.get("id", "")
+        ]
+
+def iter_performance_rows(positions_data: List[Dict], top: int = 5):
+    """Performans sayfası: kar/zarara göre en iyi pozisyonlar"""
+    best = heapq.nlargest(top, positions_data, key=lambda position: position_profit(position)[1])
+    for position in best:
+        current_value, profit_loss, profit_loss_percent = position_profit(position)
+        yield [
+            position.get("symbol", ""),
+            profit_loss,
+            f"{profit_loss_percent:.2f}%",
+            position.get("total_cost", 0),
+            current_value
+        ]
+
+def sign_fill(value) -> Optional[str]:
+    """Sayının işaretine göre dolgu stili son eki"""
+    if isinstance(value, (int, float)):
+        if value > 0:
+            return "pozitif"
+        if value < 0:
+            return "negatif"
+    return None
+
+def create_portfolio_excel(portfolio_data: List[Dict], positions_data: List[Dict], summary_data: Dict, report_date: Optional[str] = None) -> str:
+    """Portföy verilerini write-only modda Excel dosyası olarak oluştur ve dosya yolunu döndür
+    
+    Hücreler satır satır diske yazılır; bellek kullanımı portföy büyüklüğünden bağımsızdır.
+    Dosyayı silmek çağıranın sorumluluğundadır (bkz. iter_file_chunks).
+    report_date gün hassasiyetindedir; önbellek anahtarıyla aynı değer verilmelidir.
+    """
+    report_date = report_date or datetime.now().strftime('%d.%m.%Y')
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
     try:
-        # Geçici dosya oluştur
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-        temp_file.close()
-        
-        # Excel workbook oluştur
-        wb = openpyxl.Workbook()
-        
-        # Stil tanımlamaları
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        subheader_font = Font(bold=True, color="FFFFFF")
-        subheader_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        wb = openpyxl.Workbook(write_only=True)
+        register_excel_styles(wb)
         
         # 1. ÖZET SAYFASI
-        ws_summary = wb.active
-        ws_summary.title = "Portföy Özeti"
+        ws_summary = wb.create_sheet("Portföy Özeti")
+        ws_summary.append([excel_cell(ws_summary, "PORTFÖY ÖZET RAPORU", "rapor_baslik")])
+        ws_summary.append([excel_cell(ws_summary, f"Rapor Tarihi: {report_date}", "rapor_tarih")])
+        ws_summary.merged_cells.add('A1:H1')
+        ws_summary.merged_cells.add('A2:H2')
+        ws_summary.append([])
         
-        # Başlık
-        ws_summary['A1'] = "PORTFÖY ÖZET RAPORU"
-        ws_summary['A1'].font = Font(bold=True, size=16)
-        ws_summary.merge_cells('A1:H1')
-        
-        # Tarih
-        ws_summary['A2'] = f"Rapor Tarihi: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
-        ws_summary['A2'].font = Font(italic=True)
-        ws_summary.merge_cells('A2:H2')
-        
-        # Özet bilgiler
         summary_headers = [
             "Toplam İşlem", "Aktif Pozisyon", "Toplam Yatırım", "Güncel Değer", 
             "Kar/Zarar", "Kar/Zarar %"
         ]
-        
         summary_values = [
             summary_data.get("total_transactions", 0),
             summary_data.get("active_positions", 0),
@@ -2946,251 +4599,180 @@ def create_portfolio_excel(portfolio_data: List[Dict], positions_data: List[Dict
             summary_data.get("total_profit_loss", 0),
             f"{summary_data.get('total_profit_loss_percent', 0):.2f}%"
         ]
-        
-        for i, (header, value) in enumerate(zip(summary_headers, summary_values)):
-            col = i * 2 + 1
-            ws_summary[f'{chr(65 + col)}4'] = header
-            ws_summary[f'{chr(65 + col)}4'].font = header_font
-            ws_summary[f'{chr(65 + col)}4'].fill = header_fill
-            ws_summary[f'{chr(65 + col)}4'].alignment = header_alignment
-            ws_summary[f'{chr(65 + col)}4'].border = border
-            
-            ws_summary[f'{chr(65 + col)}5'] = value
-            ws_summary[f'{chr(65 + col)}5'].font = Font(bold=True, size=12)
-            ws_summary[f'{chr(65 + col)}5'].alignment = Alignment(horizontal="center")
-            ws_summary[f'{chr(65 + col)}5'].border = border
+        # Başlıklar B, D, F... kolonlarında (aralarda boş kolon)
+        header_row, value_row = [None], [None]
+        for header, value in zip(summary_headers, summary_values):
+            header_row += [excel_cell(ws_summary, header, "tablo_baslik"), None]
+            value_row += [excel_cell(ws_summary, value, "ozet_deger"), None]
+        ws_summary.append(header_row)
+        ws_summary.append(value_row)
         
         # 2. POZİSYONLAR SAYFASI
         ws_positions = wb.create_sheet("Pozisyonlar")
-        
-        # Pozisyon başlıkları
-        position_headers = [
-            "Sembol", "Piyasa", "Ort. Fiyat", "Miktar", "Güncel Fiyat", "Hedef Fiyat",
-            "Hedefe Kalan %", "Kar/Zarar", "Kar/Zarar %", "Realize Kar", 
-            "Realize Anapara", "Kalan Realize", "Toplam Değer", "Notlar"
-        ]
-        
-        for col, header in enumerate(position_headers, 1):
-            cell = ws_positions.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = border
-        
-        # Pozisyon verileri
-        for row, position in enumerate(positions_data, 2):
-            current_value = (position.get("current_price", 0) or 0) * position.get("total_quantity", 0)
-            profit_loss = current_value - position.get("total_cost", 0)
-            profit_loss_percent = (profit_loss / position.get("total_cost", 0)) * 100 if position.get("total_cost", 0) > 0 else 0
-            
-            target_progress = 0
-            if position.get("target_price") and position.get("current_price"):
-                target_progress = ((position.get("current_price", 0) - position.get("target_price", 0)) / position.get("target_price", 0)) * 100
-            
-            position_data = [
-                position.get("symbol", ""),
-                position.get("market", "").upper(),
-                position.get("avg_price", 0),
-                position.get("total_quantity", 0),
-                position.get("current_price", 0) or 0,
-                position.get("target_price", 0) or 0,
-                f"{target_progress:.2f}%",
-                profit_loss,
-                f"{profit_loss_percent:.2f}%",
-                position.get("realized_profit_loss", 0),
-                position.get("realized_capital", 0),
-                position.get("unrealized_capital", 0),
-                current_value,
-                position.get("notes", "")
-            ]
-            
-            for col, value in enumerate(position_data, 1):
-                cell = ws_positions.cell(row=row, column=col, value=value)
-                cell.border = border
-                
-                # Sayısal değerler için format
-                if col in [3, 4, 5, 6, 8, 10, 11, 12, 13]:  # Sayısal kolonlar
-                    if isinstance(value, (int, float)):
-                        cell.number_format = '#,##0.00'
-                
-                # Kar/zarar renklendirme
-                if col == 8 and isinstance(value, (int, float)):  # Kar/Zarar kolonu
-                    if value > 0:
-                        cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                    elif value < 0:
-                        cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-        
-        # Sütun genişliklerini ayarla
-        for column in ws_positions.columns:
-            max_length = 0
-            try:
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 30)
-                ws_positions.column_dimensions[column_letter].width = adjusted_width
-            except AttributeError:
-                # MergedCell için atla
-                continue
+        set_excel_column_widths(ws_positions, POSITION_HEADERS, iter_position_rows(positions_data))
+        ws_positions.append([excel_cell(ws_positions, header, "tablo_baslik") for header in POSITION_HEADERS])
+        for values in iter_position_rows(positions_data):
+            ws_positions.append(excel_data_row(
+                ws_positions, values, {3, 4, 5, 6, 8, 10, 11, 12, 13},
+                {8: sign_fill(values[7])} if sign_fill(values[7]) else None
+            ))
         
         # 3. İŞLEM GEÇMİŞİ SAYFASI
         ws_transactions = wb.create_sheet("İşlem Geçmişi")
-        
-        # İşlem başlıkları
-        transaction_headers = [
-            "Tarih", "Sembol", "Piyasa", "İşlem Türü", "Fiyat", "Miktar", 
-            "Hedef Fiyat", "Notlar", "İşlem ID"
-        ]
-        
-        for col, header in enumerate(transaction_headers, 1):
-            cell = ws_transactions.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = border
-        
-        # İşlem verileri
-        for row, transaction in enumerate(portfolio_data, 2):
-            # Tarih formatını düzenle
-            try:
-                transaction_date = datetime.fromisoformat(transaction.get("date", "")).strftime("%d.%m.%Y %H:%M")
-            except:
-                transaction_date = transaction.get("date", "")
-            
-            transaction_data = [
-                transaction_date,
-                transaction.get("symbol", ""),
-                transaction.get("market", "").upper(),
-                "Alış" if transaction.get("transaction_type") == "buy" else "Satış",
-                transaction.get("price", 0),
-                transaction.get("quantity", 0),
-                transaction.get("target_price", 0) or 0,
-                transaction.get("notes", ""),
-                transaction.get("id", "")
-            ]
-            
-            for col, value in enumerate(transaction_data, 1):
-                cell = ws_transactions.cell(row=row, column=col, value=value)
-                cell.border = border
-                
-                # Sayısal değerler için format
-                if col in [5, 6, 7]:  # Fiyat, miktar, hedef fiyat
-                    if isinstance(value, (int, float)):
-                        cell.number_format = '#,##0.00'
-                
-                # İşlem türü renklendirme
-                if col == 4:  # İşlem türü kolonu
-                    if value == "Alış":
-                        cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                    else:
-                        cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-        
-        # Sütun genişliklerini ayarla
-        for column in ws_transactions.columns:
-            max_length = 0
-            try:
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 30)
-                ws_transactions.column_dimensions[column_letter].width = adjusted_width
-            except AttributeError:
-                # MergedCell için atla
-                continue
+        set_excel_column_widths(ws_transactions, TRANSACTION_HEADERS, iter_transaction_rows(portfolio_data))
+        ws_transactions.append([excel_cell(ws_transactions, header, "tablo_baslik") for header in TRANSACTION_HEADERS])
+        for values in iter_transaction_rows(portfolio_data):
+            ws_transactions.append(excel_data_row(
+                ws_transactions, values, {5, 6, 7},
+                {4: "pozitif" if values[3] == "Alış" else "negatif"}
+            ))
         
         # 4. PERFORMANS ANALİZİ SAYFASI
         ws_performance = wb.create_sheet("Performans Analizi")
-        
-        # Performans başlıkları
-        ws_performance['A1'] = "PERFORMANS ANALİZİ"
-        ws_performance['A1'].font = Font(bold=True, size=16)
-        ws_performance.merge_cells('A1:H1')
-        
-        # En iyi performans gösteren pozisyonlar
-        ws_performance['A3'] = "En İyi Performans (Kar)"
-        ws_performance['A3'].font = Font(bold=True, size=14)
-        ws_performance['A3'].fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-        
-        performance_headers = ["Sembol", "Kar/Zarar", "Kar/Zarar %", "Yatırım", "Güncel Değer"]
-        for col, header in enumerate(performance_headers, 1):
-            cell = ws_performance.cell(row=4, column=col, value=header)
-            cell.font = subheader_font
-            cell.fill = subheader_fill
-            cell.border = border
-        
-        # Pozisyonları kar/zarar'a göre sırala
-        sorted_positions = sorted(positions_data, key=lambda x: (x.get("current_price", 0) or 0) * x.get("total_quantity", 0) - x.get("total_cost", 0), reverse=True)
-        
-        # En iyi 5 pozisyon
-        for row, position in enumerate(sorted_positions[:5], 5):
-            current_value = (position.get("current_price", 0) or 0) * position.get("total_quantity", 0)
-            profit_loss = current_value - position.get("total_cost", 0)
-            profit_loss_percent = (profit_loss / position.get("total_cost", 0)) * 100 if position.get("total_cost", 0) > 0 else 0
-            
-            performance_data = [
-                position.get("symbol", ""),
-                profit_loss,
-                f"{profit_loss_percent:.2f}%",
-                position.get("total_cost", 0),
-                current_value
-            ]
-            
-            for col, value in enumerate(performance_data, 1):
-                cell = ws_performance.cell(row=row, column=col, value=value)
-                cell.border = border
-                if col in [2, 4, 5]:  # Sayısal kolonlar
-                    if isinstance(value, (int, float)):
-                        cell.number_format = '#,##0.00'
-        
-        # Sütun genişliklerini ayarla
-        for column in ws_performance.columns:
-            max_length = 0
-            try:
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 30)
-                ws_performance.column_dimensions[column_letter].width = adjusted_width
-            except AttributeError:
-                # MergedCell için atla
-                continue
-        
-        # Excel dosyasını kaydet
-        wb.save(temp_file.name)
-        return temp_file.name
+        set_excel_column_widths(ws_performance, PERFORMANCE_HEADERS, iter_performance_rows(positions_data))
+        ws_performance.append([excel_cell(ws_performance, "PERFORMANS ANALİZİ", "rapor_baslik")])
+        ws_performance.merged_cells.add('A1:H1')
+        ws_performance.append([])
+        ws_performance.append([excel_cell(ws_performance, "En İyi Performans (Kar)", "bolum_baslik")])
+        ws_performance.append([excel_cell(ws_performance, header, "alt_baslik") for header in PERFORMANCE_HEADERS])
+        for values in iter_performance_rows(positions_data):
+            ws_performance.append(excel_data_row(ws_performance, values, {2, 4, 5}))
+        
+        wb.save(path)
+        return path
         
     except Exception as e:
         print(f"Excel oluşturma hatası: {e}")
+        remove_file_quietly(path)
         raise e
 
+def remove_file_quietly(path: str) -> None:
+    """Geçici dosyayı sil, yoksa sorun etme"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def iter_file_chunks(path: str, cleanup: bool = True):
+    """Dosyayı hemen aç ve parça parça okuyan generator döndür
+    
+    Dosya önceden açıldığı için önbellekten silinse bile gönderim tamamlanır.
+    cleanup=True ise bitince (veya istemci koparsa) dosya silinir.
+    """
+    f = open(path, 'rb')
+    
+    def chunks():
+        try:
+            while True:
+                chunk = f.read(EXPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+            if cleanup:
+                remove_file_quietly(path)
+    
+    return chunks()
+
+# ---------- Export Önbelleği ----------
+# Dosya adı: {portfolio_id}_{içerik hash'i}.{format}; aynı işlem seti + aynı fiyatlar -> aynı dosya
+EXPORT_CACHE_DIR = os.path.join(DATA_DIR, "export_cache")
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get("EXPORT_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+EXPORT_CACHE_LOCK = Lock()
+
+def export_cache_key(portfolio_id: str, portfolio: List[Dict], fmt: str, report_date: Optional[str] = None,
+                     with_last_updated: bool = False) -> str:
+    """İşlem seti, kullanılan fiyat snapshot'ı ve (Excel için) rapor gününden içerik adresli önbellek anahtarı üret.
+    with_last_updated: dosya fiyat zamanını da içeriyorsa (pozisyon Parquet'i) fiyat aynı kalsa da yenilemede anahtar değişir"""
+    transactions = sorted(
+        ({k: v for k, v in item.items() if k not in ("current_price", "last_updated")} for item in portfolio),
+        key=lambda item: str(item.get("id"))
+    )
+    # Sadece bu portföyün sembollerinin fiyatları: başka sembollerin fiyatı değişince önbellek bozulmaz
+    prices = sorted({
+        (item["symbol"], item["market"], item.get("current_price"), item.get("last_updated") if with_last_updated else None)
+        for item in portfolio
+    }, key=str)
+    payload = json.dumps({"transactions": transactions, "prices": prices, "report_date": report_date}, sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+    return f"{portfolio_id}_{digest}.{fmt}"
+
+def get_cached_export(cache_key: str) -> Optional[str]:
+    """Önbellekte varsa dosya yolunu döndür ve LRU için erişim zamanını güncelle"""
+    path = os.path.join(EXPORT_CACHE_DIR, cache_key)
+    try:
+        os.utime(path)
+        return path
+    except OSError:
+        return None
+
+def store_export(cache_key: str, temp_path: str) -> str:
+    """Üretilen dosyayı önbelleğe taşı ve boyut sınırını uygula"""
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_CACHE_DIR, cache_key)
+    shutil.move(temp_path, path)
+    evict_export_cache(keep=path)
+    return path
+
+def evict_export_cache(keep: Optional[str] = None) -> None:
+    """Toplam boyut sınırı aşılırsa en uzun süredir kullanılmayan raporları sil"""
+    with EXPORT_CACHE_LOCK:
+        try:
+            entries = []
+            for name in os.listdir(EXPORT_CACHE_DIR):
+                path = os.path.join(EXPORT_CACHE_DIR, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        except OSError:
+            return
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= EXPORT_CACHE_MAX_BYTES:
+                break
+            if path == keep:
+                continue
+            remove_file_quietly(path)
+            total -= size
+
+def invalidate_export_cache(portfolio_id: str) -> None:
+    """Portföy değişince ona ait eski raporları sil"""
+    if not os.path.isdir(EXPORT_CACHE_DIR):
+        return
+    prefix = f"{portfolio_id}_"
+    with EXPORT_CACHE_LOCK:
+        for name in os.listdir(EXPORT_CACHE_DIR):
+            if name.startswith(prefix):
+                remove_file_quietly(os.path.join(EXPORT_CACHE_DIR, name))
+
+def get_or_create_export(make_key, create) -> tuple:
+    """Önbellekten dön ya da create() ile üretip önbelleğe al -> (dosya yolu, önbellekten mi).
+    Anahtar make_key() ile burada (havuz thread'inde) hesaplanır."""
+    cache_key = make_key()
+    path = get_cached_export(cache_key)
+    CACHE_REQUESTS.labels("export", "hit" if path else "miss").inc()
+    if path:
+        return path, True
+    return store_export(cache_key, create()), False
+
 # ---------- ADMIN ENDPOINT'LERİ ----------
 
 @app.post("/admin/login")
+@serialized_writes
 async def admin_login(request: AdminLoginRequest):
     """Admin girişi"""
     try:
-        users = load_users()
+        users = await run_io(load_users)
         admin_user = next((u for u in users if u["username"] == request.username and u["is_admin"]), None)
         
         if admin_user and verify_password(request.password, admin_user["password"]):
             # API key oluştur
-            api_key = create_api_key(request.username)
+            api_key = await run_io(create_api_key, request.username)
             
             # Son giriş zamanını güncelle
             admin_user["last_login"] = datetime.now().isoformat()
-            save_users(users)
+            await run_io(save_users, users)
             
             return {
                 "success": True,
@@ -3207,10 +4789,11 @@ async def admin_login(request: AdminLoginRequest):
         return {"success": False, "error": f"Giriş hatası: {str(e)}"}
 
 @app.post("/user/login")
+@serialized_writes
 async def user_login(request: UserLoginRequest):
     """Normal kullanıcı girişi"""
     try:
-        users = load_users()
+        users = await run_io(load_users)
         user = next((u for u in users if u["username"] == request.username and u["is_active"]), None)
         
         print(f"🔍 DEBUG: Login attempt - username: {request.username}, password: {request.password}")
@@ -3220,11 +4803,11 @@ async def user_login(request: UserLoginRequest):
         
         if user and verify_password(request.password, user["password"]):
             # API key oluştur
-            api_key = create_api_key(request.username)
+            api_key = await run_io(create_api_key, request.username)
             
             # Son giriş zamanını güncelle
             user["last_login"] = datetime.now().isoformat()
-            save_users(users)
+            await run_io(save_users, users)
             
             return {
                 "success": True,
@@ -3249,13 +4832,14 @@ async def get_all_users(current_user: dict = Depends(get_current_user)):
         if not current_user.get("is_admin"):
             return {"success": False, "error": "Admin yetkisi gerekli"}
             
-        users = load_users()
+        users = await run_io(load_users)
         # Şifreleri göster (admin için)
         return {"success": True, "users": users}
     except Exception as e:
         return {"success": False, "error": f"Kullanıcılar yüklenemedi: {str(e)}"}
 
 @app.post("/admin/users")
+@serialized_writes
 async def create_user(request: UserCreateRequest, current_user: dict = Depends(get_current_user)):
     """Yeni kullanıcı oluştur (admin only)"""
     try:
@@ -3263,7 +4847,7 @@ async def create_user(request: UserCreateRequest, current_user: dict = Depends(g
         if not current_user.get("is_admin"):
             return {"success": False, "error": "Admin yetkisi gerekli"}
             
-        users = load_users()
+        users = await run_io(load_users)
         
         # Kullanıcı adı zaten var mı kontrol et
         if any(user['username'] == request.username for user in users):
@@ -3282,7 +4866,7 @@ async def create_user(request: UserCreateRequest, current_user: dict = Depends(g
         }
         
         users.append(new_user)
-        save_users(users)
+        await run_io(save_users, users)
         
         # Şifreyi gizle
         new_user.pop('password', None)
@@ -3292,6 +4876,7 @@ async def create_user(request: UserCreateRequest, current_user: dict = Depends(g
         return {"success": False, "error": f"Kullanıcı oluşturulamadı: {str(e)}"}
 
 @app.put("/admin/users/{user_id}")
+@serialized_writes
 async def update_user(user_id: str, request: UserUpdateRequest, current_user: dict = Depends(get_current_user)):
     """Kullanıcı güncelle (admin only)"""
     try:
@@ -3299,7 +4884,7 @@ async def update_user(user_id: str, request: UserUpdateRequest, current_user: di
         if not current_user.get("is_admin"):
             return {"success": False, "error": "Admin yetkisi gerekli"}
             
-        users = load_users()
+        users = await run_io(load_users)
         
         # Kullanıcıyı bul
         user_index = None
@@ -3328,7 +4913,7 @@ async def update_user(user_id: str, request: UserUpdateRequest, current_user: di
         if request.password is not None:
             users[user_index]['password'] = hash_password(request.password)
         
-        save_users(users)
+        await run_io(save_users, users)
         
         # Güncellenmiş kullanıcıyı döndür (şifre gizli)
         updated_user = users[user_index].copy()
@@ -3339,6 +4924,7 @@ async def update_user(user_id: str, request: UserUpdateRequest, current_user: di
         return {"success": False, "error": f"Kullanıcı güncellenemedi: {str(e)}"}
 
 @app.delete("/admin/users/{user_id}")
+@serialized_writes
 async def delete_user(user_id: str, current_user: dict = Depends(get_current_user)):
     """Kullanıcı sil (admin only)"""
     try:
@@ -3346,7 +4932,7 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_current_use
         if not current_user.get("is_admin"):
             return {"success": False, "error": "Admin yetkisi gerekli"}
             
-        users = load_users()
+        users = await run_io(load_users)
         
         # Admin kullanıcısını silmeye izin verme
         user_to_delete = None
@@ -3362,7 +4948,7 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_current_use
         
         # Kullanıcıyı sil
         users = [u for u in users if u['id'] != user_id]
-        save_users(users)
+        await run_io(save_users, users)
         
         return {"success": True, "message": f"Kullanıcı '{user_to_delete['username']}' silindi"}
     except Exception as e:
@@ -3376,7 +4962,7 @@ async def get_all_portfolios(current_user: dict = Depends(get_current_user)):
         if not current_user.get("is_admin"):
             return {"success": False, "error": "Admin yetkisi gerekli"}
             
-        portfolio_list = load_portfolio_list()
+        portfolio_list = await run_io(load_portfolio_list)
         all_portfolios = []
         
         for portfolio in portfolio_list:
@@ -3443,51 +5029,240 @@ async def get_portfolio_details(portfolio_id: str, current_user: dict = Depends(
     except Exception as e:
         return {"success": False, "error": f"Portföy detayları yüklenemedi: {str(e)}"}
 
-# ---------- UYGULAMA BAŞLATMA ----------
-if __name__ == "__main__":
-    # Database'i başlat
-    print("🚀 DCA Scanner Backend başlatılıyor...")
-    print("🔧 Database başlatılıyor...")
-    # Kalıcı veri klasörünü oluştur ve mevcut verileri taşı
+@app.get("/admin/profiles")
+async def admin_list_profiles(current_user: dict = Depends(get_current_user)):
+    """Kaydedilmiş istek profilleri, en yeni önce (admin only)"""
+    if not current_user.get("is_admin"):
+        return {"success": False, "error": "Admin yetkisi gerekli"}
+    return {"success": True, "profiles": PROFILE_STORE.list()}
+
+@app.get("/admin/import-report")
+async def admin_import_report(current_user: dict = Depends(get_current_user)):
+    """main'in import süresi ve gecikmeli yüklenen kütüphanelerin süreleri/tetikleyicileri (admin only)"""
+    if not current_user.get("is_admin"):
+        return {"success": False, "error": "Admin yetkisi gerekli"}
+    return {"success": True, **lazy_imports.report({"main_import_ms": round(IMPORT_SECONDS * 1000, 1)})}
+
+@app.get("/admin/profiles/{filename}")
+async def admin_get_profile(filename: str, current_user: dict = Depends(get_current_user)):
+    """Profil çıktısı: .folded (flamegraph.pl / speedscope) veya .txt (pstats) (admin only)"""
+    if not current_user.get("is_admin"):
+        return {"success": False, "error": "Admin yetkisi gerekli"}
+    path = PROFILE_STORE.path(filename)
+    if not path:
+        return {"success": False, "error": "Profil bulunamadı"}
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=filename)
+
+@app.get("/admin/upstream-health")
+async def admin_upstream_health(current_user: dict = Depends(get_current_user)):
+    """Devre kesici durumları ve negatif önbellekteki semboller (admin only)"""
+    if not current_user.get("is_admin"):
+        return {"success": False, "error": "Admin yetkisi gerekli"}
+    
+    with UPSTREAM_BREAKERS_LOCK:
+        breakers = list(UPSTREAM_BREAKERS.values())
+    failing = [
+        {"upstream": key[0], "symbol": key[1], "scope": key[2], **failure}
+        for key, failure in SYMBOL_FAILURES.snapshot().items()
+    ]
+    return {
+        "success": True,
+        "breakers": [breaker.status() for breaker in breakers],
+        "failing_symbols": sorted(failing, key=lambda failure: -failure["retry_in"])
+    }
+
+@app.post("/admin/instruments/refresh")
+async def admin_refresh_instruments(current_user: dict = Depends(get_current_user)):
+    """Kripto kataloğunu borsa market listesiyle hemen güncelle ve tüm katalogu yeniden yükle (admin only)"""
     try:
-        os.makedirs(DATA_DIR, exist_ok=True)
-        print(f"📁 DATA_DIR: {os.path.abspath(DATA_DIR)}")
-        bootstrap_data_dir()
+        if not current_user.get("is_admin"):
+            return {"success": False, "error": "Admin yetkisi gerekli"}
+        
+        result = await run_io(refresh_crypto_instruments)
+        await run_io(reload_instruments)
+        return {"success": True, **result}
     except Exception as e:
-        print(f"❌ DATA_DIR hazırlanamadi: {e}")
-    init_database()
-    
-    # Mevcut JSON verilerini database'e taşı
-    print("📦 Mevcut veriler database'e taşınıyor...")
-    migrate_json_to_database()
-    
-    # API key'leri yükle
-    print("🔑 API key'ler yükleniyor...")
-    active_api_keys.update(load_api_keys())
-    print(f"✅ {len(active_api_keys)} API key yüklendi")
+        return {"success": False, "error": f"Enstrüman kataloğu güncellenemedi: {str(e)}"}
+
+# ---------- Toplu Export (Admin) ----------
+BULK_EXPORT_DIR = os.path.join(DATA_DIR, "bulk_exports")
+BULK_EXPORT_FORMATS = ("csv", "parquet")
+BULK_EXPORT_WORKERS = max(1, int(os.environ.get("BULK_EXPORT_WORKERS", 2)))
+BULK_EXPORT_KEEP = 3  # Diskte tutulacak son arşiv sayısı
+BULK_EXPORT_JOBS: Dict[str, Dict] = {}
+BULK_EXPORT_LOCK = Lock()
+
+def write_bulk_export_files(portfolio_id: str, portfolio: List[Dict], export_format: str, out_dir: str) -> List[str]:
+    """Process pool işçisi: tek portföyün positions/transactions dosyalarını out_dir'e yaz"""
+    paths = []
+    for dataset in ("positions", "transactions"):
+        path = os.path.join(out_dir, f"{portfolio_id}_{dataset}.{export_format}")
+        if export_format == "csv":
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                for chunk in iter_portfolio_csv(portfolio, dataset):
+                    f.write(chunk)
+        else:
+            shutil.move(create_portfolio_parquet(portfolio, dataset), path)
+        paths.append(path)
+    return paths
+
+def bulk_export_job_info(job: Dict) -> Dict:
+    """İş durumunu API yanıtına uygun hale getir (dosya yolu dışarı verilmez)"""
+    return {key: value for key, value in job.items() if key != "path"}
+
+def prune_bulk_exports():
+    """Son BULK_EXPORT_KEEP arşiv dışındaki tamamlanmış işleri ve dosyalarını sil"""
+    with BULK_EXPORT_LOCK:
+        finished = sorted(
+            (job for job in BULK_EXPORT_JOBS.values() if job["status"] != "running"),
+            key=lambda job: job["started_at"], reverse=True
+        )
+        stale = finished[BULK_EXPORT_KEEP:]
+        for job in stale:
+            BULK_EXPORT_JOBS.pop(job["job_id"], None)
+    for job in stale:
+        if job.get("path"):
+            remove_file_quietly(job["path"])
+
+def run_bulk_export(job_id: str):
+    """Tüm portföyleri process pool'da dosyalara yaz, biten her dosyayı zip'e ekleyip sil.
+    Aynı anda en fazla 2 x işçi sayısı kadar portföy bellekte/kuyrukta tutulur."""
+    import zipfile
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
     
-    # Kalıcı kullanıcı verilerini sağla
-    print("👥 Varsayılan kullanıcılar kontrol ediliyor...")
-    ensure_default_users_exist()
+    job = BULK_EXPORT_JOBS[job_id]
+    export_format = job["format"]
+    work_dir = os.path.join(BULK_EXPORT_DIR, job_id)
+    archive_path = os.path.join(BULK_EXPORT_DIR, f"{job_id}.zip")
+    os.makedirs(work_dir, exist_ok=True)
     
-    import uvicorn
-    import os
+    try:
+        portfolio_list = load_portfolio_list()
+        job["total"] = len(portfolio_list)
+        max_pending = BULK_EXPORT_WORKERS * 2
+        
+        with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            # Portföy listesi arşivin manifestosu
+            manifest = io.StringIO()
+            writer = csv.writer(manifest)
+            writer.writerow(["portfolio_id", "portfolio_name", "owner_username", "created_date", "last_updated"])
+            for info in portfolio_list:
+                writer.writerow([info.get("portfolio_id"), info.get("portfolio_name"), info.get("owner_username"), info.get("created_date"), info.get("last_updated")])
+            zf.writestr("portfolios.csv", "\ufeff" + manifest.getvalue())
+            
+            def collect(done_futures):
+                for future in done_futures:
+                    portfolio_id = pending.pop(future)
+                    for path in future.result():
+                        zf.write(path, arcname=f"{portfolio_id}/{os.path.basename(path)}")
+                        remove_file_quietly(path)
+                    job["done"] += 1
+            
+            pending = {}
+            # spawn: çok thread'li sunucu sürecinden fork etmek kilitlenmelere yol açabilir
+            with ProcessPoolExecutor(max_workers=BULK_EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn")) as pool:
+                for info in portfolio_list:
+                    portfolio_id = info["portfolio_id"]
+                    # Fiyatlar bu süreçteki snapshot'tan; işçiye hazır veri gönderilir
+                    portfolio = overlay_snapshot_prices(load_portfolio(portfolio_id))
+                    future = pool.submit(write_bulk_export_files, portfolio_id, portfolio, export_format, work_dir)
+                    pending[future] = portfolio_id
+                    if len(pending) >= max_pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+        
+        job.update(status="done", path=archive_path, size=os.path.getsize(archive_path))
+        print(f"📦 Toplu export tamamlandı: {job_id} ({job['done']} portföy, {job['size']} byte)")
+    except Exception as e:
+        remove_file_quietly(archive_path)
+        job.update(status="failed", error=str(getattr(e, "detail", e)))
+        print(f"❌ Toplu export hatası ({job_id}): {e}")
+    finally:
+        job["finished_at"] = datetime.now().isoformat()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        prune_bulk_exports()
+
+@app.get("/admin/export-all")
+async def admin_export_all(
+    format: str = Query("csv", description="csv veya parquet"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Tüm portföyleri tek zip arşivinde export eden arka plan işini başlat (admin only)"""
+    try:
+        if not current_user.get("is_admin"):
+            return {"success": False, "error": "Admin yetkisi gerekli"}
+        if format not in BULK_EXPORT_FORMATS:
+            return {"success": False, "error": f"Desteklenmeyen format: {format}"}
+        
+        with BULK_EXPORT_LOCK:
+            # Aynı formatta süren iş varsa yenisi başlatılmaz
+            running = next((job for job in BULK_EXPORT_JOBS.values() if job["status"] == "running" and job["format"] == format), None)
+            if running:
+                return {"success": True, "job": bulk_export_job_info(running)}
+            
+            job_id = generate_id()
+            job = {
+                "job_id": job_id,
+                "format": format,
+                "status": "running",
+                "total": 0,
+                "done": 0,
+                "size": None,
+                "error": None,
+                "requested_by": current_user["username"],
+                "started_at": datetime.now().isoformat(),
+                "finished_at": None,
+                "path": None
+            }
+            BULK_EXPORT_JOBS[job_id] = job
+        
+        os.makedirs(BULK_EXPORT_DIR, exist_ok=True)
+        Thread(target=run_bulk_export, args=(job_id,), daemon=True).start()
+        print(f"📦 Toplu export başlatıldı: {job_id} ({format})")
+        return {"success": True, "job": bulk_export_job_info(job)}
+    except Exception as e:
+        return {"success": False, "error": f"Toplu export başlatılamadı: {str(e)}"}
+
+@app.get("/admin/export-all/{job_id}")
+async def admin_export_all_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Toplu export işinin durumu (admin only)"""
+    if not current_user.get("is_admin"):
+        return {"success": False, "error": "Admin yetkisi gerekli"}
+    job = BULK_EXPORT_JOBS.get(job_id)
+    if not job:
+        return {"success": False, "error": "Export işi bulunamadı"}
+    return {"success": True, "job": bulk_export_job_info(job)}
+
+@app.get("/admin/export-all/{job_id}/download")
+async def admin_export_all_download(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Tamamlanan toplu export arşivini indir (admin only)"""
+    if not current_user.get("is_admin"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin yetkisi gerekli")
+    job = BULK_EXPORT_JOBS.get(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Export işi bulunamadı")
+    if job["status"] != "done" or not job.get("path") or not os.path.exists(job["path"]):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Export arşivi henüz hazır değil")
     
-    # Production'da PORT environment variable'ı kullan, local'de 8014
-    port = int(os.environ.get("PORT", 8014))
-    print(f"🌐 Server {port} portunda başlatılıyor...")
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    filename = f"tum_portfoyler_{job['format']}_{job_id}.zip"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    return StreamingResponse(iter_file_chunks(job["path"], cleanup=False), media_type="application/zip", headers=headers)
 
 # ---------- VERİ YÜKLEME ENDPOINT'LERİ ----------
 @app.post("/admin/load-data")
+@serialized_writes
 async def load_data_endpoint():
     """Kullanıcı ve portföy verilerini yükle (admin only)"""
     try:
         # Varsayılan admin kullanıcısını oluştur
-        create_default_admin()
+        await run_io(create_default_admin)
         
         # Test kullanıcıları oluştur
-        users = load_users()
+        users = await run_io(load_users)
         
         # Test kullanıcıları ekle (eğer yoksa)
         test_users = [
@@ -3512,10 +5287,35 @@ async def load_data_endpoint():
                 users.append(new_user)
                 print(f"✅ Test kullanıcı oluşturuldu: {test_user['username']}")
         
-        save_users(users)
+        await run_io(save_users, users)
         
         return {"success": True, "message": f"{len(users)} kullanıcı yüklendi"}
     except Exception as e:
         return {"success": False, "error": f"Veri yüklenemedi: {str(e)}"}
 
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
 
+# ---------- UYGULAMA BAŞLATMA ----------
+if __name__ == "__main__":
+    # Database, migrasyonlar ve varsayılan kullanıcılar uygulama başlangıcında (on_startup)
+    print("🚀 DCA Scanner Backend başlatılıyor...")
+    print(f"📁 DATA_DIR: {os.path.abspath(DATA_DIR)}")
+    
+    import uvicorn
+    import os
+    import sys
+    
+    # Production'da PORT environment variable'ı kullan, local'de 8014
+    port = int(os.environ.get("PORT", 8014))
+    # WEB_CONCURRENCY > 1: her worker uygulamayı ayrı süreçte "main:app" olarak import eder;
+    # paylaşılan durum (API key'leri, rate limit, zamanlayıcı kirası) database'de tutulur
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    print(f"🌐 Server {port} portunda başlatılıyor ({workers} worker)...")
+    if workers > 1:
+        # uvicorn CLI'ına devret: spawn edilen worker'lar bu script'i __mp_main__ olarak
+        # tekrar çalıştırıp modülü iki kez yüklemesin
+        os.execv(sys.executable, [
+            sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+            "--host", "0.0.0.0", "--port", str(port), "--workers", str(workers)
+        ])
+    uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,284 @@
+# Piyasa Verisi İstemcisi ve Sağlayıcıları
+# TradingView scanner endpoint'ine havuzlu (keep-alive) HTTP bağlantılarıyla istek atar.
+# Senkron ve asenkron arayüz aynı istek/yanıt dönüşümünü paylaşır; tek istekte birden çok sembol sorgulanır.
+# Sağlayıcılar (live / record / replay) aynı arayüzü sunar: replay, kaydedilmiş yanıtları diskten
+# ayarlanabilir gecikme ve hata oranıyla döndürür - ağ olmadan deterministik tarama ve yük testi için.
+
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+import httpx
+from tradingview_ta import TradingView
+from tradingview_ta.main import calculate, __version__ as TA_VERSION
+
+SCAN_URL = "https://scanner.tradingview.com/{screener}/scan"
+ANALYSIS_COLUMNS = TradingView.indicators  # TA_Handler'ın kullandığı sıra; calculate() bu sıraya bağlı
+PRICE_COLUMNS = ["close", "high", "low", "volume"]
+
+class MarketDataError(Exception):
+    """Scanner'dan 200 dışı yanıt"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+def build_scan_payload(tickers: List[str], interval: str, columns: List[str]) -> Dict[str, Any]:
+    """Scanner istek gövdesi (tickers: ["EXCHANGE:SYMBOL", ...])"""
+    return TradingView.data(tickers, interval, columns)
+
+def parse_scan_response(status_code: int, body: Dict[str, Any], tickers: List[str], columns: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Yanıtı {ticker: {kolon: değer}} sözlüğüne çevir; yanıtta olmayan ticker None"""
+    if status_code != 200:
+        raise MarketDataError(f"TradingView scanner HTTP status code: {status_code}", status_code)
+    rows = {row["s"].upper(): dict(zip(columns, row["d"])) for row in body.get("data") or []}
+    return {ticker: rows.get(ticker.upper()) for ticker in tickers}
+
+def build_analysis(values: Optional[Dict[str, Any]], screener: str, ticker: str, interval: str):
+    """Kolon değerlerinden TA_Handler.get_analysis() ile aynı Analysis nesnesini üret"""
+    if values is None:
+        return None
+    exchange, symbol = ticker.split(":", 1)
+    return calculate(indicators=values, indicators_key=ANALYSIS_COLUMNS, screener=screener, symbol=symbol, exchange=exchange, interval=interval)
+
+class TradingViewClient:
+    """Havuzlu TradingView scanner istemcisi. httpx istemcileri ilk kullanımda oluşturulur."""
+
+    def __init__(self, timeout: float = 30.0, connect_timeout: float = 10.0, max_connections: int = 10, max_keepalive: int = 5):
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive, keepalive_expiry=30.0)
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._headers = {"User-Agent": f"tradingview_ta/{TA_VERSION}"}
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._lock = Lock()
+
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(limits=self._limits, timeout=self._timeout, headers=self._headers)
+            return self._client
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._async_client is None:
+                self._async_client = httpx.AsyncClient(limits=self._limits, timeout=self._timeout, headers=self._headers)
+            return self._async_client
+
+    def scan(self, screener: str, tickers: List[str], interval: str = "1d", columns: Optional[List[str]] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Senkron scanner isteği (thread'lerden)"""
+        columns = columns or ANALYSIS_COLUMNS
+        response = self._sync_client().post(SCAN_URL.format(screener=screener.lower()), json=build_scan_payload(tickers, interval, columns))
+        return parse_scan_response(response.status_code, response.json() if response.status_code == 200 else {}, tickers, columns)
+
+    async def ascan(self, screener: str, tickers: List[str], interval: str = "1d", columns: Optional[List[str]] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Asenkron scanner isteği (event loop'tan)"""
+        columns = columns or ANALYSIS_COLUMNS
+        response = await self._get_async_client().post(SCAN_URL.format(screener=screener.lower()), json=build_scan_payload(tickers, interval, columns))
+        return parse_scan_response(response.status_code, response.json() if response.status_code == 200 else {}, tickers, columns)
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        with self._lock:
+            client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
+
+class MarketDataProvider:
+    """Sağlayıcı arayüzü: scanner kolonları ve OHLCV mumları"""
+
+    name = "base"
+    rate_limited = True  # False ise paylaşılan rate limiter beklenmez (replay)
+
+    def scan(self, screener: str, tickers: List[str], interval: str = "1d", columns: Optional[List[str]] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        raise NotImplementedError
+
+    async def ascan(self, screener: str, tickers: List[str], interval: str = "1d", columns: Optional[List[str]] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        raise NotImplementedError
+
+    def ohlcv(self, exchange: str, symbol: str, tf: str = "1d", limit: int = 400) -> List[List[float]]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+class LiveProvider(MarketDataProvider):
+    """Gerçek servisler: TradingView scanner + ccxt"""
+
+    name = "live"
+
+    def __init__(self, client: TradingViewClient):
+        self.client = client
+
+    def scan(self, screener, tickers, interval="1d", columns=None):
+        return self.client.scan(screener, tickers, interval, columns)
+
+    async def ascan(self, screener, tickers, interval="1d", columns=None):
+        return await self.client.ascan(screener, tickers, interval, columns)
+
+    def ohlcv(self, exchange, symbol, tf="1d", limit=400):
+        import ccxt
+        return getattr(ccxt, exchange)({"enableRateLimit": True}).fetch_ohlcv(symbol, timeframe=tf, limit=limit)
+
+    def close(self):
+        self.client.close()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+def _capture_name(text: str) -> str:
+    """Sembol/ticker'ı dosya adına çevir (BINANCE:BTC/USDT -> BINANCE_BTC_USDT)"""
+    return re.sub(r"[^A-Za-z0-9.-]+", "_", text.upper())
+
+class CaptureStore:
+    """Kayıt dizini düzeni:
+    scan/{screener}/{interval}/{TICKER}.json  -> {kolon: değer} (farklı kolon setleri birleştirilir)
+    ohlcv/{exchange}/{tf}/{SYMBOL}.json       -> [[ts, open, high, low, close, volume], ...]"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = Lock()
+
+    def _scan_path(self, screener: str, interval: str, ticker: str) -> str:
+        return os.path.join(self.root, "scan", screener.lower(), interval, f"{_capture_name(ticker)}.json")
+
+    def _ohlcv_path(self, exchange: str, tf: str, symbol: str) -> str:
+        return os.path.join(self.root, "ohlcv", exchange.lower(), tf, f"{_capture_name(symbol)}.json")
+
+    @staticmethod
+    def _read(path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _write(path: str, data) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    def save_scan(self, screener: str, interval: str, rows: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        with self._lock:
+            for ticker, values in rows.items():
+                if values is None:
+                    continue
+                path = self._scan_path(screener, interval, ticker)
+                self._write(path, {**(self._read(path) or {}), **values})
+
+    def load_scan(self, screener: str, interval: str, ticker: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        values = self._read(self._scan_path(screener, interval, ticker))
+        if values is None:
+            return None
+        return {column: values.get(column) for column in columns}
+
+    def save_ohlcv(self, exchange: str, tf: str, symbol: str, candles: List[List[float]]) -> None:
+        with self._lock:
+            self._write(self._ohlcv_path(exchange, tf, symbol), candles)
+
+    def load_ohlcv(self, exchange: str, tf: str, symbol: str, limit: int) -> Optional[List[List[float]]]:
+        candles = self._read(self._ohlcv_path(exchange, tf, symbol))
+        return candles[-limit:] if candles is not None else None
+
+class RecordingProvider(MarketDataProvider):
+    """Canlı sağlayıcıdan geçen her yanıtı diske yazar"""
+
+    name = "record"
+
+    def __init__(self, live: MarketDataProvider, store: CaptureStore):
+        self.live = live
+        self.store = store
+
+    def scan(self, screener, tickers, interval="1d", columns=None):
+        rows = self.live.scan(screener, tickers, interval, columns)
+        self.store.save_scan(screener, interval, rows)
+        return rows
+
+    async def ascan(self, screener, tickers, interval="1d", columns=None):
+        rows = await self.live.ascan(screener, tickers, interval, columns)
+        await asyncio.to_thread(self.store.save_scan, screener, interval, rows)
+        return rows
+
+    def ohlcv(self, exchange, symbol, tf="1d", limit=400):
+        candles = self.live.ohlcv(exchange, symbol, tf, limit)
+        self.store.save_ohlcv(exchange, tf, symbol, candles)
+        return candles
+
+    def close(self):
+        self.live.close()
+
+    async def aclose(self):
+        await self.live.aclose()
+
+class ReplayProvider(MarketDataProvider):
+    """Kayıtlı yanıtları ağ kullanmadan döndürür. Kaydı olmayan ticker bulunamadı (None) sayılır.
+    latency: istek başına saniye; error_rate: isteğin MarketDataError(error_status) ile düşme olasılığı."""
+
+    name = "replay"
+    rate_limited = False
+
+    def __init__(self, store: CaptureStore, latency: float = 0.0, error_rate: float = 0.0, error_status: int = 503, seed: Optional[int] = None):
+        self.store = store
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = Lock()
+
+    def _maybe_fail(self) -> None:
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise MarketDataError(f"Replay hata enjeksiyonu - HTTP status code: {self.error_status}", self.error_status)
+
+    def _rows(self, screener, tickers, interval, columns):
+        columns = columns or ANALYSIS_COLUMNS
+        return {ticker: self.store.load_scan(screener, interval, ticker, columns) for ticker in tickers}
+
+    def scan(self, screener, tickers, interval="1d", columns=None):
+        if self.latency:
+            time.sleep(self.latency)
+        self._maybe_fail()
+        return self._rows(screener, tickers, interval, columns)
+
+    async def ascan(self, screener, tickers, interval="1d", columns=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        # Kayıt dosyaları thread'de okunur: event loop gecikmesi ölçümlerine replay'in kendi I/O'su karışmaz
+        return await asyncio.to_thread(self._rows, screener, tickers, interval, columns)
+
+    def ohlcv(self, exchange, symbol, tf="1d", limit=400):
+        if self.latency:
+            time.sleep(self.latency)
+        self._maybe_fail()
+        candles = self.store.load_ohlcv(exchange, tf, symbol, limit)
+        if candles is None:
+            raise MarketDataError(f"Replay kaydı yok: {exchange} {symbol} {tf}", 404)
+        return candles
+
+def create_provider(name: str, client: TradingViewClient, capture_dir: str, latency: float = 0.0,
+                    error_rate: float = 0.0, error_status: int = 503, seed: Optional[int] = None) -> MarketDataProvider:
+    """MARKET_DATA_PROVIDER değerine göre sağlayıcı: live (varsayılan), record, replay"""
+    if name == "record":
+        return RecordingProvider(LiveProvider(client), CaptureStore(capture_dir))
+    if name == "replay":
+        return ReplayProvider(CaptureStore(capture_dir), latency=latency, error_rate=error_rate, error_status=error_status, seed=seed)
+    if name != "live":
+        raise ValueError(f"Bilinmeyen piyasa verisi sağlayıcısı: {name}")
+    return LiveProvider(client)
@@ -0,0 +1,43 @@
+# Hedef Fiyat Alarm İndeksi
+# Her (sembol, piyasa) için hedefler fiyata göre sıralı tutulur; bir fiyat hareketinde
+# kesilen hedefler bisect ile O(log n + k) sürede bulunur.
+
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+class PriceAlertIndex:
+    """Sembol başına sıralı hedef fiyat indeksi"""
+
+    def __init__(self):
+        # (symbol, market) -> (sıralı hedef fiyatlar, aynı sıradaki hedef kayıtları)
+        self._targets: Dict[Tuple[str, str], Tuple[List[float], List[Dict[str, Any]]]] = {}
+
+    def rebuild(self, targets: Iterable[Dict[str, Any]]) -> None:
+        """İndeksi hedef kayıtlarından baştan oluştur (kayıtta 'key' ve 'target_price' olmalı)"""
+        grouped: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for target in targets:
+            grouped.setdefault(target["key"], []).append(target)
+
+        index = {}
+        for key, entries in grouped.items():
+            entries.sort(key=lambda entry: entry["target_price"])
+            index[key] = ([entry["target_price"] for entry in entries], entries)
+        self._targets = index
+
+    def crossed(self, key: Tuple[str, str], previous: Optional[float], current: Optional[float]) -> List[Tuple[str, Dict[str, Any]]]:
+        """previous -> current hareketinde kesilen hedefleri (yön, kayıt) olarak döndür"""
+        if previous is None or current is None or previous == current or key not in self._targets:
+            return []
+
+        prices, entries = self._targets[key]
+        if current > previous:
+            # Yukarı kesiş: previous < hedef <= current
+            start, end = bisect_right(prices, previous), bisect_right(prices, current)
+            return [("up", entry) for entry in entries[start:end]]
+
+        # Aşağı kesiş: current <= hedef < previous
+        start, end = bisect_left(prices, current), bisect_left(prices, previous)
+        return [("down", entry) for entry in reversed(entries[start:end])]
+
+    def __len__(self) -> int:
+        return sum(len(prices) for prices, _ in self._targets.values())
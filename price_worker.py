@@ -0,0 +1,22 @@
+"""
+DCA Scanner Fiyat Worker'ı
+Aktif sembollerin fiyatlarını web sürecinden bağımsız olarak yeniler.
+
+Kullanım: web servisinde PRICE_SCHEDULER_MODE=worker ayarlayın ve
+ayrı bir süreçte `python price_worker.py` çalıştırın.
+"""
+
+import asyncio
+
+import main
+
+def run():
+    """Veri dizinini hazırla ve fiyat zamanlayıcısını çalıştır"""
+    print("🚀 DCA Scanner fiyat worker'ı başlatılıyor...")
+    main.bootstrap_data_dir()
+    main.init_database()
+    main.load_price_snapshots()
+    asyncio.run(main.run_price_scheduler())
+
+if __name__ == "__main__":
+    run()
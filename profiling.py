@@ -0,0 +1,126 @@
+# İstek Profilleme
+# SamplingProfiler: ayrı bir thread, sys._current_frames() ile süreçteki meşgul thread'lerin
+# yığınlarını belirli aralıklarla örnekler ve "collapsed stack" formatında (flamegraph.pl /
+# speedscope ile açılır) toplar. Örnek sayısı, süre ve yığın derinliği sınırlıdır.
+# cprofile_report: çağıran thread'de toplanan cProfile verisini pstats metnine çevirir.
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# Bekleyen (CPU harcamayan) thread'lerin yaprak çerçeveleri - örneklere dahil edilmez
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_LEAVES
+
+class SamplingProfiler:
+    """Süreç genelinde örnekleyici profiler (start/stop arasında)"""
+
+    def __init__(self, interval: float = 0.005, max_seconds: float = 30.0, max_samples: int = 20000, max_depth: int = 64):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.max_samples = max_samples
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.truncated = False  # Süre veya örnek sınırına ulaşıldı mı
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+
+    def _collect(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own or _is_idle(frame):
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, str(thread_id)))
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self.samples >= self.max_samples or time.perf_counter() - self._started_at >= self.max_seconds:
+                self.truncated = True
+                return
+            self._collect()
+
+    def start(self) -> None:
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """flamegraph.pl formatı: 'thread;dış;...;iç örnek_sayısı'"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def cprofile_report(profiler: cProfile.Profile, limit: int = 60) -> str:
+    """Kümülatif süreye göre en pahalı `limit` fonksiyon"""
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+class ProfileStore:
+    """Profil çıktılarını dizinde tutar, en yeni `keep` dosya kalır"""
+
+    def __init__(self, directory: str, keep: int = 20):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, profile_id: str, extension: str, content: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        filename = f"{profile_id}.{extension}"
+        with self._lock:
+            with open(os.path.join(self.directory, filename), "w", encoding="utf-8") as f:
+                f.write(content)
+            for old in self.list()[self.keep:]:
+                try:
+                    os.remove(os.path.join(self.directory, old["file"]))
+                except OSError:
+                    pass
+        return filename
+
+    def list(self) -> list:
+        """Dosyalar, en yeni önce"""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            entries.append({"file": name, "size": stat.st_size, "created_at": stat.st_mtime})
+        return sorted(entries, key=lambda entry: (entry["created_at"], entry["file"]), reverse=True)
+
+    def path(self, filename: str) -> Optional[str]:
+        """Dizindeki dosyanın yolu (yol ayırıcı içeren adlar reddedilir)"""
+        if os.path.basename(filename) != filename:
+            return None
+        path = os.path.join(self.directory, filename)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,139 @@
+# Sembol Kayıt Defteri
+# Enstrüman listesi bir kez indekslenir: tam sembol araması dict ile O(1),
+# sembol ve isim kelimesi önek aramaları sıralı dizi üzerinde bisect ile O(log n + k),
+# yazım hatalı aramalar trigram indeksiyle. Sonuçlar puanlanıp heap ile ilk k seçilir.
+
+import heapq
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Türkçe harfler ASCII karşılıklarına katlanır: "ACISELSAN", "Acıselsan", "aciselsan" aynı anahtarı verir.
+# İ/I, lower()'dan önce çevrilmeli; aksi halde "İ".lower() birleşik nokta karakteri üretir.
+_TURKISH_FOLD = str.maketrans({
+    "İ": "i", "I": "i", "ı": "i",
+    "Ç": "c", "ç": "c", "Ğ": "g", "ğ": "g",
+    "Ö": "o", "ö": "o", "Ş": "s", "ş": "s", "Ü": "u", "ü": "u",
+    "Â": "a", "â": "a", "Î": "i", "î": "i", "Û": "u", "û": "u",
+})
+
+# Puan sırası (küçük olan önce): tam sembol > sembol öneki > isim kelimesi öneki > bulanık eşleşme
+SCORE_EXACT_SYMBOL = 0
+SCORE_SYMBOL_PREFIX = 1
+SCORE_NAME_PREFIX = 2
+SCORE_FUZZY = 3
+
+FUZZY_MIN_QUERY = 3  # Bu uzunluktan kısa sorgularda trigram araması yapılmaz
+FUZZY_MIN_OVERLAP = 0.6  # Sorgu trigramlarının en az bu oranı eşleşmeli
+
+def normalize_key(text: str) -> str:
+    """Türkçe duyarlı arama anahtarı (katlanmış küçük harf, kenar boşlukları atılmış)"""
+    return text.strip().translate(_TURKISH_FOLD).lower()
+
+def trigrams(text: str) -> set:
+    """Metnin 3'lü harf grupları (kelime sınırları dahil)"""
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SymbolRegistry:
+    """Tek piyasa için indeksli sembol listesi"""
+
+    def __init__(self, entries: Iterable[Dict[str, Any]] = ()):
+        self.build(entries)
+
+    def build(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """İndeksleri baştan oluştur (kayıtta 'symbol' ve 'name' olmalı). Aynı sembol tekrar ederse ilki kalır."""
+        self._entries: List[Dict[str, Any]] = []
+        self._by_symbol: Dict[str, int] = {}
+        for entry in entries:
+            symbol = normalize_key(entry["symbol"])
+            if symbol in self._by_symbol:
+                continue
+            self._by_symbol[symbol] = len(self._entries)
+            self._entries.append(entry)
+
+        # Sıralı (anahtar, kayıt sırası) dizileri; anahtarlar önceden normalize edilir
+        folded_names = [normalize_key(entry.get("name", "")) for entry in self._entries]
+        symbol_index = sorted((symbol, position) for symbol, position in self._by_symbol.items())
+        name_index = sorted(
+            (token, position)
+            for position, name in enumerate(folded_names)
+            for token in set(name.split())
+        )
+        self._symbol_keys = [key for key, _ in symbol_index]
+        self._symbol_positions = [position for _, position in symbol_index]
+        self._name_keys = [key for key, _ in name_index]
+        self._name_positions = [position for _, position in name_index]
+
+        # Trigram -> kayıt sıraları (sembol ve isim birlikte)
+        self._grams: Dict[str, List[int]] = {}
+        for symbol, position in self._by_symbol.items():
+            for gram in trigrams(symbol) | trigrams(folded_names[position]):
+                self._grams.setdefault(gram, []).append(position)
+
+    @staticmethod
+    def _prefix_positions(keys: List[str], positions: List[int], prefix: str) -> Iterable[int]:
+        """Öneki taşıyan anahtarların kayıt sıralarını üret"""
+        start = bisect_left(keys, prefix)
+        for i in range(start, len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            yield positions[i]
+
+    def _fuzzy_positions(self, query: str) -> Dict[int, float]:
+        """Sorgu trigramlarının yeterli kısmını paylaşan kayıtlar -> eşleşme oranı"""
+        query_grams = trigrams(query)
+        counts = Counter()
+        for gram in query_grams:
+            counts.update(self._grams.get(gram, ()))
+        return {
+            position: count / len(query_grams)
+            for position, count in counts.items()
+            if count / len(query_grams) >= FUZZY_MIN_OVERLAP
+        }
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Tam sembol eşleşmesi"""
+        position = self._by_symbol.get(normalize_key(symbol))
+        return self._entries[position] if position is not None else None
+
+    def search(self, query: str, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Puanlı arama: (en iyi `limit` sonuç, toplam eşleşme sayısı)"""
+        key = normalize_key(query)
+        if not key:
+            return [], 0
+
+        # Kayıt sırası -> (puan, ikincil sıralama); her kayıt en iyi puanıyla bir kez
+        ranked: Dict[int, Tuple] = {}
+
+        def offer(position: int, rank: Tuple):
+            if position not in ranked or rank < ranked[position]:
+                ranked[position] = rank
+
+        for position in self._prefix_positions(self._symbol_keys, self._symbol_positions, key):
+            symbol = normalize_key(self._entries[position]["symbol"])
+            score = SCORE_EXACT_SYMBOL if symbol == key else SCORE_SYMBOL_PREFIX
+            offer(position, (score, 0.0, len(symbol), position))
+
+        for position in self._prefix_positions(self._name_keys, self._name_positions, key):
+            offer(position, (SCORE_NAME_PREFIX, 0.0, 0, position))
+
+        if len(key) >= FUZZY_MIN_QUERY:
+            for position, overlap in self._fuzzy_positions(key).items():
+                offer(position, (SCORE_FUZZY, -overlap, 0, position))
+
+        if limit is None:
+            best = sorted(ranked.items(), key=lambda item: item[1])
+        else:
+            best = heapq.nsmallest(limit, ranked.items(), key=lambda item: item[1])
+        return [self._entries[position] for position, _ in best], len(ranked)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Kayıtlar, eklenme sırasıyla"""
+        return self._entries
+
+    def __contains__(self, symbol: str) -> bool:
+        return normalize_key(symbol) in self._by_symbol
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Önbellek (cache.py) testleri
+Çalıştırma: python -m pytest -q test_cache.py
+Redis testi CACHE_URL'deki (varsayılan redis://localhost:6379/0) sunucuya bağlanamazsa atlanır.
+"""
+
+import asyncio
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+from cache import MemoryCache, RedisCache, SQLiteCache
+
+REDIS_URL = os.environ.get("CACHE_URL", "redis://localhost:6379/0")
+
+def redis_available() -> bool:
+    parsed = urlparse(REDIS_URL)
+    try:
+        socket.create_connection((parsed.hostname or "localhost", parsed.port or 6379), timeout=0.5).close()
+        return True
+    except OSError:
+        return False
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteCache("test", str(tmp_path / "cache.db"))
+    return MemoryCache("test")
+
+def run_async(coro):
+    return asyncio.run(coro)
+
+# ---------- Temel işlemler ----------
+
+def check_basic_semantics(cache):
+    cache.set("a", {"x": 1})
+    cache.set("zero", 1, ttl=0)  # ttl <= 0 saklanmaz
+    assert cache.get("a") == {"x": 1}
+    assert cache.get("zero") is None
+    assert cache.get("yok", "varsayılan") == "varsayılan"
+
+    cache.set("kisa", 1, ttl=0.1)
+    time.sleep(0.15)
+    assert cache.get("kisa") is None
+
+    cache.set_many({"m1": 1, "m2": 2}, ttl=10)
+    assert cache.get_many(["m1", "m2", "yok"]) == {"m1": 1, "m2": 2}
+
+    cache.delete("m1")
+    assert cache.get("m1") is None
+    cache.clear()
+    assert cache.get("a") is None and cache.get("m2") is None
+
+def test_basic_semantics(cache):
+    check_basic_semantics(cache)
+
+def test_observer_counts_hits_and_misses():
+    events = []
+    cache = MemoryCache("test", observer=events.append)
+    cache.get("a")
+    cache.set("a", 1)
+    cache.get("a")
+    assert events == ["miss", "hit"]
+
+def test_memory_lru_eviction():
+    cache = MemoryCache("test", max_entries=3)
+    for i in range(3):
+        cache.set(str(i), i)
+    cache.get("0")  # En son kullanılan olur
+    cache.set("3", 3)
+    assert cache.get("1") is None
+    assert [cache.get(key) for key in ("0", "2", "3")] == [0, 2, 3]
+
+def test_sqlite_namespaces_and_persistence(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, other = SQLiteCache("bir", path), SQLiteCache("iki", path)
+    first.set("k", 1)
+    other.set("k", 2)
+    other.clear()
+    assert first.get("k") == 1 and other.get("k") is None
+    assert SQLiteCache("bir", path).get("k") == 1  # Yeni bağlantı aynı dosyayı görür
+
+def test_sqlite_purge_keeps_newest_entries(tmp_path):
+    cache = SQLiteCache("test", str(tmp_path / "cache.db"), max_entries=3)
+    cache.PURGE_EVERY = 1  # Her yazmada sınır uygulanır
+    for i in range(6):
+        cache.set(f"k{i}", i)
+    assert [cache.get(f"k{i}") for i in range(6)] == [None, None, None, 3, 4, 5]
+
+def test_sqlite_purge_evicts_earliest_expiring(tmp_path):
+    cache = SQLiteCache("test", str(tmp_path / "cache.db"), max_entries=2)
+    cache.PURGE_EVERY = 1
+    cache.set("suresiz", 1)
+    cache.set("uzun", 2, ttl=100)
+    cache.set("kisa", 3, ttl=10)
+    assert cache.get("suresiz") == 1 and cache.get("uzun") == 2 and cache.get("kisa") is None
+
+# ---------- Tek uçuş (get_or_set) ----------
+
+def test_get_or_set_runs_loader_once(cache):
+    calls = []
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return "v"
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_set("k", loader, 10))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["v"] * 8
+    assert len(calls) == 1
+    assert cache.get("k") == "v"
+
+def test_get_or_set_propagates_errors(cache):
+    started = threading.Event()
+    def loader():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("upstream")
+    errors = []
+    def call():
+        try:
+            cache.get_or_set("k", loader, 10)
+        except ValueError as e:
+            errors.append(str(e))
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    waiters = [threading.Thread(target=call) for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+    for thread in [leader, *waiters]:
+        thread.join()
+    assert errors == ["upstream"] * 4
+    # Hata saklanmaz: sonraki çağrı yeniden yükler
+    assert cache.get_or_set("k", lambda: "v", 10) == "v"
+
+def test_get_or_set_does_not_store_none(cache):
+    assert cache.get_or_set("k", lambda: None, 10) is None
+    assert cache.get_or_set("k", lambda: "v", 10) == "v"
+
+# ---------- Tek uçuş (aget_or_set) ----------
+
+def test_aget_or_set_runs_loader_once(cache):
+    calls = []
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "v"
+    async def main():
+        return await asyncio.gather(*[cache.aget_or_set("k", loader, 10) for _ in range(5)])
+    assert run_async(main()) == ["v"] * 5
+    assert len(calls) == 1
+
+def test_aget_or_set_with_executor(cache):
+    async def run(func, *args):
+        return await asyncio.to_thread(func, *args)
+    async def loader():
+        return "v"
+    async def main():
+        return await asyncio.gather(*[cache.aget_or_set("k", loader, 10, run=run) for _ in range(3)])
+    assert run_async(main()) == ["v"] * 3
+    assert cache.get("k") == "v"
+
+def test_aget_or_set_propagates_errors(cache):
+    async def loader():
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream")
+    async def main():
+        return await asyncio.gather(*[cache.aget_or_set("k", loader, 10) for _ in range(3)], return_exceptions=True)
+    results = run_async(main())
+    assert [type(result) for result in results] == [ValueError] * 3
+    async def ok():
+        return "v"
+    assert run_async(cache.aget_or_set("k", ok, 10)) == "v"
+
+def test_aget_or_set_leader_cancel_does_not_cancel_waiters(cache):
+    calls = []
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "v"
+    async def main():
+        leader = asyncio.create_task(cache.aget_or_set("k", loader, 10))
+        await asyncio.sleep(0)  # Lider uçuşu başlatsın
+        waiters = [asyncio.create_task(cache.aget_or_set("k", loader, 10)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+    assert run_async(main()) == ["v"] * 3
+    assert len(calls) == 2  # İptal edilen lider + bekleyenlerden yeni lider
+
+def test_aget_or_set_cancelled_waiter_does_not_cancel_leader(cache):
+    async def loader():
+        await asyncio.sleep(0.05)
+        return "v"
+    async def main():
+        leader = asyncio.create_task(cache.aget_or_set("k", loader, 10))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.aget_or_set("k", loader, 10))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+    assert run_async(main()) == "v"
+
+# ---------- Redis ----------
+
+@pytest.mark.skipif(not redis_available(), reason=f"Redis sunucusu yok ({REDIS_URL})")
+def test_redis_semantics():
+    cache = RedisCache("test", REDIS_URL, prefix="dca-test:")
+    try:
+        check_basic_semantics(cache)
+        assert cache.get_or_set("k", lambda: "v", 10) == "v"
+        assert cache.get("k") == "v"
+    finally:
+        cache.clear()
+
+def test_redis_unreachable_counts_as_miss():
+    # Kullanılmayan bir porta bağlanamayan önbellek hata vermez, yükleyiciyle devam eder
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    cache = RedisCache("test", f"redis://127.0.0.1:{port}/0", timeout=0.2)
+    assert cache.get("k") is None
+    assert cache.get_or_set("k", lambda: "v", 10) == "v"
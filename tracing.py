@@ -0,0 +1,120 @@
+# Tarama İzleme (Tracing)
+# Bir taramanın aşamaları (rate limit beklemesi, TradingView isteği, sinyal hesabı, sıralama)
+# span olarak kaydedilir ve Chrome trace-event JSON'u olarak dışa verilir
+# (chrome://tracing veya https://ui.perfetto.dev ile açılır).
+# Etkin izleyici contextvar'da tutulur: asyncio görevleri ve to_thread çağrıları onu devralır,
+# izleme kapalıyken span() hiçbir şey kaydetmez.
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+_CURRENT: ContextVar[Optional["Tracer"]] = ContextVar("current_tracer", default=None)
+
+class Tracer:
+    """Tek taramanın span kayıtları"""
+
+    def __init__(self, name: str, **args: Any):
+        self.name = name
+        self.args = args
+        self._origin = time.perf_counter()
+        self._events: List[Dict[str, Any]] = []
+        self._lock = Lock()
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1_000_000
+
+    @contextmanager
+    def span(self, name: str, category: str = "scan", **args: Any):
+        """Süreli olay ("X") kaydet"""
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round(start, 1),
+                "dur": round(self._now_us() - start, 1),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+            if args:
+                event["args"] = args
+            with self._lock:
+                self._events.append(event)
+
+    def events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(self._events, key=lambda event: event["ts"])
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Chrome trace-event formatı"""
+        return {
+            "traceEvents": self.events(),
+            "displayTimeUnit": "ms",
+            "otherData": {"name": self.name, **self.args},
+        }
+
+    def summary(self, top: int = 5) -> Dict[str, Any]:
+        """Aşama başına toplam süre/adet ve en yavaş sembol span'leri (ms)"""
+        stages: Dict[str, Dict[str, float]] = {}
+        by_symbol = []
+        for event in self.events():
+            stage = stages.setdefault(event["name"], {"count": 0, "total_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] += event["dur"] / 1000
+            symbol = event.get("args", {}).get("symbol")
+            if symbol:
+                by_symbol.append((event["dur"], event["name"], symbol))
+        for stage in stages.values():
+            stage["total_ms"] = round(stage["total_ms"], 2)
+        by_symbol.sort(reverse=True)
+        return {
+            "stages": stages,
+            "slowest": [
+                {"stage": name, "symbol": symbol, "ms": round(duration / 1000, 2)}
+                for duration, name, symbol in by_symbol[:top]
+            ],
+        }
+
+    def write(self, directory: str, filename: str) -> str:
+        """Trace'i dosyaya yaz, yolunu döndür"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f)
+        return path
+
+def activate(tracer: Optional[Tracer]):
+    """İzleyiciyi geçerli bağlamda etkin yap; deactivate() için token döndürür"""
+    return _CURRENT.set(tracer)
+
+def deactivate(token) -> None:
+    _CURRENT.reset(token)
+
+@contextmanager
+def start_trace(name: str, enabled: bool = True, **args: Any):
+    """Blok boyunca yeni bir Tracer'ı etkin yap (enabled=False ise None verir)"""
+    tracer = Tracer(name, **args) if enabled else None
+    token = activate(tracer)
+    try:
+        yield tracer
+    finally:
+        deactivate(token)
+
+@contextmanager
+def span(name: str, category: str = "scan", **args: Any):
+    """Etkin izleyici varsa span kaydet, yoksa hiçbir şey yapma"""
+    tracer = _CURRENT.get()
+    if tracer is None:
+        yield
+        return
+    with tracer.span(name, category, **args):
+        yield
@@ -0,0 +1,109 @@
+# Dış Servis Koruması
+# FailureCache: sürekli hata veren semboller için negatif önbellek (üstel geri çekilme).
+# CircuitBreaker: bir servis art arda rate limit (429) döndürdüğünde istekleri bir süre keser.
+
+import time
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+
+class FailureCache:
+    """Anahtar başına art arda hata sayısı ve bir sonraki deneme zamanı"""
+
+    def __init__(self, base_delay: float = 300.0, max_delay: float = 6 * 60 * 60):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._failures: Dict[Hashable, Dict[str, float]] = {}  # key -> {"count", "retry_at"}
+        self._lock = Lock()
+
+    def should_skip(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """Anahtar geri çekilme süresindeyse True"""
+        with self._lock:
+            failure = self._failures.get(key)
+        return bool(failure) and (time.time() if now is None else now) < failure["retry_at"]
+
+    def record_failure(self, key: Hashable, now: Optional[float] = None) -> float:
+        """Hatayı kaydet, bekleme süresini (base * 2^(n-1), max_delay ile sınırlı) döndür"""
+        now = time.time() if now is None else now
+        with self._lock:
+            count = self._failures.get(key, {}).get("count", 0) + 1
+            delay = min(self.base_delay * (2 ** (count - 1)), self.max_delay)
+            self._failures[key] = {"count": count, "retry_at": now + delay}
+        return delay
+
+    def record_success(self, key: Hashable) -> None:
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[Hashable, Dict[str, float]]:
+        """Hâlâ beklemede olan anahtarlar -> {"count", "retry_in"}"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return {
+                key: {"count": failure["count"], "retry_in": round(failure["retry_at"] - now, 1)}
+                for key, failure in self._failures.items()
+                if failure["retry_at"] > now
+            }
+
+class CircuitBreaker:
+    """closed -> (threshold art arda throttle) -> open -> (cooldown) -> half_open -> (başarı) -> closed.
+    half_open'da tek deneme isteğine izin verilir; o da throttle alırsa cooldown iki katına çıkar."""
+
+    def __init__(self, name: str, threshold: int = 3, cooldown: float = 60.0, max_cooldown: float = 15 * 60):
+        self.name = name
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = "closed"
+        self.consecutive_throttles = 0
+        self.cooldown = cooldown
+        self.opened_until = 0.0
+        self._probe_started = None  # half_open deneme isteğinin başlangıcı
+        self._lock = Lock()
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """İstek gönderilebilir mi"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and now >= self.opened_until:
+                self.state = "half_open"
+                self._probe_started = None
+            # Sonuçsuz kalan (ör. bağlantı hatası) deneme cooldown sonra yenisine yer açar
+            if self.state == "half_open" and (self._probe_started is None or now - self._probe_started >= self.cooldown):
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                print(f"🟢 {self.name} devre kesici kapandı")
+            self.state = "closed"
+            self.consecutive_throttles = 0
+            self.cooldown = self.base_cooldown
+            self._probe_started = None
+
+    def record_throttle(self, now: Optional[float] = None) -> None:
+        """Rate limit yanıtı: eşik aşıldıysa veya deneme isteği başarısızsa devreyi aç"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.consecutive_throttles += 1
+            if self.state == "half_open":
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif self.consecutive_throttles < self.threshold:
+                return
+            self.state = "open"
+            self.opened_until = now + self.cooldown
+            self._probe_started = None
+        print(f"🔴 {self.name} devre kesici açıldı: {self.cooldown:.0f} sn istek gönderilmeyecek")
+
+    def status(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_throttles": self.consecutive_throttles,
+                "retry_in": round(max(self.opened_until - now, 0), 1) if self.state == "open" else 0
+            }